@@ -0,0 +1,216 @@
+"""
+    Static aeroelastic coupling.
+
+    The structural model is any callable  structure(mesh_forces) -> displacements,
+    mesh_forces and displacements are (nc + 1, ns + 1, 3) arrays on the mesh points,
+    the panel forces are lumped to the corners (a quarter each), see panel_forces_to_mesh.
+    LinearStructure is the linear stiffness matrix model.
+
+    Fixed point iteration with under-relaxation:
+
+        u_{k+1} = u_k + relaxation * (structure(F(mesh_0 + u_k)) - u_k)
+
+    The aerodynamic side works on the displaced corners directly, no Panels are rebuilt.
+    The Biot-Savart influence coefficients (N, N, 3) are evaluated again only when the corners moved
+    by more than `influence_tol` panel sizes since their last evaluation - in between the deformation
+    enters through the normals and the centres of pressure, the AIC is contracted from the stored
+    coefficients with the current normals. The converged iteration and the returned forces always use
+    freshly evaluated coefficients, so the fixed point is the one of the displaced mesh.
+    The contraction and the GMRES products remain O(N^2) per iteration.
+    The AIC is not factorized - GMRES starts from the previous circulation, preconditioned with
+    the LU factors of an earlier AIC. The factorization is refreshed only when GMRES needs more than
+    `refactorize_iterations`, i.e. after large deformations.
+
+    example
+
+    structure = LinearStructure(K, fixed=root_points)
+    result = solve_aeroelastic(mesh, V_app_infw, structure, rho=1.225, relaxation=0.7)
+    print(result.format_table())
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from solver.mesher import mesh_to_corners
+from solver.panel import calc_panels_geometry
+from solver.sensitivities import corners_to_mesh_gradient
+from solver.vlm_solver import \
+    calc_horseshoe_v_ind_coeff, \
+    factorize_sys_of_eq, \
+    solve_factorized, \
+    solve_iterative
+from solver.forces import calc_forces
+
+AeroelasticIteration = namedtuple('AeroelasticIteration',
+                                  ['iteration', 'residual', 'max_displacement', 'total_force',
+                                   'gmres_iterations', 'refactorized', 'reassembled', 'time_s'])
+
+
+def panel_forces_to_mesh(force, grid_size):
+    """
+    :param force: (nc * ns, 3) panel forces
+    :return: (nc + 1, ns + 1, 3) forces lumped to the mesh points, a quarter of every panel force to each corner
+    """
+    corner_forces = np.repeat(0.25 * np.asarray(force)[:, None, :], 4, axis=1)
+    return corners_to_mesh_gradient(corner_forces, grid_size)
+
+
+class LinearStructure(object):
+    """
+    Linear structure K u = f, the degrees of freedom are ordered as mesh.reshape(-1) - (x, y, z) of every point.
+
+    :param stiffness: (3 * n_points, 3 * n_points)
+    :param fixed: optional boolean mask (nc + 1, ns + 1) of the clamped mesh points
+    """
+
+    def __init__(self, stiffness, fixed=None):
+        stiffness = np.asarray(stiffness, dtype=float)
+        n_dof = len(stiffness)
+        self.free = np.ones(n_dof, dtype=bool)
+        if fixed is not None:
+            self.free = ~np.repeat(np.ravel(fixed), 3)
+        self._lu_piv = factorize_sys_of_eq(stiffness[np.ix_(self.free, self.free)])
+
+    def __call__(self, mesh_forces):
+        u = np.zeros(mesh_forces.size)
+        u[self.free] = solve_factorized(self._lu_piv, np.ravel(mesh_forces)[self.free])
+        return u.reshape(mesh_forces.shape)
+
+
+class AeroelasticResult(object):
+    """
+    :ivar mesh: displaced mesh
+    :ivar displacements: (nc + 1, ns + 1, 3)
+    :ivar gamma_magnitude, force: of the displaced mesh
+    :ivar history: list of AeroelasticIteration
+    :ivar converged: bool
+    """
+
+    def __init__(self, mesh, displacements, gamma_magnitude, force, history, converged):
+        self.mesh = mesh
+        self.displacements = displacements
+        self.gamma_magnitude = gamma_magnitude
+        self.force = force
+        self.history = history
+        self.converged = converged
+
+    def format_table(self):
+        lines = ["%4s %12s %12s %12s %6s %5s %5s %10s"
+                 % ('iter', 'residual', 'max_disp', '|F|', 'gmres', 'LU', 'AIC', 'time_s')]
+        for h in self.history:
+            lines.append("%4d %12.4e %12.4e %12.4e %6d %5s %5s %10.4f"
+                         % (h.iteration, h.residual, h.max_displacement, np.linalg.norm(h.total_force),
+                            h.gmres_iterations, 'yes' if h.refactorized else '', 'yes' if h.reassembled else '',
+                            h.time_s))
+        lines.append("converged" if self.converged else "NOT converged")
+        return "\n".join(lines)
+
+
+class _AeroModel(object):
+    """
+    Aerodynamics of the displaced mesh, keeps the circulation, the influence coefficients
+    and the LU factors between iterations.
+    """
+
+    def __init__(self, V_app_infw, rho, refactorize_iterations, influence_tol):
+        self.V_app_infw = V_app_infw
+        self.rho = rho
+        self.refactorize_iterations = refactorize_iterations
+        self.influence_tol = influence_tol
+        self.influence = None  # corners, v_ind_coeff at the control points, at the centres of pressure
+        self.length_scale = None
+        self.lu_piv = None
+        self.preconditioner = None
+        self.gamma_magnitude = None
+
+    def _set_preconditioner(self, A):
+        from scipy.sparse.linalg import LinearOperator
+
+        self.lu_piv = factorize_sys_of_eq(A)
+        self.preconditioner = LinearOperator(A.shape, matvec=lambda r: solve_factorized(self.lu_piv, r))
+
+    def _influence(self, corners, geometry, fresh):
+        if self.length_scale is None:
+            self.length_scale = np.sqrt(np.mean(geometry.areas))
+        reassembled = fresh or self.influence is None or \
+            np.max(np.linalg.norm(corners - self.influence[0], axis=-1)) > self.influence_tol * self.length_scale
+        if reassembled:
+            self.influence = (corners,
+                              calc_horseshoe_v_ind_coeff(geometry.ctr_p, geometry, self.V_app_infw),
+                              calc_horseshoe_v_ind_coeff(geometry.cp, geometry, self.V_app_infw))
+        return self.influence[1], self.influence[2], reassembled
+
+    def solve(self, corners, fresh=False):
+        """
+        :param fresh: evaluate the influence coefficients of these corners, whatever their displacement
+        :return: force (N, 3), gmres iterations, refactorized, reassembled
+        """
+        geometry = calc_panels_geometry(corners)
+        v_ind_coeff, v_ind_coeff_cp, reassembled = self._influence(corners, geometry, fresh)
+        A = np.einsum('ijk,ik->ij', v_ind_coeff, geometry.normals)
+        RHS = -np.sum(self.V_app_infw * geometry.normals, axis=-1)
+
+        iterations, refactorized = 0, False
+        if self.lu_piv is None:
+            self._set_preconditioner(A)
+            self.gamma_magnitude = solve_factorized(self.lu_piv, RHS)
+            refactorized = True
+        else:
+            self.gamma_magnitude, iterations = solve_iterative(A, RHS, x0=self.gamma_magnitude,
+                                                               M=self.preconditioner)
+            if iterations > self.refactorize_iterations:
+                self._set_preconditioner(A)
+                refactorized = True
+
+        force = calc_forces(self.V_app_infw, self.gamma_magnitude, v_ind_coeff_cp, corners, rho=self.rho)
+        return force, iterations, refactorized, reassembled
+
+
+def solve_aeroelastic(mesh, V_app_infw, structure, rho=1., relaxation=0.5, tol=1e-6, max_iterations=50,
+                      refactorize_iterations=15, influence_tol=0.01, callback=None):
+    """
+    :param mesh: (nc + 1, ns + 1, 3) undeformed mesh, see make_panels_from_points / make_cambered_mesh
+    :param V_app_infw: (3,) or (N, 3), the wake follows it and does not deform
+    :param structure: callable (nc + 1, ns + 1, 3) mesh forces -> (nc + 1, ns + 1, 3) displacements
+    :param relaxation: under-relaxation factor of the displacements, 0 < relaxation <= 1
+    :param tol: convergence criterion, max |structure(F) - u| relative to max |u|
+    :param refactorize_iterations: GMRES iterations above which the AIC is factorized again
+    :param influence_tol: displacement of the corners since the last evaluation of the influence coefficients,
+                          relative to the mean panel size, above which they are evaluated again;
+                          0 - every iteration
+    :param callback: optional function(AeroelasticIteration), i.e. for progress reporting
+    :return: AeroelasticResult
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    grid_size = (mesh.shape[0] - 1, mesh.shape[1] - 1)
+    V_app_infw = np.broadcast_to(np.asarray(V_app_infw, dtype=float), (grid_size[0] * grid_size[1], 3))
+    aero = _AeroModel(V_app_infw, rho, refactorize_iterations, influence_tol)
+
+    u = np.zeros_like(mesh)
+    history = []
+    converged, fresh = False, False
+    for iteration in range(max_iterations):
+        t0 = time.perf_counter()
+        force, gmres_iterations, refactorized, reassembled = aero.solve(mesh_to_corners(mesh + u), fresh=fresh)
+        u_structure = structure(panel_forces_to_mesh(force, grid_size))
+
+        scale = max(np.max(np.abs(u_structure)), np.finfo(float).tiny)
+        residual = np.max(np.abs(u_structure - u)) / scale
+        u = u + relaxation * (u_structure - u)
+
+        history.append(AeroelasticIteration(iteration=iteration, residual=residual,
+                                            max_displacement=np.max(np.linalg.norm(u, axis=-1)),
+                                            total_force=np.sum(force, axis=0), gmres_iterations=gmres_iterations,
+                                            refactorized=refactorized, reassembled=reassembled,
+                                            time_s=time.perf_counter() - t0))
+        if callback is not None:
+            callback(history[-1])
+        if residual < tol and reassembled:
+            converged = True
+            break
+        fresh = residual < tol  # confirm with the coefficients of the current mesh
+
+    force = aero.solve(mesh_to_corners(mesh + u), fresh=True)[0]
+    return AeroelasticResult(mesh + u, u, aero.gamma_magnitude, force, history, converged)
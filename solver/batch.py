@@ -0,0 +1,283 @@
+"""
+    Batch case runner.
+
+    $ python -m solver.batch jobs.json -o results.csv --workers 4 --store sweep.npz
+
+    The job file (JSON, YAML or CSV) lists the cases to be solved.
+    JSON / YAML layout:
+
+    {
+      "geometries": {
+        "wing20": {"le_SW": [0, -10, 0], "te_SE": [1, -10, 0],
+                   "le_NW": [0, 10, 0], "te_NE": [1, 10, 0]}
+      },
+      "cases": [
+        {"case_id": "a3", "geometry": "wing20", "nc": 3, "ns": 20,
+         "V": [10, 0, 0], "AoA_deg": 3.0, "rho": 1.225}
+      ]
+    }
+
+    CSV layout - one case per row, the points are given as space separated triples:
+
+    case_id,le_SW,te_SE,le_NW,te_NE,nc,ns,V,AoA_deg,rho
+    a3,0 -10 0,1 -10 0,0 10 0,1 10 0,3,20,10 0 0,3.0,1.225
+
+    Optional case entries: "rho" (default 1.225), "AoA_deg" (default 0), "S" - reference area
+    (default: planform area of the mesh).
+
+    Cases sharing the geometry and mesh density are solved together by one worker:
+    the panels and the bound vortex influence are built once, for every inflow direction
+    only the trailing legs are recomputed and the AIC is LU factorized once -
+    all speeds/densities are then solved as a multi RHS problem.
+    Independent groups are fanned out across a process pool.
+    With --store the per-panel results of every case are appended to a ResultsFile
+    as soon as its group is finished.
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from solver.mesher import make_panels_from_points
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import InfluenceCache
+from solver.forces import calc_forces, calc_pressure
+from solver.results import CaseResult, ResultsFile
+
+POINT_NAMES = ['le_SW', 'te_SE', 'le_NW', 'te_NE']
+RESULT_COLUMNS = ['case_id', 'geometry', 'nc', 'ns', 'AoA_deg', 'V', 'rho', 'S',
+                  'CL', 'CD', 'Fx', 'Fy', 'Fz', 'group_time_s']
+
+
+def load_job_file(path):
+    """
+    :param path: *.json, *.yaml / *.yml or *.csv job file
+    :return: list of normalized case dicts
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        with open(path, newline='') as f:
+            return _check_case_ids([_normalize_case(row, {}, i) for i, row in enumerate(csv.DictReader(f))])
+
+    with open(path) as f:
+        if ext in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML job files, use JSON or CSV instead.")
+            job = yaml.safe_load(f)
+        elif ext == '.json':
+            job = json.load(f)
+        else:
+            raise ValueError("Unknown job file format: %s" % ext)
+
+    geometries = job.get('geometries', {})
+    return _check_case_ids([_normalize_case(case, geometries, i) for i, case in enumerate(job['cases'])])
+
+
+def _check_case_ids(cases):
+    """
+    The results are keyed by case_id, duplicates would overwrite each other.
+    """
+    seen = set()
+    duplicates = []
+    for case in cases:
+        if case['case_id'] in seen:
+            duplicates.append(case['case_id'])
+        seen.add(case['case_id'])
+    if duplicates:
+        raise ValueError("Duplicate case ids: %s" % ", ".join(sorted(set(duplicates))))
+    return cases
+
+
+def _as_vector(value):
+    if isinstance(value, str):
+        value = value.split()
+    return np.array([float(v) for v in value])
+
+
+def _normalize_case(case, geometries, index):
+    geometry = case.get('geometry')
+    if geometry is not None and geometry in geometries:
+        points_def = geometries[geometry]
+    elif all(name in case for name in POINT_NAMES):
+        points_def = case
+    else:
+        raise ValueError("Case %d: unknown geometry %r and no points given." % (index, geometry))
+
+    points = [_as_vector(points_def[name]) for name in POINT_NAMES]
+    if geometry is None or geometry not in geometries:
+        geometry = " ".join("%g" % x for x in np.concatenate(points))
+
+    return {
+        'case_id': str(case.get('case_id', index)),
+        'geometry': geometry,
+        'points': points,
+        'nc': int(case['nc']),
+        'ns': int(case['ns']),
+        'V': _as_vector(case['V']),
+        'AoA_deg': float(case.get('AoA_deg', 0.)),
+        'rho': float(case.get('rho', 1.225)),
+        'S': float(case['S']) if case.get('S') not in (None, '') else None,
+    }
+
+
+def group_cases(cases):
+    """
+    Cases sharing the geometry and the mesh density are solved by the same worker.
+    :return: list of lists of cases
+    """
+    groups = OrderedDict()
+    for case in cases:
+        key = (case['geometry'], case['nc'], case['ns'])
+        groups.setdefault(key, []).append(case)
+    return list(groups.values())
+
+
+def _inflow_in_body_axes(case):
+    """
+    Instead of rotating the geometry (as in main.py) the inflow is rotated by -AoA,
+    so that all angles of attack share the same panels.
+    :return: V in body axes, rotation from body to wind axes
+    """
+    Ry = rotation_matrix([0, 1, 0], np.deg2rad(case['AoA_deg']))
+    return np.dot(Ry.T, case['V']), Ry
+
+
+def _planform_area(mesh):
+    p1 = mesh[1:, :-1]
+    p2 = mesh[:-1, :-1]
+    p3 = mesh[:-1, 1:]
+    p4 = mesh[1:, 1:]
+    return 0.5 * np.sum(np.linalg.norm(np.cross(p3 - p1, p4 - p2), axis=-1))
+
+
+def run_group(cases):
+    """
+    Solve all cases sharing one geometry and mesh density.
+    :return: list of (row, CaseResult), the row is a dict with RESULT_COLUMNS keys
+    """
+    t0 = time.perf_counter()
+    first = cases[0]
+    panels, mesh = make_panels_from_points(first['points'], [first['nc'], first['ns']])
+    N = panels.size
+    S_mesh = _planform_area(mesh)
+
+    by_direction = OrderedDict()
+    for case in cases:
+        V_body, Ry = _inflow_in_body_axes(case)
+        direction = tuple(np.round(V_body / np.linalg.norm(V_body), 12))
+        by_direction.setdefault(direction, []).append((case, V_body, Ry))
+
+    cache = InfluenceCache(panels)
+    rows = []
+    for items in by_direction.values():
+        V_app_infw = np.array([[V_body for _ in range(N)] for _, V_body, _ in items])
+        gammas, _ = cache.calc_circulation(V_app_infw)
+        v_ind_coeff_cp = cache.get_v_ind_coeff(V_app_infw[0], at='cp')
+
+        for k, (case, V_body, Ry) in enumerate(items):
+            F = calc_forces(V_app_infw[k], gammas[:, k], v_ind_coeff_cp, panels, rho=case['rho'])
+            p = calc_pressure(F, panels)
+            total_F = np.dot(Ry, np.sum(F, axis=0))  # wind axes
+
+            S = case['S'] if case['S'] is not None else S_mesh
+            q = 0.5 * case['rho'] * np.dot(case['V'], case['V']) * S
+            row = {
+                'case_id': case['case_id'],
+                'geometry': case['geometry'],
+                'nc': case['nc'],
+                'ns': case['ns'],
+                'AoA_deg': case['AoA_deg'],
+                'V': " ".join("%g" % v for v in case['V']),
+                'rho': case['rho'],
+                'S': S,
+                'CL': total_F[2] / q,
+                'CD': total_F[0] / q,
+                'Fx': total_F[0],
+                'Fy': total_F[1],
+                'Fz': total_F[2],
+            }
+            result = CaseResult(gammas[:, k], F, p, mesh,
+                                coefficients={name: row[name] for name in ('CL', 'CD', 'Fx', 'Fy', 'Fz', 'S')},
+                                metadata={name: row[name] for name in ('geometry', 'nc', 'ns', 'AoA_deg', 'V', 'rho')})
+            rows.append((row, result))
+
+    elapsed = time.perf_counter() - t0
+    for row, _ in rows:
+        row['group_time_s'] = elapsed
+    return rows
+
+
+def run_batch(cases, workers=1, store=None):
+    """
+    :param cases: list of normalized case dicts, see load_job_file
+    :param workers: size of the process pool, 1 runs everything in this process
+    :param store: optional path of a ResultsFile, the results are appended as the groups finish
+    :return: result rows in the order of `cases`
+    """
+    groups = group_cases(_check_case_ids(cases))
+    results_file = ResultsFile(store, mode='a') if store is not None else None
+
+    rows = {}
+
+    def collect(group_results):
+        for row, result in group_results:
+            rows[row['case_id']] = row
+            if results_file is not None:
+                results_file.append(row['case_id'], result)
+
+    try:
+        if workers == 1 or len(groups) == 1:
+            for g in groups:
+                collect(run_group(g))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(run_group, g) for g in groups]
+                for future in as_completed(futures):
+                    collect(future.result())
+    finally:
+        if results_file is not None:
+            results_file.close()
+
+    return [rows[case['case_id']] for case in cases]
+
+
+def write_results(rows, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=1)
+        return
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of VLM cases defined in a job file.")
+    parser.add_argument('job_file', help="*.json, *.yaml or *.csv")
+    parser.add_argument('-o', '--output', default='results.csv', help="*.csv or *.json results table")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="size of the process pool")
+    parser.add_argument('--store', default=None, help="append per-panel results to this sweep file (*.npz)")
+    args = parser.parse_args(argv)
+
+    cases = load_job_file(args.job_file)
+    t0 = time.perf_counter()
+    rows = run_batch(cases, workers=args.workers, store=args.store)
+    write_results(rows, args.output)
+    print("%d cases in %d groups solved in %.2f s -> %s" % (
+        len(cases), len(group_cases(cases)), time.perf_counter() - t0, args.output))
+
+
+if __name__ == '__main__':
+    main()
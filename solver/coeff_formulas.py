@@ -1,8 +1,18 @@
 import numpy as np
-from scipy import interpolate
 import warnings
 
+# 2D free surface lift correction coefficient K, Faltinsen fig. 6.x, data for h / c = 1
+FREE_SURFACE_FNH = np.array([0, 1, 1.5, 2, 2.5, 4, 6, 8, 10, 25])  # Froude number with h as parameter
+FREE_SURFACE_K_HC1 = np.array([1, 0.72, 0.6, 0.62, 0.65, 0.76, 0.85, 0.9, 0.91, 0.92])  # [-]
+
+
 def get_CL_CD_free_wing(AR, AoA_deg):
+    """
+    AR and AoA_deg may be arrays, the results are broadcast.
+    """
+    AR = np.asarray(AR, dtype=float)
+    AoA_deg = np.asarray(AoA_deg, dtype=float)
+
     a0 = 2. * np.pi  # dCL/d_alfa in 2D [1/rad]
     e_w = 0.8  # span efficiency factor, range: 0.8 - 1.0
 
@@ -23,8 +33,13 @@ def get_CL_CD_submerged_wing(AR, AoA_deg, K=1, c=0, h=0):
     
     CL_with_free_surface_effects = CL * K
     CL = 2. * np.pi
+
+    AR, AoA_deg and K may be arrays, the results are broadcast.
     :return: 
     """
+    AR = np.asarray(AR, dtype=float)
+    AoA_deg = np.asarray(AoA_deg, dtype=float)
+    K = np.asarray(K, dtype=float)
 
     a0 = 2. * np.pi * K  # dCL/d_alfa in 2D [1/rad]
     e_w = 0.8  # span efficiency factor, range: 0.8 - 1.0
@@ -37,6 +52,20 @@ def get_CL_CD_submerged_wing(AR, AoA_deg, K=1, c=0, h=0):
     return CL_expected_3d, CD_ind_expected_3d
 
 
+def get_CL_CD_submerged_wing_at_Fn(AR, AoA_deg, Fn, h_over_chord):
+    """
+    get_CL_CD_submerged_wing with K taken from calc_free_surface_effect_on_CL.
+    All parameters may be arrays, i.e. a whole speed x angle of attack grid:
+
+    Fn, AoA_deg = np.meshgrid(Fn_values, AoA_values)
+    CL, CD = get_CL_CD_submerged_wing_at_Fn(AR, AoA_deg, Fn, h_over_chord=1.)
+
+    Only h / c close to 1 (0.9 - 1.1) is supported, there are no data for other ride heights.
+    """
+    K = calc_free_surface_effect_on_CL(Fn, h_over_chord)
+    return get_CL_CD_submerged_wing(AR, AoA_deg, K=K)
+
+
 def calc_free_surface_effect_on_CL(Fn, h_over_chord):
     """ 
     This functions returns coefficient 'K' accounting for free surface effects
@@ -46,6 +75,10 @@ def calc_free_surface_effect_on_CL(Fn, h_over_chord):
     "Hydrodynamics of High-Speed Marine Vehicles" Odd M. Faltinsen, chapter 6.8 p 199
 
     CL_with_free_surface_effects = CL * K
+
+    K is interpolated over Fnh in FREE_SURFACE_K_HC1, there are data for h / c = 1 only.
+    Fn and h_over_chord may be arrays, the ranges are validated
+    and the warnings are emitted once for the whole batch.
     
     :param Fn: Froude number with h as length parameter
     :param h_over_chord: ratio of foil_submerge/MAC
@@ -53,38 +86,34 @@ def calc_free_surface_effect_on_CL(Fn, h_over_chord):
     """
     # h - foilsubmerge [m]
     # MAC - mean aerodynamic chord [m]
+    Fn = np.asarray(Fn, dtype=float)
+    h_over_chord = np.asarray(h_over_chord, dtype=float)
 
-
-    if (h_over_chord > 1.1 or h_over_chord < 0.9):
+    if np.any((h_over_chord > 1.1) | (h_over_chord < 0.9)):
         raise ValueError("no data for foil submerge / foil chord other than 1")
 
-    # data below are for hc = h / c = 1
-    K = [1, 0.72, 0.6, 0.62, 0.65, 0.76, 0.85, 0.9, 0.91, 0.92]  # [-] 2D free surface lift correction coefficient
-    Fnh = [0, 1, 1.5, 2, 2.5, 4, 6, 8, 10, 25]  # Froude number with h as parameter
+    out_of_range = (Fn < 0) | (Fn > FREE_SURFACE_FNH[-1])
+    if np.any(out_of_range):
+        raise ValueError("Fnh is out of interpolation range  Fnh = %0.2f" % Fn[out_of_range].flat[0])
 
-    if (Fn < 9):
+    if np.any(Fn < 9):
         warnings.warn("To use mirror vortex modeling technique it is recommended to be in high Freud number regime.")
         #  source:
         # "Hydrodynamics of High-Speed Marine Vehicles" Odd M. Faltinsen, chapter 6.8 p 200
 
-    if (Fn > max(Fnh)):
-        raise ValueError("Fnh is out of interpolation range  Fnh = %0.2f", Fn)
-
-    fun_handle = interpolate.interp1d(Fnh, K)  # use interpolation function returned by `interp1d`
-    K = fun_handle(Fn)
+    K = np.interp(Fn, FREE_SURFACE_FNH, FREE_SURFACE_K_HC1)
+    return np.broadcast_to(K, np.broadcast(Fn, h_over_chord).shape).copy()
 
-    return K
 
+def plot_free_surface_effect_on_CL(h_over_chord=1, Fn_max=15):
+    import matplotlib.pyplot as plt  # plotting is optional, never import it with the solver
 
-# import matplotlib.pyplot as plt
-# import numpy as np
+    xnew = np.linspace(0, Fn_max, num=100)
+    ynew = calc_free_surface_effect_on_CL(xnew, h_over_chord)
 
-# xnew = np.linspace(0, 15, num=100)
-# ynew = np.array([ calc_CLFreeSurfaceEffect(xnew[i],1) for i in range(len(xnew))])
-#
-# plt.xlabel('Fn')
-# plt.ylabel('K')
-# plt.title('Effect of foil submerge on lift')
-# plt.plot(xnew, ynew, marker=".", linestyle="-")
-# plt.grid(True)
-# plt.show()
\ No newline at end of file
+    plt.xlabel('Fn')
+    plt.ylabel('K')
+    plt.title('Effect of foil submerge on lift')
+    plt.plot(xnew, ynew, marker=".", linestyle="-")
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,169 @@
+"""
+    Mesh convergence study.
+
+    The wing given by its four corner points (see make_panels_from_points) is solved on
+    a sequence of meshes refined by `refinement` in both directions. Every finer mesh is solved
+    with GMRES, starting from the circulation interpolated from the previous one.
+    CL and CDi are extrapolated to zero panel size (Richardson) from the three finest levels,
+    the error of every level is measured against the extrapolated values and the cheapest
+    mesh meeting the tolerance is recommended.
+
+    example
+
+    study = mesh_convergence_study(points, V=[10, 0, 1], base_grid=(2, 8), n_levels=4, tol=1e-3)
+    print(study.format_table())
+    nc, ns = study.recommended_grid
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from solver.mesher import make_panels_from_points, mesh_to_corners
+from solver.vlm_solver import InfluenceCache, solve_iterative
+from solver.forces import calc_forces
+
+ConvergenceLevel = namedtuple('ConvergenceLevel',
+                              ['nc', 'ns', 'N', 'CL', 'CDi', 'time_s', 'iterations', 'error_CL', 'error_CDi'])
+
+
+def interpolate_gamma(gamma_magnitude, coarse_grid, fine_grid):
+    """
+    Initial guess of the circulation on a finer mesh of the same surface.
+    Chordwise, the cumulative circulation from the leading edge is interpolated at the panel edges
+    in the angle theta, x/c = (1 - cos(theta)) / 2, where it is smooth (theta + sin(theta) for a flat plate)
+    despite the leading edge singularity. Spanwise, the circulation is interpolated between the strip centres.
+
+    :param gamma_magnitude: (nc * ns,) on coarse_grid
+    :return: (nc_fine * ns_fine,)
+    """
+    nc, ns = coarse_grid
+    nc_fine, ns_fine = fine_grid
+
+    def centres(n):
+        return (np.arange(n) + 0.5) / n
+
+    def theta(n):
+        return np.arccos(1. - 2. * np.linspace(0., 1., n + 1))
+
+    cumulative = np.zeros((nc + 1, ns))
+    cumulative[1:] = np.cumsum(np.reshape(gamma_magnitude, (nc, ns)), axis=0)
+    spanwise = np.array([np.interp(centres(ns_fine), centres(ns), row) for row in cumulative])
+    fine = np.array([np.interp(theta(nc_fine), theta(nc), column) for column in spanwise.T]).T
+    return np.diff(fine, axis=0).ravel()
+
+
+def richardson_extrapolation(f_coarse, f_medium, f_fine, refinement, order=None):
+    """
+    :param order: expected order of convergence, by default observed from the three levels
+    :return: extrapolated value, order used
+    """
+    if order is None:
+        ratio = (f_coarse - f_medium) / (f_medium - f_fine) if f_medium != f_fine else np.nan
+        order = np.log(ratio) / np.log(refinement) if ratio > 0 else np.nan
+        if not np.isfinite(order) or order <= 0:
+            order = 1.  # oscillating or stagnant sequence, fall back to the first order estimate
+    return f_fine + (f_fine - f_medium) / (refinement ** order - 1.), order
+
+
+class ConvergenceStudy(object):
+    """
+    :ivar levels: list of ConvergenceLevel, coarse to fine
+    :ivar extrapolated: dict CL, CDi - values at zero panel size
+    :ivar order: dict CL, CDi - observed order of convergence
+    :ivar recommended: the cheapest ConvergenceLevel meeting tol or None
+    """
+
+    def __init__(self, levels, extrapolated, order, tol):
+        self.levels = levels
+        self.extrapolated = extrapolated
+        self.order = order
+        self.tol = tol
+        meeting_tol = [level for level in levels if max(level.error_CL, level.error_CDi) <= tol]
+        self.recommended = min(meeting_tol, key=lambda level: level.N) if meeting_tol else None
+
+    @property
+    def recommended_grid(self):
+        return None if self.recommended is None else (self.recommended.nc, self.recommended.ns)
+
+    def format_table(self):
+        lines = ["%4s %4s %6s %12s %12s %10s %10s %10s %6s"
+                 % ('nc', 'ns', 'N', 'CL', 'CDi', 'err_CL', 'err_CDi', 'time_s', 'iters')]
+        for level in self.levels:
+            lines.append("%4d %4d %6d %12.6f %12.6f %10.2e %10.2e %10.4f %6d%s"
+                         % (level.nc, level.ns, level.N, level.CL, level.CDi, level.error_CL, level.error_CDi,
+                            level.time_s, level.iterations, '  <-' if level is self.recommended else ''))
+        lines.append("extrapolated CL %.6f (order %.2f), CDi %.6f (order %.2f), tol %g"
+                     % (self.extrapolated['CL'], self.order['CL'], self.extrapolated['CDi'], self.order['CDi'],
+                        self.tol))
+        return "\n".join(lines)
+
+
+def solve_level(mesh, V, rho=1., gamma_guess=None, lift_direction=(0, 0, 1), drag_direction=(1, 0, 0)):
+    """
+    Solve of one level of a refinement study, see mesh_convergence_study and solver.adaptive.
+
+    :param mesh: (nc + 1, ns + 1, 3)
+    :param gamma_guess: optional initial guess of GMRES
+    :return: gamma_magnitude (nc * ns,), GMRES iterations, CL, CDi
+    """
+    corners = mesh_to_corners(mesh)
+    cache = InfluenceCache(corners)
+    V_app_infw = np.broadcast_to(V, (cache.N, 3))
+
+    A, RHS, _ = cache.assembly_sys_of_eq(V_app_infw)
+    gamma_magnitude, iterations = solve_iterative(A, RHS, x0=gamma_guess)
+
+    F = calc_forces(V_app_infw, gamma_magnitude, cache.get_v_ind_coeff(V_app_infw, at='cp'), corners, rho=rho)
+    total_F = np.sum(F, axis=0)
+    qS = 0.5 * rho * np.dot(V, V) * np.sum(cache.geometry.areas)
+    return gamma_magnitude, iterations, np.dot(total_F, lift_direction) / qS, np.dot(total_F, drag_direction) / qS
+
+
+def mesh_convergence_study(points, V, base_grid=(2, 8), n_levels=4, refinement=2, rho=1., tol=1e-3,
+                           warm_start=True, lift_direction=(0, 0, 1), drag_direction=(1, 0, 0), error_floor=1e-6):
+    """
+    :param points: le_SW, te_SE, le_NW, te_NE, see make_panels_from_points
+    :param V: (3,) freestream, lift_direction and drag_direction are taken in the same axes
+    :param base_grid: [nc, ns] of the coarsest mesh
+    :param n_levels: number of meshes, at least 3
+    :param refinement: integer ratio of the panel counts of consecutive meshes in each direction
+    :param tol: max relative error of CL and CDi of the recommended mesh
+    :param warm_start: start GMRES from the interpolated coarse circulation
+    :param error_floor: the errors are relative to the extrapolated value but at least to this one,
+                        i.e. CDi of a wing at zero lift
+    :return: ConvergenceStudy
+    """
+    if n_levels < 3:
+        raise ValueError("Richardson extrapolation needs at least 3 meshes")
+
+    V = np.asarray(V, dtype=float)
+    nc, ns = base_grid
+
+    results = []
+    gamma_magnitude, previous_grid = None, None
+    for k in range(n_levels):
+        grid_size = (nc * refinement ** k, ns * refinement ** k)
+        gamma_guess = None
+        if warm_start and gamma_magnitude is not None:
+            gamma_guess = interpolate_gamma(gamma_magnitude, previous_grid, grid_size)
+
+        t0 = time.perf_counter()
+        _, mesh = make_panels_from_points(points, grid_size)
+        gamma_magnitude, iterations, CL, CDi = solve_level(mesh, V, rho, gamma_guess, lift_direction, drag_direction)
+        results.append((grid_size, CL, CDi, time.perf_counter() - t0, iterations))
+        previous_grid = grid_size
+
+    extrapolated, order = {}, {}
+    for m, name in ((1, 'CL'), (2, 'CDi')):
+        f_coarse, f_medium, f_fine = [r[m] for r in results[-3:]]
+        extrapolated[name], order[name] = richardson_extrapolation(f_coarse, f_medium, f_fine, refinement)
+
+    def relative_error(value, name):
+        return abs(value - extrapolated[name]) / max(abs(extrapolated[name]), error_floor)
+
+    levels = [ConvergenceLevel(nc=g[0], ns=g[1], N=g[0] * g[1], CL=CL, CDi=CDi, time_s=t, iterations=its,
+                               error_CL=relative_error(CL, 'CL'), error_CDi=relative_error(CDi, 'CDi'))
+              for g, CL, CDi, t, its in results]
+    return ConvergenceStudy(levels, extrapolated, order, tol)
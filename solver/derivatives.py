@@ -0,0 +1,86 @@
+"""
+    Stability and rotational derivatives.
+
+    The state perturbations are
+        u, v, w - components of the apparent inflow V_app_infw,
+        p, q, r - rotation rates of the body about the reference point, which add
+                  -(omega x (x - reference_point)) to the apparent inflow at x.
+    The six unit perturbations are solved as one multi RHS problem against the
+    factorization of the base case. The wake is frozen along the base inflow.
+"""
+
+import numpy as np
+
+from solver.vlm_solver import InfluenceCache, solve_factorized
+from solver.loads import calc_total_force_and_moments
+from solver.forces import calc_kutta_joukowski_forces
+
+STATE_NAMES = ('u', 'v', 'w', 'p', 'q', 'r')
+LOAD_NAMES = ('Fx', 'Fy', 'Fz', 'Mx', 'My', 'Mz')
+
+
+def make_unit_perturbation_inflows(points, reference_point=(0, 0, 0)):
+    """
+    :param points: (N, 3) where the inflow is evaluated (control points or centres of pressure)
+    :return: (6, N, 3) inflow perturbations due to unit u, v, w, p, q, r
+    """
+    points = np.asarray(points, dtype=float)
+    r = points - np.asarray(reference_point, dtype=float)
+    dV = np.zeros((6, len(points), 3))
+    for k in range(3):
+        dV[k, :, k] = 1.
+        omega = np.zeros(3)
+        omega[k] = 1.
+        dV[3 + k] = -np.cross(omega, r)
+    return dV
+
+
+def calc_loads(force, cp, reference_point=(0, 0, 0)):
+    """
+    :return: (6,) total force and moment about reference_point
+    """
+    total_force, moment = calc_total_force_and_moments(force, cp, reference_point)
+    return np.concatenate([total_force, moment])
+
+
+def calc_stability_derivatives(V_app_infw, panels, rho=1., reference_point=(0, 0, 0), cache=None):
+    """
+    :param V_app_infw: (N, 3) base inflow
+    :param panels: array of Panels
+    :param reference_point: moments and rotation rates are taken about this point
+    :param cache: optional InfluenceCache of the panels, it is reused (i.e. along a sweep)
+    :return: dict with
+        'derivatives' - (6, 6) d(Fx, Fy, Fz, Mx, My, Mz) / d(u, v, w, p, q, r)
+        'loads' - (6,) base force and moment
+        'gamma_magnitude' - (N,) base circulation
+        'd_gamma_magnitude' - (N, 6) derivatives of the circulation
+    """
+    V_app_infw = np.asarray(V_app_infw, dtype=float)
+    if cache is None:
+        cache = InfluenceCache(panels)
+    geometry = cache.geometry
+
+    lu_piv = cache.factorize(V_app_infw)
+    dV_ctr = make_unit_perturbation_inflows(geometry.ctr_p, reference_point)
+    dV_cp = make_unit_perturbation_inflows(geometry.cp, reference_point)
+
+    RHS = -np.sum(np.concatenate([V_app_infw[None], dV_ctr]) * geometry.normals, axis=-1)
+    gammas = solve_factorized(lu_piv, RHS.T)  # (N, 7) base + 6 perturbations
+    gamma_magnitude, d_gamma = gammas[:, 0], gammas[:, 1:]
+
+    v_ind_coeff_cp = cache.get_v_ind_coeff(V_app_infw, at='cp')
+    bc = geometry.C - geometry.B
+    V_at_cp = V_app_infw + np.einsum('ijk,j->ik', v_ind_coeff_cp, gamma_magnitude)
+    force = calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, geometry, rho=rho)
+
+    # dF_i = rho * [(dV_at_cp_i x bc_i) gamma_i + (V_at_cp_i x bc_i) d_gamma_i]
+    dV_at_cp = dV_cp + np.einsum('ijk,jm->mik', v_ind_coeff_cp, d_gamma)
+    d_force = rho * (np.cross(dV_at_cp, bc[None]) * gamma_magnitude[None, :, None]
+                     + np.cross(V_at_cp, bc)[None] * d_gamma.T[:, :, None])
+
+    derivatives = np.array([calc_loads(d_force[m], geometry.cp, reference_point) for m in range(6)]).T
+
+    return {'derivatives': derivatives,
+            'loads': calc_loads(force, geometry.cp, reference_point),
+            'gamma_magnitude': gamma_magnitude,
+            'd_gamma_magnitude': d_gamma}
@@ -0,0 +1,181 @@
+"""
+    Solution and mesh diagnostics, all evaluated for the whole lattice at once.
+
+    Before the assembly - calc_mesh_quality / check_mesh_quality reject degenerate meshes:
+    stretched or skewed panels, warped panels and control points close to the vortex lines
+    of other horseshoes (near the vortex core the influence coefficients blow up).
+    After the solve - diagnose_solution returns the normal flux through every panel
+    (the residual of the no flux boundary condition), its max and RMS, and an estimate
+    of the condition number of the AIC from its LU factors (LAPACK gecon, O(N^2)).
+
+    example
+
+    check_mesh_quality(panels)
+    A, RHS, v_ind_coeff = assembly_sys_of_eq(V_app_infw, panels)
+    lu_piv = factorize_sys_of_eq(A)
+    gamma_magnitude = solve_factorized(lu_piv, RHS)
+    report = diagnose_solution(V_app_infw, panels, gamma_magnitude, v_ind_coeff, A=A, lu_piv=lu_piv)
+    print(report.format_table())
+"""
+
+import numpy as np
+
+from solver.panel import calc_panels_geometry, calc_panels_warp, get_panels_corners
+from solver.vlm_solver import calc_induced_velocity, factorize_sys_of_eq
+from solver.profiling import stage
+
+QUALITY_METRICS = ('aspect_ratio', 'skew_deg', 'warp', 'core_distance')
+
+
+def calc_flux_residuals(V_app_fw, panels):
+    """
+    :param V_app_fw: (N, 3) velocity at the control points, including the induced one
+    :return: (N,) normal velocity V . n at the control points, zero for an exact solution
+    """
+    normals = calc_panels_geometry(get_panels_corners(panels)).normals
+    return np.sum(np.asarray(V_app_fw) * normals, axis=-1)
+
+
+def estimate_condition_number(A, lu_piv=None):
+    """
+    1-norm condition number estimate of the AIC from its LU factors, no inverse is formed.
+
+    :param lu_piv: factorization of A, see factorize_sys_of_eq; A is factorized when missing
+    :return: estimate of ||A||_1 ||A^-1||_1, inf for a singular matrix
+    """
+    from scipy.linalg.lapack import get_lapack_funcs
+
+    if lu_piv is None:
+        lu_piv = factorize_sys_of_eq(A)
+    lu = lu_piv[0]
+    gecon, = get_lapack_funcs(('gecon',), (lu,))
+    with stage("condition_estimate", unknowns=len(lu)):
+        rcond, info = gecon(lu, np.linalg.norm(A, 1), norm='1')
+    if info != 0:
+        raise ValueError("Condition number estimate failed, gecon info = %d" % info)
+    return np.inf if rcond == 0. else 1. / rcond
+
+
+def _distance_to_semi_infinite_lines(points, starts, direction):
+    ap = points[:, None, :] - starts[None, :, :]
+    t = np.maximum(np.einsum('ijk,k->ij', ap, direction), 0.)
+    return np.linalg.norm(ap - t[..., None] * direction, axis=-1)
+
+
+def _distance_to_segments(points, A, B):
+    ap = points[:, None, :] - A[None, :, :]
+    ab = B - A
+    t = np.clip(np.einsum('ijk,jk->ij', ap, ab) / np.sum(ab * ab, axis=-1), 0., 1.)
+    return np.linalg.norm(ap - t[..., None] * ab, axis=-1)
+
+
+def calc_mesh_quality(panels, wake_direction=None, block_bytes=1 << 26):
+    """
+    :param panels: array of Panels or (N, 4, 3) corners
+    :param wake_direction: direction of the trailing legs, by default the mean chord direction
+    :param block_bytes: size of the temporaries of one block of control points, the core distances
+                        take O(N^2) operations but only O(N * block) memory
+    :return: dict of (N,) arrays
+        'aspect_ratio' - longer to shorter of the chordwise length and the spanwise width, >= 1
+        'skew_deg' - deviation of the angle between the chordwise and spanwise median lines from 90 deg
+        'warp' - see calc_panels_warp
+        'core_distance' - distance of the control point from the closest bound vortex or trailing leg
+                          of the other horseshoes, divided by the square root of the panel area
+    """
+    corners = get_panels_corners(panels)
+    p1, p2, p3, p4 = [corners[:, k, :] for k in range(4)]
+    geometry = calc_panels_geometry(corners)
+    N = len(corners)
+
+    chordwise = 0.5 * (p1 + p4) - 0.5 * (p2 + p3)
+    spanwise = 0.5 * (p3 + p4) - 0.5 * (p1 + p2)
+    length, width = np.linalg.norm(chordwise, axis=-1), np.linalg.norm(spanwise, axis=-1)
+    aspect_ratio = np.maximum(length, width) / np.minimum(length, width)
+    cos_angle = np.sum(chordwise * spanwise, axis=-1) / (length * width)
+    skew_deg = np.rad2deg(np.arcsin(np.clip(np.abs(cos_angle), 0., 1.)))
+
+    if wake_direction is None:
+        wake_direction = np.mean(chordwise, axis=0)
+    wake_direction = np.asarray(wake_direction, dtype=float) / np.linalg.norm(wake_direction)
+
+    core_distance = np.full(N, np.inf)
+    # a few (block, N, 3) temporaries
+    block = max(1, block_bytes // (8 * 3 * 4 * max(N, 1)))
+    with stage("mesh_quality", panels=N):
+        for start in range(0, N if N > 1 else 0, block):
+            rows = np.arange(start, min(start + block, N))
+            ctr_p = geometry.ctr_p[rows]
+            distance = np.minimum(_distance_to_segments(ctr_p, geometry.B, geometry.C),
+                                  np.minimum(_distance_to_semi_infinite_lines(ctr_p, geometry.B, wake_direction),
+                                             _distance_to_semi_infinite_lines(ctr_p, geometry.C, wake_direction)))
+            distance[np.arange(len(rows)), rows] = np.inf  # own horseshoe, regular by construction
+            core_distance[rows] = np.min(distance, axis=1) / np.sqrt(geometry.areas[rows])
+
+    return {'aspect_ratio': aspect_ratio, 'skew_deg': skew_deg, 'warp': calc_panels_warp(corners),
+            'core_distance': core_distance}
+
+
+def check_mesh_quality(panels, max_aspect_ratio=50., max_skew_deg=60., max_warp=0.05, min_core_distance=1e-3,
+                       wake_direction=None):
+    """
+    Reject bad meshes before the assembly.
+
+    :return: dict of the metrics, see calc_mesh_quality
+    :raises ValueError: listing every violated limit
+    """
+    quality = calc_mesh_quality(panels, wake_direction=wake_direction)
+    checks = [('aspect_ratio', quality['aspect_ratio'] > max_aspect_ratio, max_aspect_ratio, 'above'),
+              ('skew_deg', quality['skew_deg'] > max_skew_deg, max_skew_deg, 'above'),
+              ('warp', quality['warp'] > max_warp, max_warp, 'above'),
+              ('core_distance', quality['core_distance'] < min_core_distance, min_core_distance, 'below')]
+
+    problems = []
+    for name, bad, limit, side in checks:
+        if np.any(bad):
+            worst = np.flatnonzero(bad)
+            problems.append("%d panels with %s %s %g (i.e. panel %d: %g)"
+                            % (len(worst), name, side, limit, worst[0], quality[name][worst[0]]))
+    if problems:
+        raise ValueError("Bad mesh: " + "; ".join(problems))
+    return quality
+
+
+class SolutionDiagnostics(object):
+    """
+    :ivar residuals: (N,) normal flux through the panels, see calc_flux_residuals
+    :ivar max_residual, rms_residual: relative to the freestream speed
+    :ivar worst_panel: index of the max residual
+    :ivar condition_number: estimate, None when the AIC was not given
+    """
+
+    def __init__(self, residuals, V_ref, condition_number=None):
+        self.residuals = residuals
+        self.worst_panel = int(np.argmax(np.abs(residuals)))
+        self.max_residual = float(np.abs(residuals[self.worst_panel]) / V_ref)
+        self.rms_residual = float(np.sqrt(np.mean(residuals ** 2)) / V_ref)
+        self.condition_number = condition_number
+
+    def is_acceptable(self, tol=1e-10, max_condition_number=1e12):
+        return self.max_residual <= tol and (self.condition_number is None
+                                             or self.condition_number <= max_condition_number)
+
+    def format_table(self):
+        lines = ["max residual  %10.3e (panel %d)" % (self.max_residual, self.worst_panel),
+                 "rms residual  %10.3e" % self.rms_residual]
+        if self.condition_number is not None:
+            lines.append("condition     %10.3e" % self.condition_number)
+        return "\n".join(lines)
+
+
+def diagnose_solution(V_app_infw, panels, gamma_magnitude, v_ind_coeff, A=None, lu_piv=None):
+    """
+    :param v_ind_coeff: (N, N, 3) influence at the control points, see assembly_sys_of_eq
+    :param A: optional AIC, for the condition number estimate (lu_piv - its factors, if available)
+    :return: SolutionDiagnostics
+    """
+    V_app_infw = np.broadcast_to(np.asarray(V_app_infw, dtype=float), (len(gamma_magnitude), 3))
+    V_app_fw = V_app_infw + calc_induced_velocity(v_ind_coeff, gamma_magnitude)
+    residuals = calc_flux_residuals(V_app_fw, panels)
+    V_ref = np.max(np.linalg.norm(V_app_infw, axis=-1))
+    condition_number = estimate_condition_number(A, lu_piv) if A is not None else None
+    return SolutionDiagnostics(residuals, V_ref, condition_number)
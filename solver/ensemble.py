@@ -0,0 +1,143 @@
+"""
+    Ensembles of small design candidates.
+
+    A population of same-sized meshes (i.e. one generation of a planform optimizer)
+    is assembled and solved at once - the AICs of all designs are built as one
+    (n_designs, N, N) batch by broadcasting and solved with the batched np.linalg.solve.
+    No Panels are created and there is one call per block of designs instead of per design,
+    for meshes of a few hundred panels the python overhead of the single design path dominates.
+
+    example
+
+    points = np.stack([le_SW, te_SE, le_NW, te_NE], axis=1)  # (n_designs, 4, 3)
+    meshes = make_meshes_from_points(points, [nc, ns])
+    result = solve_ensemble(meshes, V_app_infw=[10, 0, 1], rho=1.225)
+    best = np.argmax(result.CL / result.CD)
+"""
+
+import numpy as np
+
+from solver.mesher import mesh_to_corners
+from solver.panel import calc_panels_geometry
+from solver.forces import calc_kutta_joukowski_forces
+from solver.kernels import get_kernel_backend
+from solver.profiling import stage
+
+
+def make_meshes_from_points(points, grid_size):
+    """
+    Vectorized make_panels_from_points, the meshes only.
+
+    :param points: (n_designs, 4, 3) le_SW, te_SE, le_NW, te_NE of every design
+    :param grid_size: [nc, ns], the same for all designs
+    :return: (n_designs, nc + 1, ns + 1, 3)
+    """
+    points = np.asarray(points, dtype=float)
+    le_SW, te_SE, le_NW, te_NE = [points[:, None, None, k, :] for k in range(4)]
+    nc, ns = grid_size
+    t = (np.arange(nc + 1) / float(nc))[:, None, None]  # chordwise
+    s = (np.arange(ns + 1) / float(ns))[None, :, None]  # spanwise
+    south_line = le_SW + t * (te_SE - le_SW)
+    north_line = le_NW + t * (te_NE - le_NW)
+    return south_line + s * (north_line - south_line)
+
+
+def calc_ensemble_v_ind_coeff(points, geometry, V_app_infw):
+    """
+    Batched calc_horseshoe_v_ind_coeff.
+
+    :param points: (n_designs, M, 3)
+    :param geometry: PanelsGeometry of (n_designs, N) panels
+    :param V_app_infw: (n_designs, N, 3), the legs of the horseshoes point along it
+    :return: (n_designs, M, N, 3)
+    """
+    return get_kernel_backend().horseshoe_vortices(points, geometry.B, geometry.C, V_app_infw)
+
+
+def assembly_ensemble(V_app_infw, corners):
+    """
+    Batched assembly_sys_of_eq.
+
+    :param V_app_infw: (n_designs, N, 3)
+    :param corners: (n_designs, N, 4, 3), see mesh_to_corners
+    :return: A (n_designs, N, N), RHS (n_designs, N), v_ind_coeff (n_designs, N, N, 3)
+    """
+    geometry = calc_panels_geometry(corners)
+    v_ind_coeff = calc_ensemble_v_ind_coeff(geometry.ctr_p, geometry, V_app_infw)
+    A = np.einsum('dijk,dik->dij', v_ind_coeff, geometry.normals)
+    RHS = -np.sum(V_app_infw * geometry.normals, axis=-1)
+    return A, RHS, v_ind_coeff
+
+
+class EnsembleResult(object):
+    """
+    Stacked results, the first axis is the design.
+
+    :ivar gamma_magnitude: (n_designs, N)
+    :ivar force: (n_designs, N, 3)
+    :ivar total_force: (n_designs, 3)
+    :ivar S: (n_designs,) reference areas
+    :ivar CL, CD: (n_designs,)
+    """
+
+    def __init__(self, gamma_magnitude, force, S, q, lift_direction, drag_direction):
+        self.gamma_magnitude = gamma_magnitude
+        self.force = force
+        self.total_force = np.sum(force, axis=1)
+        self.S = S
+        self.CL = np.dot(self.total_force, lift_direction) / (q * S)
+        self.CD = np.dot(self.total_force, drag_direction) / (q * S)
+
+    def __len__(self):
+        return len(self.gamma_magnitude)
+
+
+def _design_blocks(n_designs, N, block_bytes):
+    # the largest temporaries are a few (designs, N, N, 3) arrays
+    designs = max(1, block_bytes // (8 * 3 * 4 * max(N * N, 1)))
+    for start in range(0, n_designs, designs):
+        yield slice(start, min(start + designs, n_designs))
+
+
+def solve_ensemble(meshes, V_app_infw, rho=1., S=None, lift_direction=(0, 0, 1), drag_direction=(1, 0, 0),
+                   block_bytes=1 << 26):
+    """
+    :param meshes: (n_designs, nc + 1, ns + 1, 3) same-sized meshes, see make_meshes_from_points
+    :param V_app_infw: (3,), (n_designs, 3) - one per design or (n_designs, N, 3) - one per panel,
+                       a per panel inflow shared by all designs is given as (1, N, 3)
+    :param S: reference areas (n_designs,) or scalar, by default the areas of the meshes
+    :param block_bytes: size of the temporaries of one block of designs
+    :return: EnsembleResult
+    """
+    corners = mesh_to_corners(meshes)
+    n_designs, N = corners.shape[:2]
+    V_app_infw = np.asarray(V_app_infw, dtype=float)
+    if V_app_infw.ndim == 2:
+        if V_app_infw.shape != (n_designs, 3):
+            raise ValueError("V_app_infw of shape %s, a 2D inflow is one per design (%d, 3), "
+                             "give a per panel one as (1, N, 3)" % (V_app_infw.shape, n_designs))
+        V_app_infw = V_app_infw[:, None, :]
+    V_app_infw = np.broadcast_to(V_app_infw, (n_designs, N, 3))
+
+    gamma_magnitude = np.empty((n_designs, N))
+    force = np.empty((n_designs, N, 3))
+    areas = np.empty(n_designs)
+    with stage("solve_ensemble", designs=n_designs, panels=n_designs * N,
+               horseshoe_kernel_calls=2 * n_designs * N * N):
+        for block in _design_blocks(n_designs, N, block_bytes):
+            V = V_app_infw[block]
+            A, RHS, _ = assembly_ensemble(V, corners[block])
+            gamma = np.linalg.solve(A, RHS[..., None])[..., 0]
+
+            geometry = calc_panels_geometry(corners[block])
+            v_ind_coeff = calc_ensemble_v_ind_coeff(geometry.cp, geometry, V)
+            V_at_cp = V + np.einsum('dijk,dj->dik', v_ind_coeff, gamma)
+            force[block] = calc_kutta_joukowski_forces(V_at_cp, gamma, geometry, rho=rho)
+            gamma_magnitude[block] = gamma
+            areas[block] = np.sum(geometry.areas, axis=-1)
+
+    if S is None:
+        S = areas
+    q = 0.5 * rho * np.sum(np.square(np.mean(V_app_infw, axis=1)), axis=-1)
+    return EnsembleResult(gamma_magnitude, force, np.broadcast_to(np.asarray(S, dtype=float), (n_designs,)), q,
+                          lift_direction, drag_direction)
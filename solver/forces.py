@@ -1,9 +1,12 @@
 import numpy as np
-from solver.vlm_solver import calc_induced_velocity
+from solver.vlm_solver import \
+    calc_induced_velocity, \
+    calc_horseshoe_v_ind_coeff
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.profiling import stage
 
 
 def calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1):
-    from solver.vortices import v_induced_by_semi_infinite_vortex_line, v_induced_by_finite_vortex_line
     """
     force = rho* (V_app_fw_at_cp x gamma)
     :param V: apparent wind finite sail (including all induced velocities) at control point
@@ -14,36 +17,59 @@ def calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1):
 
     panels_1d = panels.flatten()
     N = len(panels_1d)
-    v_ind_coeff = np.full((N, N, 3), 0., dtype=float)
 
-    for i in range(0, N):
-        cp = panels_1d[i].get_cp_position()
-        for j in range(0, N):
-            # velocity induced at i-th control point by j-th vortex
-            v_ind_coeff[i][j] = panels_1d[j].get_horse_shoe_induced_velocity(cp, V_app_infw[j])
+    with stage("calc_force_wrapper", panels=N, horseshoe_kernel_calls=N * N):
+        v_ind_coeff = calc_v_ind_coeff_at_cp(V_app_infw, panels)
+        force = calc_forces(V_app_infw, gamma_magnitude, v_ind_coeff, panels, rho=rho)
+
+    return force
+
+
+def calc_v_ind_coeff_at_cp(V_app_infw, panels):
+    """
+    Velocity induced at the centre of pressure of each panel by the unit horseshoe vortices.
+    It depends only on the geometry and on the direction of V_app_infw,
+    thus it can be reused for all cases differing only in speed or density.
+    :return: v_ind_coeff (N, N, 3)
+    """
+    geometry = calc_panels_geometry(get_panels_corners(panels))
+    v_ind_coeff = calc_horseshoe_v_ind_coeff(geometry.cp, geometry, V_app_infw)
+    return v_ind_coeff
+
+
+def calc_forces(V_app_infw, gamma_magnitude, v_ind_coeff, panels, rho=1):
+    """
+    force = rho* (V_app_fw_at_cp x gamma)
+    :param v_ind_coeff: velocity induced at centres of pressure, see calc_v_ind_coeff_at_cp
+    :return: force (N, 3)
+    """
+    geometry = calc_panels_geometry(get_panels_corners(panels))
 
     V_induced = calc_induced_velocity(v_ind_coeff, gamma_magnitude)
     V_at_cp = V_app_infw + V_induced
 
-    force = np.full((N, 3), 0., dtype=float)
-    for i in range(0, N):
-        [A, B, C, D] = panels_1d[i].get_vortex_ring_position()
-        bc = C - B
-        gamma = bc * gamma_magnitude[i]
-        force[i] = rho * np.cross(V_at_cp[i], gamma)
+    return calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, geometry, rho=rho)
 
-    return force
+
+def calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, geometry, rho=1):
+    """
+    force = rho* (V_at_cp x gamma), gamma = (C - B) * gamma_magnitude
+    :param V_at_cp: (..., N, 3) velocity at the centres of pressure, including the induced one
+    :param gamma_magnitude: (..., N) circulation, the leading dimensions are batches of cases
+    :param geometry: PanelsGeometry of the N panels, already calculated
+    :param rho: scalar or broadcastable to the batch dimensions
+    :return: force (..., N, 3)
+    """
+    gamma = (geometry.C - geometry.B) * gamma_magnitude[..., None]
+    rho = np.asarray(rho, dtype=float)
+    return rho[..., None, None] * np.cross(V_at_cp, gamma)
 
 
 def calc_pressure(force, panels):
-    panels_1d = panels.flatten()
-
-    n = len(panels_1d)
-    p = np.zeros(shape=n)
+    geometry = calc_panels_geometry(get_panels_corners(panels))
 
-    for i in range(n):
-        area = panels_1d[i].get_panel_area()
-        n = panels_1d[i].get_normal_to_panel()
-        p[i] = np.dot(force[i], n) / area
+    n = len(geometry.areas)
+    with stage("calc_pressure", panels=n):
+        p = np.sum(force * geometry.normals, axis=-1) / geometry.areas
 
     return p
@@ -0,0 +1,241 @@
+"""
+    Biot-Savart kernel backends.
+
+    Every backend evaluates the velocity induced at M points by N unit horseshoe vortices
+    (bound segment B->C, semi-infinite legs from B and C along r0) as (M, N, 3) arrays:
+
+        bound_vortices(points, B, C)
+        trailing_vortices(points, B, C, r0)
+        horseshoe_vortices(points, B, C, r0) - both of the above
+
+    Leading dimensions are treated as a stack of independent problems:
+    points (..., M, 3), B, C, r0 (..., N, 3) give (..., M, N, 3), see solver.ensemble.
+
+    Backends:
+        'numpy' - the broadcast kernels of solver.vortices, the reference
+        'fused' - one pass over the target points in blocks, the distances, norms and cross products
+                  are shared by the bound segment and the legs, fewer and smaller temporaries
+        'numba' - compiled loops, parallel over the target points, no temporaries;
+                  available when numba is installed
+
+    The backend is selected with set_kernel_backend(name), the PYVLM_KERNEL_BACKEND environment
+    variable or the `backend` argument of get_kernel_backend. Default: 'fused'.
+"""
+
+import math
+import os
+import threading
+import types
+
+import numpy as np
+
+from solver.vortices import v_induced_by_finite_vortex_lines, v_induced_by_semi_infinite_vortex_lines
+
+DEFAULT_BACKEND = 'fused'
+CORE_RADIUS = 1e-9  # as in v_induced_by_finite_vortex_lines
+
+_backend_name = os.environ.get('PYVLM_KERNEL_BACKEND', DEFAULT_BACKEND)
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+class NumpyBackend(object):
+    name = 'numpy'
+
+    def bound_vortices(self, points, B, C):
+        return v_induced_by_finite_vortex_lines(points[..., :, None, :], B[..., None, :, :], C[..., None, :, :])
+
+    def trailing_vortices(self, points, B, C, r0):
+        r0 = r0[..., None, :, :]
+        v_ind = v_induced_by_semi_infinite_vortex_lines(points[..., :, None, :], C[..., None, :, :], r0)
+        v_ind += v_induced_by_semi_infinite_vortex_lines(points[..., :, None, :], B[..., None, :, :], r0, gamma=-1)
+        return v_ind
+
+    def horseshoe_vortices(self, points, B, C, r0):
+        return self.bound_vortices(points, B, C) + self.trailing_vortices(points, B, C, r0)
+
+
+class FusedBackend(NumpyBackend):
+    """
+    :param block_bytes: size of the temporaries of one block of target points
+    """
+    name = 'fused'
+
+    def __init__(self, block_bytes=1 << 25):
+        self.block_bytes = block_bytes
+
+    def _blocks(self, M, N, batch=1):
+        rows = max(1, self.block_bytes // (8 * 3 * 4 * max(N * batch, 1)))
+        for start in range(0, M, rows):
+            yield slice(start, min(start + rows, M))
+
+    @staticmethod
+    def _bound_block(a, b, norm_a, norm_b, out):
+        """
+        |C - B| terms rearranged: (C - B) . (a/|a| - b/|b|) = (|a| + |b|) (1 - a.b / (|a| |b|)),
+        a = P - B, b = P - C
+        """
+        c = np.cross(a, b)
+        norm_c2 = np.einsum('...k,...k->...', c, c)
+        core = (norm_a < CORE_RADIUS) | (norm_b < CORE_RADIUS) | (norm_c2 < CORE_RADIUS ** 2)
+        norm_ab = np.where(core, 1., norm_a * norm_b)
+        f = (norm_a + norm_b) * (1. - np.einsum('...k,...k->...', a, b) / norm_ab)
+        f /= np.where(core, 1., norm_c2)
+        f[core] = 0.
+        f *= 1. / (4 * np.pi)
+        out += c * f[..., None]
+
+    @staticmethod
+    def _legs_block(a, b, norm_a, norm_b, u, out):
+        # leg from C: + u x b / (|b| (|b| - u.b)), leg from B: - u x a / (|a| (|a| - u.a))
+        k = 1. / (4 * np.pi)
+        out += np.cross(u, b) * (k / (norm_b * (norm_b - np.einsum('...k,...k->...', u, b))))[..., None]
+        out -= np.cross(u, a) * (k / (norm_a * (norm_a - np.einsum('...k,...k->...', u, a))))[..., None]
+
+    def _evaluate(self, points, B, C, r0, bound, legs):
+        points = np.asarray(points, dtype=float)
+        batch = points.shape[:-2]
+        out = np.zeros(batch + (points.shape[-2], B.shape[-2], 3))
+        if legs:
+            u = r0 / np.sqrt(np.einsum('...k,...k->...', r0, r0))[..., None]
+            u = u[..., None, :, :]
+        for rows in self._blocks(points.shape[-2], B.shape[-2], int(np.prod(batch))):
+            a = points[..., rows, None, :] - B[..., None, :, :]
+            b = points[..., rows, None, :] - C[..., None, :, :]
+            norm_a = np.sqrt(np.einsum('...k,...k->...', a, a))
+            norm_b = np.sqrt(np.einsum('...k,...k->...', b, b))
+            if bound:
+                self._bound_block(a, b, norm_a, norm_b, out[..., rows, :, :])
+            if legs:
+                self._legs_block(a, b, norm_a, norm_b, u, out[..., rows, :, :])
+        return out
+
+    def bound_vortices(self, points, B, C):
+        return self._evaluate(points, B, C, None, bound=True, legs=False)
+
+    def trailing_vortices(self, points, B, C, r0):
+        return self._evaluate(points, B, C, np.asarray(r0, dtype=float), bound=False, legs=True)
+
+    def horseshoe_vortices(self, points, B, C, r0):
+        return self._evaluate(points, B, C, np.asarray(r0, dtype=float), bound=True, legs=True)
+
+
+prange = range  # numba.prange in the copy compiled by NumbaBackend, numba is not imported with the module
+
+
+def _horseshoe_loops(points, B, C, r0, out, bound, legs):
+    """
+    Scalar loops over targets i and vortices j, compiled by NumbaBackend (prange - parallel over targets).
+    Plain Python when numba is missing - usable on tiny inputs only, i.e. to test the loops.
+    """
+    k = 1. / (4. * math.pi)
+    for i in prange(points.shape[0]):
+        for j in range(B.shape[0]):
+            ax = points[i, 0] - B[j, 0]
+            ay = points[i, 1] - B[j, 1]
+            az = points[i, 2] - B[j, 2]
+            bx = points[i, 0] - C[j, 0]
+            by = points[i, 1] - C[j, 1]
+            bz = points[i, 2] - C[j, 2]
+            norm_a = math.sqrt(ax * ax + ay * ay + az * az)
+            norm_b = math.sqrt(bx * bx + by * by + bz * bz)
+            vx = 0.
+            vy = 0.
+            vz = 0.
+            if bound:
+                cx = ay * bz - az * by
+                cy = az * bx - ax * bz
+                cz = ax * by - ay * bx
+                norm_c2 = cx * cx + cy * cy + cz * cz
+                if norm_a >= 1e-9 and norm_b >= 1e-9 and norm_c2 >= 1e-18:
+                    f = (norm_a + norm_b) * (1. - (ax * bx + ay * by + az * bz) / (norm_a * norm_b))
+                    f *= k / norm_c2
+                    vx += f * cx
+                    vy += f * cy
+                    vz += f * cz
+            if legs:
+                norm_r0 = math.sqrt(r0[j, 0] * r0[j, 0] + r0[j, 1] * r0[j, 1] + r0[j, 2] * r0[j, 2])
+                ux = r0[j, 0] / norm_r0
+                uy = r0[j, 1] / norm_r0
+                uz = r0[j, 2] / norm_r0
+                fb = k / (norm_b * (norm_b - (ux * bx + uy * by + uz * bz)))
+                fa = k / (norm_a * (norm_a - (ux * ax + uy * ay + uz * az)))
+                vx += fb * (uy * bz - uz * by) - fa * (uy * az - uz * ay)
+                vy += fb * (uz * bx - ux * bz) - fa * (uz * ax - ux * az)
+                vz += fb * (ux * by - uy * bx) - fa * (ux * ay - uy * ax)
+            out[i, j, 0] = vx
+            out[i, j, 1] = vy
+            out[i, j, 2] = vz
+
+
+class NumbaBackend(NumpyBackend):
+    name = 'numba'
+
+    def __init__(self, loops=None):
+        if loops is None:
+            import numba  # optional dependency
+            parallel_loops = types.FunctionType(_horseshoe_loops.__code__,
+                                                dict(_horseshoe_loops.__globals__, prange=numba.prange),
+                                                _horseshoe_loops.__name__)
+            loops = numba.njit(parallel=True, cache=True)(parallel_loops)
+        self._loops = loops
+
+    def _evaluate(self, points, B, C, r0, bound, legs):
+        points = np.asarray(points, dtype=float)
+        B, C = np.asarray(B, dtype=float), np.asarray(C, dtype=float)
+        if r0 is None:
+            r0 = np.ones_like(B)
+        r0 = np.asarray(r0, dtype=float)
+        if points.ndim > 2:  # a stack of problems, one compiled call each
+            return np.array([self._evaluate(p, b, c, r, bound, legs) for p, b, c, r in zip(points, B, C, r0)])
+        out = np.empty((len(points), len(B), 3))
+        self._loops(np.ascontiguousarray(points), np.ascontiguousarray(B), np.ascontiguousarray(C),
+                    np.ascontiguousarray(r0), out, bound, legs)
+        return out
+
+    def bound_vortices(self, points, B, C):
+        return self._evaluate(points, B, C, None, bound=True, legs=False)
+
+    def trailing_vortices(self, points, B, C, r0):
+        return self._evaluate(points, B, C, r0, bound=False, legs=True)
+
+    def horseshoe_vortices(self, points, B, C, r0):
+        return self._evaluate(points, B, C, r0, bound=True, legs=True)
+
+
+BACKENDS = {'numpy': NumpyBackend, 'fused': FusedBackend, 'numba': NumbaBackend}
+
+
+def available_backends():
+    names = ['numpy', 'fused']
+    try:
+        import numba  # noqa: F401
+        names.append('numba')
+    except ImportError:
+        pass
+    return names
+
+
+def get_kernel_backend(backend=None):
+    """
+    :param backend: name, by default the one chosen by set_kernel_backend / PYVLM_KERNEL_BACKEND
+    :return: backend instance, created once per name; the backends keep no state between calls,
+             one instance serves many threads
+    """
+    name = backend or _backend_name
+    if name not in BACKENDS:
+        raise ValueError("Unknown kernel backend '%s', choose one of %s" % (name, sorted(BACKENDS)))
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+def set_kernel_backend(name):
+    """
+    :return: name of the previous backend
+    """
+    global _backend_name
+    get_kernel_backend(name)  # fail early, i.e. when numba is missing
+    previous, _backend_name = _backend_name, name
+    return previous
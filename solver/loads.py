@@ -0,0 +1,83 @@
+"""
+    Aggregation of the per-panel forces returned by calc_force_wrapper.
+
+    All functions are reductions over the flattened (nc, ns) panel grid,
+    panels[i][j]: i - chordwise index, j - spanwise index, see make_panels_from_mesh.
+"""
+
+import numpy as np
+
+
+def calc_total_force_and_moments(force, cp, reference_points=(0, 0, 0)):
+    """
+    Moments about many reference points at once: M_r = sum(cp x F) - r x sum(F)
+
+    :param force: (N, 3)
+    :param cp: (N, 3) points of application, i.e. PanelsGeometry.cp
+    :param reference_points: (3,) or (R, 3)
+    :return: total force (3,), moments (3,) or (R, 3)
+    """
+    reference_points = np.asarray(reference_points, dtype=float)
+    total_force = np.sum(force, axis=0)
+    moment_about_origin = np.sum(np.cross(cp, force), axis=0)
+    moments = moment_about_origin - np.cross(reference_points, total_force)
+    return total_force, moments
+
+
+def calc_centre_of_effort(force, cp):
+    """
+    Centre of effort - centres of pressure weighted by the panel force component
+    along the resultant force.
+    :return: (3,)
+    """
+    total_force = np.sum(force, axis=0)
+    weights = np.dot(force, total_force / np.linalg.norm(total_force))
+    return np.dot(weights, cp) / np.sum(weights)
+
+
+def calc_strip_loads(force, geometry, grid_size, q=1., lift_direction=(0, 0, 1), drag_direction=(1, 0, 0)):
+    """
+    Spanwise load distribution, the panels of each spanwise strip are summed over the chord.
+
+    :param geometry: PanelsGeometry of the flattened panels
+    :param grid_size: [nc, ns]
+    :param q: dynamic pressure, 0.5 * rho * V^2
+    :return: dict with
+        'force' (ns, 3) - strip forces,
+        'position' (ns, 3) - force weighted mean centre of pressure of each strip,
+        'area' (ns,), 'chord' (ns,) - strip area / strip width,
+        'cl', 'cd' (ns,) - sectional coefficients based on the strip area
+    """
+    nc, ns = grid_size
+    force_grid = np.reshape(force, (nc, ns, 3))
+    area_grid = np.reshape(geometry.areas, (nc, ns))
+    cp_grid = np.reshape(geometry.cp, (nc, ns, 3))
+
+    strip_force = np.sum(force_grid, axis=0)
+    strip_area = np.sum(area_grid, axis=0)
+    width = np.mean(np.reshape(np.linalg.norm(geometry.C - geometry.B, axis=-1), (nc, ns)), axis=0)
+
+    weights = np.linalg.norm(force_grid, axis=-1)
+    weights = np.where(np.sum(weights, axis=0) > 0, weights, 1.)
+    position = np.sum(cp_grid * weights[..., None], axis=0) / np.sum(weights, axis=0)[:, None]
+
+    return {'force': strip_force,
+            'position': position,
+            'area': strip_area,
+            'chord': strip_area / width,
+            'cl': np.dot(strip_force, lift_direction) / (q * strip_area),
+            'cd': np.dot(strip_force, drag_direction) / (q * strip_area)}
+
+
+def calc_chordwise_pressure(pressure, geometry, grid_size):
+    """
+    :param pressure: (N,) see calc_pressure
+    :return: dict with
+        'dp' (nc, ns) - pressure difference across the panels,
+        'x_over_c' (nc, ns) - chordwise position of the centres of pressure, as a fraction of the strip area
+    """
+    nc, ns = grid_size
+    area_grid = np.reshape(geometry.areas, (nc, ns))
+    leading_area = np.cumsum(area_grid, axis=0) - area_grid
+    x_over_c = (leading_area + 0.25 * area_grid) / np.sum(area_grid, axis=0)
+    return {'dp': np.reshape(pressure, (nc, ns)), 'x_over_c': x_over_c}
@@ -1,5 +1,7 @@
 import numpy as np
-from solver.panel import Panel
+from solver.panel import Panel, check_panels_warp
+from solver.geometry_calc import rotation_matrix
+from solver.profiling import stage
 
 
 def join_panels(panels1, panels2):
@@ -26,11 +28,13 @@ def make_panels_from_points(points, grid_size):
     """
     le_SW, te_SE, le_NW, te_NE = points
     nc, ns = grid_size
-    south_line = discrete_segment(le_SW, te_SE, nc)
-    north_line = discrete_segment(le_NW, te_NE, nc)
+    with stage("make_panels_from_points", panels=nc * ns) as s:
+        south_line = discrete_segment(le_SW, te_SE, nc)
+        north_line = discrete_segment(le_NW, te_NE, nc)
 
-    mesh = make_point_mesh(south_line, north_line, ns)
-    panels = make_panels_from_mesh(mesh)
+        mesh = make_point_mesh(south_line, north_line, ns)
+        panels = make_panels_from_mesh(mesh)
+        s.count(allocated_bytes=mesh.nbytes)
     return panels, mesh
 
 def discrete_segment(p1, p2, n):
@@ -52,7 +56,7 @@ def make_point_mesh(segment1, segment2, n):
 
     return np.array(mesh)
 
-def make_panels_from_mesh(mesh):
+def make_panels_from_mesh(mesh, check_in_plane=True):
     panels = []
 
     n_lines = mesh.shape[0]
@@ -68,7 +72,118 @@ def make_panels_from_mesh(mesh):
             panel = Panel(p1 = pSE,
                           p2 = pSW,
                           p4 = pNE,
-                          p3 = pNW)
+                          p3 = pNW,
+                          check_in_plane=check_in_plane)
             panels[i].append(panel)
 
     return np.array(panels)  # TODO
+
+
+def mesh_to_corners(mesh):
+    """
+    :param mesh: (..., nc + 1, ns + 1, 3) point grid, mesh[i][j]: i - chordwise, j - spanwise
+    :return: (..., nc * ns, 4, 3) corners of the panels made by make_panels_from_mesh
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    corners = np.stack([mesh[..., 1:, :-1, :], mesh[..., :-1, :-1, :],
+                        mesh[..., :-1, 1:, :], mesh[..., 1:, 1:, :]], axis=-2)
+    return corners.reshape(mesh.shape[:-3] + (-1, 4, 3))
+
+
+def make_panels_from_grid(mesh, warp_tol=0.05):
+    """
+    Panels of an arbitrary (cambered, twisted) point grid. Warped panels are accepted
+    as long as their warp (see calc_panels_warp) does not exceed warp_tol,
+    the whole mesh is checked at once, the normals are taken to the mean planes of the panels.
+
+    :param mesh: (nc + 1, ns + 1, 3), mesh[0] - leading edge, mesh[-1] - trailing edge
+    :return: panels, mesh
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    nc, ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+    with stage("make_panels_from_grid", panels=nc * ns) as s:
+        check_panels_warp(mesh_to_corners(mesh), tol=warp_tol)
+        panels = make_panels_from_mesh(mesh, check_in_plane=False)
+        s.count(allocated_bytes=mesh.nbytes)
+    return panels, mesh
+
+
+def naca_camber_line(m, p):
+    """
+    NACA 4 digit mean line, i.e. NACA 2412: m = 0.02, p = 0.4
+    :return: function x/c -> z/c
+    """
+    def camber(x):
+        x = np.asarray(x, dtype=float)
+        front = m / p ** 2 * (2 * p * x - x ** 2)
+        rear = m / (1 - p) ** 2 * ((1 - 2 * p) + 2 * p * x - x ** 2)
+        return np.where(x < p, front, rear)
+    return camber
+
+
+def make_cambered_mesh(points, grid_size, camber=None, twist_deg=None):
+    """
+    Mesh of a cambered and twisted wing spanned between the same four points as in make_panels_from_points.
+
+    :param points: le_SW, te_SE, le_NW, te_NE
+    :param grid_size: [nc, ns]
+    :param camber: function x/c -> z/c (see naca_camber_line) or an array (nc + 1,) / (nc + 1, ns + 1) of z/c.
+                   z points along (te_SE - le_SW) x (le_NW - le_SW), the side of the normals.
+    :param twist_deg: (ns + 1,) or scalar, nose up rotation of the sections about their leading edge
+    :return: (nc + 1, ns + 1, 3) mesh
+    """
+    le_SW, te_SE, le_NW, te_NE = [np.asarray(p, dtype=float) for p in points]
+    nc, ns = grid_size
+
+    leading_edge = discrete_segment(le_SW, le_NW, ns)
+    chords = discrete_segment(te_SE, te_NE, ns) - leading_edge
+    chord_lengths = np.linalg.norm(chords, axis=-1)
+
+    span_axis = le_NW - le_SW
+    span_axis /= np.linalg.norm(span_axis)
+    up = np.cross(te_SE - le_SW, span_axis)
+    up /= np.linalg.norm(up)
+
+    x_over_c = np.linspace(0., 1., nc + 1)
+    z_over_c = np.zeros((nc + 1, ns + 1))
+    if callable(camber):
+        z_over_c += camber(x_over_c)[:, None]
+    elif camber is not None:
+        z_over_c += np.reshape(camber, (nc + 1, -1))
+
+    sections = x_over_c[:, None, None] * chords[None] \
+        + (z_over_c * chord_lengths[None])[..., None] * up
+
+    if twist_deg is not None:
+        twist = np.broadcast_to(np.deg2rad(twist_deg), (ns + 1,))
+        # rotation about +span_axis turns the trailing edge of a wing along +x, +y down - nose up
+        R = np.array([rotation_matrix(span_axis, t) for t in twist])
+        sections = np.einsum('jkl,ijl->ijk', R, sections)
+
+    return leading_edge[None] + sections
+
+
+def make_cambered_panels(points, grid_size, camber=None, twist_deg=None, warp_tol=0.05):
+    """
+    make_panels_from_points with camber and twist, see make_cambered_mesh
+    :return: panels, mesh
+    """
+    mesh = make_cambered_mesh(points, grid_size, camber=camber, twist_deg=twist_deg)
+    return make_panels_from_grid(mesh, warp_tol=warp_tol)
+
+
+def make_mesh_from_stations(points, chordwise, spanwise):
+    """
+    Mesh spanned between the same four points as in make_panels_from_points, with any spacing.
+
+    :param points: le_SW, te_SE, le_NW, te_NE
+    :param chordwise: (nc + 1,) increasing stations from 0 - leading edge to 1 - trailing edge
+    :param spanwise: (ns + 1,) increasing stations from 0 - SW side to 1 - NW side
+    :return: (nc + 1, ns + 1, 3) mesh, the mesh of make_panels_from_points for uniform stations
+    """
+    le_SW, te_SE, le_NW, te_NE = [np.asarray(p, dtype=float) for p in points]
+    s = np.asarray(chordwise, dtype=float)[:, None, None]
+    t = np.asarray(spanwise, dtype=float)[None, :, None]
+    south = le_SW + s * (te_SE - le_SW)
+    north = le_NW + s * (te_NE - le_NW)
+    return south + t * (north - south)
@@ -0,0 +1,157 @@
+"""
+    Minimum induced drag loading and the twist producing it.
+
+    The design variables are the twist angles theta of the spanwise strips (nose up about the
+    bound vortices). Twisting a strip rotates the normals of its panels, to first order
+    dRHS_i / dtheta_j = -V . (t_j x n_i), so with the factorized AIC the circulation is affine in the twist:
+
+        gamma = gamma_0 + G theta,  gamma_0 = A^-1 RHS_0,  G = A^-1 dRHS/dtheta
+
+    The induced drag is the Trefftz plane quadratic form D = gamma^T Q gamma - the trailing legs are
+    projected to the plane normal to the freestream, where they are infinite 2D vortices
+    (twice the velocity of the semi-infinite legs of the kernel backend), the bound segments feel half of it.
+    The lift and the root bending moment are linear in gamma (freestream Kutta-Joukowski force).
+    Minimizing D subject to the target lift (and optionally the bending moment) is one KKT system:
+
+        | 2 G^T Q G   G^T a   G^T b | | theta |   | -2 G^T Q gamma_0 |
+        | a^T G       0       0     | | lam   | = | L - a^T gamma_0  |
+        | b^T G       0       0     | | mu    |   | M - b^T gamma_0  |
+
+    example
+
+    optimum = solve_minimum_induced_drag(panels, [nc, ns], V=[10, 0, 0], CL=0.5)
+    print(optimum.twist_deg, optimum.CDi)
+"""
+
+import numpy as np
+
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.vlm_solver import \
+    calc_horseshoe_v_ind_coeff, \
+    factorize_sys_of_eq, \
+    solve_factorized
+from solver.kernels import get_kernel_backend
+from solver.profiling import stage
+
+
+def calc_trefftz_drag_matrix(geometry, V, rho=1.):
+    """
+    :param geometry: PanelsGeometry of N panels
+    :param V: (3,) freestream, the wake is aligned with it
+    :return: symmetric (N, N) Q, induced drag D = gamma^T Q gamma
+    """
+    u = np.asarray(V, dtype=float) / np.linalg.norm(V)
+
+    def project(points):
+        return points - np.outer(np.dot(points, u), u)
+
+    B, C, cp = project(geometry.B), project(geometry.C), project(geometry.cp)
+    r0 = np.broadcast_to(u, B.shape)
+    with stage("trefftz_drag_matrix", semi_infinite_kernel_calls=2 * len(B) ** 2):
+        w = 2. * get_kernel_backend().trailing_vortices(cp, B, C, r0)  # infinite legs, (N, N, 3)
+    bc = geometry.C - geometry.B
+    Q = 0.5 * rho * np.einsum('ijk,k->ij', np.cross(w, bc[:, None, :]), u)
+    return 0.5 * (Q + Q.T)
+
+
+class OptimalLoading(object):
+    """
+    :ivar twist_deg: (ns,) twist of the strips, nose up
+    :ivar gamma_magnitude: (N,) circulation of the twisted lattice
+    :ivar strip_circulation: (ns,) circulation summed over the chord
+    :ivar CL, CDi: lift and Trefftz plane induced drag coefficients
+    :ivar root_bending_moment: or None
+    :ivar multipliers: Lagrange multipliers of the constraints
+    """
+
+    def __init__(self, twist_deg, gamma_magnitude, grid_size, CL, CDi, root_bending_moment, multipliers):
+        self.twist_deg = twist_deg
+        self.gamma_magnitude = gamma_magnitude
+        self.strip_circulation = np.sum(np.reshape(gamma_magnitude, grid_size), axis=0)
+        self.CL = CL
+        self.CDi = CDi
+        self.root_bending_moment = root_bending_moment
+        self.multipliers = multipliers
+
+
+def solve_minimum_induced_drag(panels, grid_size, V, CL, rho=1., S=None, lift_direction=(0, 0, 1),
+                               root_point=None, moment_axis=(1, 0, 0), root_bending_moment=None):
+    """
+    :param panels: array of Panels or (N, 4, 3) corners of the untwisted lattice, (nc, ns) row major
+    :param V: (3,) freestream
+    :param CL: target lift coefficient
+    :param S: reference area, by default the area of the panels
+    :param root_point: origin of the root bending moment, the moment of the panels on the positive
+                       spanwise side of it (along the bound vortices) about moment_axis
+    :param root_bending_moment: None - no constraint, a number - the moment is held at this value,
+                                (lower, upper) - the moment is kept within the limits
+    :return: OptimalLoading
+    """
+    geometry = calc_panels_geometry(get_panels_corners(panels))
+    nc, ns = grid_size
+    N = nc * ns
+    V = np.asarray(V, dtype=float)
+    V_app_infw = np.broadcast_to(V, (N, 3))
+    S = np.sum(geometry.areas) if S is None else S
+    qS = 0.5 * rho * np.dot(V, V) * S
+
+    with stage("minimum_induced_drag", panels=N, strips=ns):
+        v_ind_coeff = calc_horseshoe_v_ind_coeff(geometry.ctr_p, geometry, V_app_infw)
+        lu_piv = factorize_sys_of_eq(np.einsum('ijk,ik->ij', v_ind_coeff, geometry.normals))
+
+        bc = geometry.C - geometry.B
+        axes = bc / np.linalg.norm(bc, axis=-1)[:, None]
+        strip = np.tile(np.arange(ns), nc)
+        dRHS = np.zeros((N, ns))
+        dRHS[np.arange(N), strip] = -np.sum(V * np.cross(axes, geometry.normals), axis=-1)
+        RHS_0 = -np.dot(geometry.normals, V)
+        gamma_G = solve_factorized(lu_piv, np.column_stack([RHS_0, dRHS]))
+        gamma_0, G = gamma_G[:, 0], gamma_G[:, 1:]
+
+        Q = calc_trefftz_drag_matrix(geometry, V, rho=rho)
+        freestream_force = rho * np.cross(V, bc)  # per unit circulation
+        constraints = [(np.dot(freestream_force, lift_direction), CL * qS)]
+
+        b = None
+        if root_point is not None:
+            span = np.mean(axes, axis=0)
+            arm = geometry.cp - np.asarray(root_point, dtype=float)
+            outboard = np.dot(arm, span) > 0
+            b = np.dot(np.cross(arm, freestream_force), moment_axis) * outboard
+            if root_bending_moment is not None and np.ndim(root_bending_moment) == 0:
+                constraints.append((b, root_bending_moment))
+
+        theta, multipliers = _solve_kkt(Q, G, gamma_0, constraints)
+        if b is not None and np.ndim(root_bending_moment) == 1:
+            # inequality - the bending moment constraint is added when the limits are violated
+            lower, upper = root_bending_moment
+            M = np.dot(b, gamma_0 + np.dot(G, theta))
+            if not lower <= M <= upper:
+                constraints.append((b, lower if M < lower else upper))
+                theta, multipliers = _solve_kkt(Q, G, gamma_0, constraints)
+
+    gamma_magnitude = gamma_0 + np.dot(G, theta)
+    M = None if b is None else np.dot(b, gamma_magnitude)
+    CDi = np.dot(gamma_magnitude, np.dot(Q, gamma_magnitude)) / qS
+    CL_achieved = np.dot(constraints[0][0], gamma_magnitude) / qS
+    return OptimalLoading(np.rad2deg(theta), gamma_magnitude, grid_size, CL_achieved, CDi, M, multipliers)
+
+
+def _solve_kkt(Q, G, gamma_0, constraints):
+    """
+    :param constraints: list of (c (N,), value) - c . gamma = value
+    :return: theta (ns,), multipliers
+    """
+    ns, m = G.shape[1], len(constraints)
+    QG = np.dot(Q, G)
+    C = np.array([np.dot(c, G) for c, _ in constraints])
+
+    K = np.zeros((ns + m, ns + m))
+    K[:ns, :ns] = 2. * np.dot(G.T, QG)
+    K[:ns, ns:] = C.T
+    K[ns:, :ns] = C
+    rhs = np.concatenate([-2. * np.dot(QG.T, gamma_0), [value - np.dot(c, gamma_0) for c, value in constraints]])
+
+    with stage("kkt_solve", unknowns=ns + m):
+        x = np.linalg.solve(K, rhs)
+    return x[:ns], x[ns:]
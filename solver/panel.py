@@ -1,4 +1,5 @@
 import numpy as np
+from collections import namedtuple
 
 from solver.vortices import \
     v_induced_by_semi_infinite_vortex_line, \
@@ -22,18 +23,18 @@ class Panel(object):
     ----------
     P1, P2, P3, P4 : array_like
                      Corner points in a 3D euclidean space
+    check_in_plane : bool
+                     Reject warped panels, see calc_panels_warp for the vectorized check
+                     of whole meshes made of cambered or twisted panels
     """
-    panel_counter = 0
-    def __init__(self, p1, p2, p3, p4):
+    def __init__(self, p1, p2, p3, p4, check_in_plane=True):
         self.p1 = p1
         self.p2 = p2
         self.p3 = p3
         self.p4 = p4
 
-        self.counter = Panel.panel_counter
-        Panel.panel_counter += 1
-
-        self._check_in_plane()
+        if check_in_plane:
+            self._check_in_plane()
 
     def _check_in_plane(self):
         P1P2 = self.p1 - self.p2
@@ -45,11 +46,12 @@ class Panel(object):
 
 
     def get_normal_to_panel(self):
-        p1_p2 = self.p2 - self.p1
-        p1_p4 = self.p4 - self.p1
+        # normal to the mean plane of the panel - cross product of the diagonals,
+        # for a flat panel the same as np.cross(p4 - p1, p2 - p1)
+        p2_p4 = self.p4 - self.p2
+        p1_p3 = self.p3 - self.p1
 
-        # n = np.cross(p1_p2, p1_p4)
-        n = np.cross(p1_p4, p1_p2)
+        n = np.cross(p2_p4, p1_p3)
         n = normalize(n)
         return n
 
@@ -99,9 +101,11 @@ class Panel(object):
              P - control point where the boundary condition V*n = 0
                  is applied according to the Vortice Lattice Method.
          """
+        # midpoint of the 3/4 chord line, for parallelograms the same as
+        # p2 + (p1 - p2) * 3/4 + (p4 - p1) / 2
         p2_p1 = self.p1 - self.p2
-        p1_p4 = self.p4 - self.p1
-        ctr_p = self.p2 + p2_p1 * (3. / 4.) + p1_p4 / 2.
+        p3_p4 = self.p4 - self.p3
+        ctr_p = 0.5 * (self.p2 + p2_p1 * (3. / 4.) + self.p3 + p3_p4 * (3. / 4.))
         return ctr_p
 
     def get_cp_position(self):
@@ -131,9 +135,10 @@ class Panel(object):
              CP - centre of pressure, when calculating CL, CD it assumed that the force is attached to this point
              The induced wind is calculated at CP, and then U_inf + U_ind is used to find the force.
          """
+        # midpoint of the bound vortex B-C, it stays on the vortex for panels which are not parallelograms
         p2_p1 = self.p1 - self.p2
-        p1_p4 = self.p4 - self.p1
-        cp = self.p2 + p2_p1 * (1. / 4.) + p1_p4 / 2.
+        p3_p4 = self.p4 - self.p3
+        cp = 0.5 * (self.p2 + p2_p1 * (1. / 4.) + self.p3 + p3_p4 * (1. / 4.))
         return cp
 
     def get_vortex_ring_position(self):
@@ -192,3 +197,82 @@ class Panel(object):
         v = v_induced_by_horseshoe_vortex(ctr_p, B, C, V_app_infw)
         return v
 
+
+
+# Bulk counterpart of the Panel methods, every field is an (..., N, 3) or (..., N) array
+PanelsGeometry = namedtuple('PanelsGeometry', ['ctr_p', 'cp', 'normals', 'areas', 'A', 'B', 'C', 'D'])
+
+
+def get_panels_corners(panels):
+    """
+    :param panels: array of Panels, a numeric (N, 4, 3) array is taken as the corners already
+    :return: (N, 4, 3) array of the corner points P1, P2, P3, P4 of the flattened panels
+    """
+    if panels.dtype != object:
+        return np.asarray(panels, dtype=float)
+    return np.array([[p.p1, p.p2, p.p3, p.p4] for p in panels.flatten()], dtype=float)
+
+
+def calc_panels_geometry(corners):
+    """
+    Control points, centres of pressure, normals, areas and vortex ring points
+    of many panels at once, see the Panel methods for the definitions.
+
+    :param corners: (..., N, 4, 3) corner points, see get_panels_corners
+    :return: PanelsGeometry
+    """
+    corners = np.asarray(corners, dtype=float)
+    p1, p2, p3, p4 = [corners[..., k, :] for k in range(4)]
+
+    p2_p1 = p1 - p2
+    p3_p4 = p4 - p3
+
+    ctr_p = 0.5 * (p2 + p2_p1 * (3. / 4.) + p3 + p3_p4 * (3. / 4.))
+    cp = 0.5 * (p2 + p2_p1 * (1. / 4.) + p3 + p3_p4 * (1. / 4.))
+
+    n = np.cross(p4 - p2, p3 - p1)  # mean plane of warped panels
+    normals = n / np.sqrt(np.sum(n * n, axis=-1))[..., None]
+
+    areas = 0.5 * np.sqrt(np.sum(np.square(np.cross(p2 - p1, p3 - p2)), axis=-1)) \
+        + 0.5 * np.sqrt(np.sum(np.square(np.cross(p3 - p2, p4 - p3)), axis=-1))
+
+    A = p1 + p2_p1 / 4.
+    B = p2 + p2_p1 / 4.
+    C = p3 + p3_p4 / 4.
+    D = p4 + p3_p4 / 4.
+
+    return PanelsGeometry(ctr_p=ctr_p, cp=cp, normals=normals, areas=areas, A=A, B=B, C=C, D=D)
+
+
+def calc_panels_warp(corners):
+    """
+    Warp of the panels - distance of the corners from the mean plane (through the mean
+    of the corners, normal to the diagonals) divided by the square root of the panel area.
+    Zero for flat panels.
+
+    :param corners: (..., N, 4, 3)
+    :return: (..., N)
+    """
+    corners = np.asarray(corners, dtype=float)
+    p1, p2, p3, p4 = [corners[..., k, :] for k in range(4)]
+    n = np.cross(p4 - p2, p3 - p1)
+    norm_n = np.sqrt(np.sum(n * n, axis=-1))
+    height = 0.25 * np.abs(np.sum((p1 - p2 + p3 - p4) * n, axis=-1)) / norm_n
+    # the mean plane area, |diagonal x diagonal| / 2
+    return height / np.sqrt(0.5 * norm_n)
+
+
+def check_panels_warp(corners, tol=0.05):
+    """
+    Vectorized counterpart of Panel._check_in_plane for cambered and twisted meshes.
+
+    :param tol: max allowed warp, see calc_panels_warp
+    :return: (N,) warp of the panels
+    :raises ValueError: if any panel is warped more than tol
+    """
+    warp = calc_panels_warp(corners)
+    too_warped = np.flatnonzero(warp > tol)
+    if too_warped.size:
+        raise ValueError("%d panels are warped more than %g (max warp %g at panel %d), use a finer mesh!"
+                         % (too_warped.size, tol, np.max(warp), np.argmax(warp)))
+    return warp
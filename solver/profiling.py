@@ -0,0 +1,212 @@
+"""
+    Opt-in instrumentation of the solver pipeline.
+
+    Every expensive stage (meshing, assembly, linear solve, force recovery)
+    is wrapped in a `stage`. While profiling is disabled `stage` returns a
+    shared no-op context manager, so the instrumented code pays only for a
+    single function call per stage - nothing is timed, counted nor stored.
+
+    example
+
+    with profiled(jsonl="stages.jsonl") as report:
+        gamma_magnitude, v_ind_coeff = calc_circulation(V_app_infw, panels)
+        F = calc_force_wrapper(V_app_infw, gamma_magnitude, panels)
+
+    print(report.format_table())
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_report = None  # active ProfileReport, None when instrumentation is disabled
+
+# modules which must not be loaded by `import solver.<anything>`, they are imported on first use
+LAZY_DEPENDENCIES = ('scipy', 'matplotlib', 'yaml', 'concurrent.futures', 'numba')
+
+
+class StageRecord(object):
+    """
+    Timing and counters of a single execution of a stage.
+
+    Parameters
+    ----------
+    name : name of the stage, i.e. the instrumented function
+    elapsed : wall time [s]
+    counters : dict of integer counters (panels, kernel calls, allocated bytes, ...)
+    parent : name of the enclosing stage or None
+    """
+    __slots__ = ('name', 'elapsed', 'counters', 'parent')
+
+    def __init__(self, name, elapsed, counters, parent=None):
+        self.name = name
+        self.elapsed = elapsed
+        self.counters = counters
+        self.parent = parent
+
+    def as_dict(self):
+        record = {'stage': self.name, 'elapsed_s': self.elapsed, 'parent': self.parent}
+        record.update(self.counters)
+        return record
+
+
+class ProfileReport(object):
+    """
+    Structured collection of StageRecords gathered while profiling was enabled.
+    Stages may run in many threads, every thread keeps its own stack of the enclosing stages.
+    """
+
+    def __init__(self, jsonl_stream=None):
+        self.records = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._jsonl_stream = jsonl_stream
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self._jsonl_stream is not None:
+                self._jsonl_stream.write(json.dumps(record.as_dict()) + "\n")
+
+    def summary(self):
+        """
+        :return: dict stage name -> {'calls', 'total_s', 'mean_s', 'max_s', <summed counters>}
+        """
+        summary = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            s = summary.setdefault(r.name, {'calls': 0, 'total_s': 0., 'max_s': 0.})
+            s['calls'] += 1
+            s['total_s'] += r.elapsed
+            s['max_s'] = max(s['max_s'], r.elapsed)
+            for key, value in r.counters.items():
+                s[key] = s.get(key, 0) + value
+
+        for s in summary.values():
+            s['mean_s'] = s['total_s'] / s['calls']
+        return summary
+
+    def to_json_lines(self, stream):
+        for r in self.records:
+            stream.write(json.dumps(r.as_dict()) + "\n")
+
+    def format_table(self):
+        lines = ["%-28s %6s %12s %12s" % ("stage", "calls", "total [s]", "mean [s]")]
+        for name, s in sorted(self.summary().items(), key=lambda kv: -kv[1]['total_s']):
+            lines.append("%-28s %6d %12.6f %12.6f" % (name, s['calls'], s['total_s'], s['mean_s']))
+        return "\n".join(lines)
+
+
+class _Stage(object):
+    def __init__(self, report, name, counters):
+        self.report = report
+        self.name = name
+        self.counters = counters
+
+    def count(self, **counters):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        stack = self.report._stack
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        elapsed = time.perf_counter() - self.t0
+        self.report._stack.pop()
+        self.report.add(StageRecord(self.name, elapsed, self.counters, self.parent))
+        return False
+
+
+class _NullStage(object):
+    def count(self, **counters):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, **counters):
+    """
+    Context manager timing the enclosed block as stage `name`.
+    Extra counters may be added inside the block with `.count(key=value)`.
+    """
+    if _report is None:
+        return _NULL_STAGE
+    return _Stage(_report, name, dict(counters))
+
+
+def is_enabled():
+    return _report is not None
+
+
+@contextmanager
+def profiled(jsonl=None):
+    """
+    Enable instrumentation for the enclosed block.
+
+    :param jsonl: optional path or writable text stream, each finished stage is written there as a JSON line
+    :return: ProfileReport filled while the block runs
+    """
+    global _report
+    if _report is not None:
+        raise RuntimeError("Profiling is already enabled.")
+
+    owns_stream = isinstance(jsonl, str)
+    stream = open(jsonl, 'w') if owns_stream else jsonl
+
+    report = ProfileReport(jsonl_stream=stream)
+    _report = report
+    try:
+        yield report
+    finally:
+        _report = None
+        if owns_stream:
+            stream.close()
+
+
+def measure_import_time(module, repeat=5):
+    """
+    Import-time benchmark - each import runs in a fresh interpreter,
+    just like a short lived worker process.
+
+    :return: (median wall time of `import module` [s], list of LAZY_DEPENDENCIES loaded by the import)
+    """
+    import subprocess
+
+    code = ("import sys, time; t0 = time.perf_counter(); import %s; dt = time.perf_counter() - t0; "
+            "print(dt); print(' '.join(m for m in %r if m in sys.modules))" % (module, LAZY_DEPENDENCIES))
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True).splitlines()
+        timings.append(float(out[0]))
+        loaded = out[1].split() if len(out) > 1 else []
+
+    timings.sort()
+    return timings[len(timings) // 2], loaded
+
+
+if __name__ == '__main__':
+    # $ python -m solver.profiling solver.batch solver.coeff_formulas
+    for name in sys.argv[1:] or ['numpy', 'solver.vlm_solver', 'solver.forces', 'solver.batch']:
+        dt, loaded = measure_import_time(name)
+        print("%-28s %8.1f ms  %s" % (name, 1e3 * dt, " ".join(loaded)))
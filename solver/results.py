@@ -0,0 +1,192 @@
+"""
+    Results container and its binary sweep file.
+
+    A sweep file is an uncompressed npz archive (it can be read with np.load as well),
+    holding for every case the members
+
+        <case_id>/gamma_magnitude.npy
+        <case_id>/force.npy
+        <case_id>/pressure.npy
+        <case_id>/mesh.npy
+        <case_id>/coefficients.json
+        <case_id>/metadata.json
+
+    Since the members are stored, not deflated, ResultsFile opens the arrays as
+    read-only memory maps - nothing but the zip directory is read when a sweep is opened.
+    New cases are appended to an existing file, so batch runs can stream results as they finish.
+
+    A zip archive is readable only after its central directory is written on close, so in the 'w' and 'a'
+    modes the archive is written to a temporary copy next to it (an append starts by copying the existing
+    file) and moved over `path` by close. If the process dies before that, `path` keeps the cases of the
+    earlier sessions and the cases of the interrupted session are lost.
+"""
+
+import json
+import os
+import shutil
+import zipfile
+import struct
+
+import numpy as np
+
+ARRAY_FIELDS = ('gamma_magnitude', 'force', 'pressure', 'mesh')
+
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')  # zip local file header, see zipfile.structFileHeader
+
+
+class CaseResult(object):
+    """
+    Results of a single case.
+
+    Parameters
+    ----------
+    gamma_magnitude : (N,) circulation of the horseshoes
+    force : (N, 3) force acting on each panel
+    pressure : (N,) pressure on each panel, see calc_pressure
+    mesh : (nc+1, ns+1, 3) points of the mesh
+    coefficients : dict of scalars, i.e. CL, CD, total force components
+    metadata : dict of json serializable values describing the case
+    """
+
+    def __init__(self, gamma_magnitude, force, pressure, mesh, coefficients=None, metadata=None):
+        self.gamma_magnitude = gamma_magnitude
+        self.force = force
+        self.pressure = pressure
+        self.mesh = mesh
+        self.coefficients = dict(coefficients or {})
+        self.metadata = dict(metadata or {})
+
+
+class ResultsFile(object):
+    """
+    One file per sweep.
+
+    with ResultsFile("sweep.npz", mode='a') as rf:
+        rf.append("case_1", result)
+
+    with ResultsFile("sweep.npz") as rf:
+        CL = rf.coefficients_table()['CL']
+        F = rf["case_1"].force  # memory mapped
+
+    :param path:
+    :param mode: 'r' read, 'w' create (truncate), 'a' append (create if missing)
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError("mode must be one of 'r', 'w', 'a'")
+        self.path = path
+        self.mode = mode
+        self._file = path
+        if mode != 'r':
+            self._file = path + '.tmp'
+            if mode == 'a' and os.path.exists(path):
+                shutil.copyfile(path, self._file)
+        self._zip = zipfile.ZipFile(self._file, mode=mode, compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._case_ids = []
+        for name in self._zip.namelist():
+            if '/' not in name:
+                continue  # not a member of a case
+            case_id, member = name.rsplit('/', 1)
+            if member == 'coefficients.json':
+                self._case_ids.append(case_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._zip.fp is None:
+            return
+        self._zip.close()
+        if self.mode != 'r':
+            os.replace(self._file, self.path)
+
+    @property
+    def case_ids(self):
+        return list(self._case_ids)
+
+    def __len__(self):
+        return len(self._case_ids)
+
+    def __contains__(self, case_id):
+        return case_id in self._case_ids
+
+    def append(self, case_id, result):
+        """
+        :param case_id: unique name of the case, must not contain '/'
+        :param result: CaseResult
+        """
+        if self.mode == 'r':
+            raise ValueError("ResultsFile opened in read only mode.")
+        case_id = str(case_id)
+        if '/' in case_id:
+            raise ValueError("case_id must not contain '/': %s" % case_id)
+        if case_id in self._case_ids:
+            raise ValueError("Case %s is already stored in %s" % (case_id, self.path))
+
+        for field in ARRAY_FIELDS:
+            array = np.asanyarray(getattr(result, field))
+            with self._zip.open("%s/%s.npy" % (case_id, field), mode='w', force_zip64=True) as f:
+                np.lib.format.write_array(f, array, allow_pickle=False)
+
+        self._zip.writestr("%s/metadata.json" % case_id, json.dumps(result.metadata))
+        self._zip.writestr("%s/coefficients.json" % case_id, json.dumps(result.coefficients))
+        self._case_ids.append(case_id)
+
+    def load_array(self, case_id, field):
+        """
+        :return: read-only np.memmap of `field` of the case, no data is read until it is accessed
+        """
+        info = self._zip.getinfo("%s/%s.npy" % (case_id, field))
+        if self.mode != 'r':
+            self._zip.fp.flush()  # the cases appended in this session are read back through another handle
+        with open(self._file, 'rb') as f:
+            f.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+            name_length, extra_length = header[-2], header[-1]
+            f.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file, dtype=dtype, mode='r', offset=offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+
+    def load_coefficients(self, case_id):
+        return json.loads(self._zip.read("%s/coefficients.json" % case_id).decode())
+
+    def load_metadata(self, case_id):
+        return json.loads(self._zip.read("%s/metadata.json" % case_id).decode())
+
+    def __getitem__(self, case_id):
+        if case_id not in self._case_ids:
+            raise KeyError(case_id)
+        arrays = {field: self.load_array(case_id, field) for field in ARRAY_FIELDS}
+        return CaseResult(coefficients=self.load_coefficients(case_id),
+                          metadata=self.load_metadata(case_id),
+                          **arrays)
+
+    def coefficients_table(self):
+        """
+        Columnar view of the scalar coefficients of all cases,
+        only the small coefficient members are read.
+        :return: dict name -> np.array over cases (nan where the case lacks the coefficient)
+        """
+        coefficients = [self.load_coefficients(case_id) for case_id in self._case_ids]
+        names = []
+        for c in coefficients:
+            names.extend(name for name in c if name not in names)
+
+        table = {'case_id': np.array(self._case_ids)}
+        for name in names:
+            table[name] = np.array([c.get(name, np.nan) for c in coefficients])
+        return table
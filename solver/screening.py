@@ -0,0 +1,181 @@
+"""
+    Low fidelity screening with escalation to the full lattice.
+
+    solve_lifting_line collapses every spanwise strip of the mesh to a single horseshoe
+    (bound vortex at 1/4, control point at 3/4 of the strip chord - Weissinger's lifting line),
+    there are ns unknowns instead of nc * ns. The control point normals are taken from the mesh
+    at 3/4 of the chord, where the slope of the camber line gives the lift of a cambered section.
+    solve_lattice is the full nc x ns solve. Both return a CaseResult, metadata['fidelity'] tells them apart.
+
+    screen_configurations solves many meshes with the lifting line, ranks them with a score
+    and solves only the best ones again with the full lattice.
+
+    example
+
+    screening = screen_configurations(meshes, V_app_infw=[10, 0, 1], n_escalate=5)
+    for index in screening.ranking[:5]:
+        print(index, screening.low[index].coefficients['CL'], screening.high[index].coefficients['CL'])
+"""
+
+import numpy as np
+
+from solver.mesher import mesh_to_corners
+from solver.panel import calc_panels_geometry
+from solver.vlm_solver import assembly_sys_of_eq
+from solver.forces import calc_forces, calc_pressure, calc_v_ind_coeff_at_cp
+from solver.results import CaseResult
+from solver.profiling import stage
+
+FIDELITIES = ('lifting_line', 'lattice')
+
+
+def collapse_strips(mesh):
+    """
+    :param mesh: (nc + 1, ns + 1, 3)
+    :return: (2, ns + 1, 3) mesh of one chordwise panel per strip - the leading and the trailing edge
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    return mesh[[0, -1]]
+
+
+def calc_strip_normals(mesh, x_over_c=0.75):
+    """
+    Normals of the mesh at x_over_c of each strip, interpolated between the panel centres.
+    :return: (ns, 3)
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    nc, ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+    geometry = calc_panels_geometry(mesh_to_corners(mesh))
+    normals = geometry.normals.reshape(nc, ns, 3)
+    if nc == 1:
+        return normals[0]
+
+    centres = mesh_to_corners(mesh).mean(axis=1).reshape(nc, ns, 3)
+    le = 0.5 * (mesh[0, :-1] + mesh[0, 1:])
+    chord = 0.5 * (mesh[-1, :-1] + mesh[-1, 1:]) - le
+    position = np.einsum('ijk,jk->ij', centres - le, chord) / np.sum(chord * chord, axis=-1)
+
+    strip_normals = np.array([[np.interp(x_over_c, position[:, j], normals[:, j, k]) for k in range(3)]
+                              for j in range(ns)])
+    return strip_normals / np.linalg.norm(strip_normals, axis=-1)[:, None]
+
+
+def _solve(corners, V_app_infw, rho, mesh, S, lift_direction, drag_direction, metadata, normals=None):
+    N = len(corners)
+    V_app_infw = np.broadcast_to(np.asarray(V_app_infw, dtype=float), (N, 3))
+
+    A, RHS, _ = assembly_sys_of_eq(V_app_infw, corners, normals=normals)
+    gamma_magnitude = np.linalg.solve(A, RHS)
+    force = calc_forces(V_app_infw, gamma_magnitude, calc_v_ind_coeff_at_cp(V_app_infw, corners), corners, rho=rho)
+    pressure = calc_pressure(force, corners)
+
+    S = np.sum(calc_panels_geometry(corners).areas) if S is None else S
+    V_ref = np.mean(V_app_infw, axis=0)
+    q = 0.5 * rho * np.dot(V_ref, V_ref)
+    total_force = np.sum(force, axis=0)
+    coefficients = {'CL': np.dot(total_force, lift_direction) / (q * S),
+                    'CD': np.dot(total_force, drag_direction) / (q * S),
+                    'Fx': total_force[0], 'Fy': total_force[1], 'Fz': total_force[2], 'S': S}
+    coefficients = {key: float(value) for key, value in coefficients.items()}
+    return CaseResult(gamma_magnitude, force, pressure, mesh, coefficients=coefficients, metadata=metadata)
+
+
+def solve_lifting_line(mesh, V_app_infw, rho=1., S=None, lift_direction=(0, 0, 1), drag_direction=(1, 0, 0)):
+    """
+    :param mesh: (nc + 1, ns + 1, 3), any chordwise density - the strips are collapsed, see collapse_strips
+    :param V_app_infw: (3,) or (ns, 3)
+    :param S: reference area, by default the area of the mesh
+    :return: CaseResult of ns horseshoes, its mesh is the collapsed one
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    ns = mesh.shape[1] - 1
+    strips = collapse_strips(mesh)
+    with stage("solve_lifting_line", panels=ns, horseshoe_kernel_calls=2 * ns * ns):
+        result = _solve(mesh_to_corners(strips), V_app_infw, rho, strips, S, lift_direction, drag_direction,
+                        metadata={'fidelity': 'lifting_line', 'nc': 1, 'ns': ns}, normals=calc_strip_normals(mesh))
+    return result
+
+
+def solve_lattice(mesh, V_app_infw, rho=1., S=None, lift_direction=(0, 0, 1), drag_direction=(1, 0, 0)):
+    """
+    Full nc x ns lattice, the same result as solve_lifting_line.
+
+    :param V_app_infw: (3,) or (nc * ns, 3)
+    :return: CaseResult
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    nc, ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+    N = nc * ns
+    with stage("solve_lattice", panels=N, horseshoe_kernel_calls=2 * N * N):
+        result = _solve(mesh_to_corners(mesh), V_app_infw, rho, mesh, S, lift_direction, drag_direction,
+                        metadata={'fidelity': 'lattice', 'nc': nc, 'ns': ns})
+    return result
+
+
+def lift_to_drag(result):
+    """
+    :return: CL / CD, -inf for a result without drag (i.e. a wing at zero lift) - it is ranked last
+    """
+    CD = result.coefficients['CD']
+    return result.coefficients['CL'] / CD if CD != 0. else -np.inf
+
+
+def _rank(scores):
+    """
+    :return: indices of the scores, best first; nan scores are ranked last
+    """
+    scores = np.asarray(scores, dtype=float)
+    return np.argsort(-np.where(np.isnan(scores), -np.inf, scores), kind='stable')
+
+
+class Screening(object):
+    """
+    :ivar low: list of lifting line CaseResults, one per configuration
+    :ivar high: dict configuration index -> lattice CaseResult of the escalated ones
+    :ivar scores: (n_configurations,) lifting line scores
+    :ivar ranking: configuration indices, best first
+    """
+
+    def __init__(self, low, high, scores):
+        self.low = low
+        self.high = high
+        self.scores = np.asarray(scores)
+        self.ranking = [int(i) for i in _rank(self.scores)]
+
+    def best(self, score=lift_to_drag):
+        """
+        :return: index of the best escalated configuration, rescored with the lattice results
+        """
+        return max(self.high, key=lambda i: score(self.high[i]))
+
+    def results(self):
+        """
+        :return: the most accurate CaseResult of every configuration
+        """
+        return [self.high.get(i, low) for i, low in enumerate(self.low)]
+
+
+def screen_configurations(meshes, V_app_infw, rho=1., score=lift_to_drag, n_escalate=None, tolerance=None,
+                          **kwargs):
+    """
+    :param meshes: sequence of (nc + 1, ns + 1, 3) meshes, the sizes may differ
+    :param V_app_infw: (3,) freestream shared by all configurations
+    :param score: function CaseResult -> number, higher is better; L/D by default
+    :param n_escalate: number of the best configurations solved with the full lattice
+    :param tolerance: escalate also every configuration scoring within this fraction of the best,
+                      i.e. 0.05 - within 5 %; by default only n_escalate (or the best one) are escalated
+    :param kwargs: S, lift_direction, drag_direction of solve_lifting_line / solve_lattice
+    :return: Screening
+    """
+    with stage("screen_configurations", configurations=len(meshes)):
+        low = [solve_lifting_line(mesh, V_app_infw, rho=rho, **kwargs) for mesh in meshes]
+        scores = np.array([score(result) for result in low])
+        ranking = _rank(scores)
+
+        escalate = set(ranking[:n_escalate if n_escalate is not None else (0 if tolerance is not None else 1)])
+        if tolerance is not None:
+            best = scores[ranking[0]]
+            escalate |= set(np.flatnonzero(scores >= best - tolerance * abs(best)))
+
+        high = {int(i): solve_lattice(meshes[i], V_app_infw, rho=rho, **kwargs) for i in sorted(escalate)}
+    return Screening(low, high, scores)
@@ -0,0 +1,227 @@
+"""
+    Adjoint sensitivities of the force coefficients.
+
+    The coefficients J = CL, CDi, CM are functions of the panel corners x,
+    the inflow V_app_infw and the circulation gamma, which satisfies R = A(x, V) gamma - RHS(x, V) = 0.
+    Instead of one solve per design variable (finite differences), the adjoint problem
+
+        A^T lambda = dJ/dgamma
+
+    is solved once for all three coefficients, reusing the LU factors of the AIC. Then
+
+        dJ/dx = dJ/dx|explicit - lambda^T dR/dx
+
+    gives the derivatives with respect to every corner coordinate and every inflow component.
+    The reference area, chord, dynamic pressure and the force directions are held fixed.
+"""
+
+import numpy as np
+
+from solver.panel import calc_panels_geometry
+from solver.forces import calc_kutta_joukowski_forces
+from solver.vlm_solver import \
+    calc_horseshoe_v_ind_coeff, \
+    factorize_sys_of_eq, \
+    solve_factorized
+from solver.vortices import \
+    grad_v_induced_by_finite_vortex_lines, \
+    grad_v_induced_by_semi_infinite_vortex_lines
+
+COEFFICIENTS = ('CL', 'CDi', 'CM')
+
+# d(point)/d(corner P1, P2, P3, P4) of the points of a panel, see calc_panels_geometry
+CTR_P_WEIGHTS = (0.375, 0.125, 0.125, 0.375)
+CP_WEIGHTS = (0.125, 0.375, 0.375, 0.125)
+B_WEIGHTS = (0.25, 0.75, 0., 0.)
+C_WEIGHTS = (0., 0., 0.75, 0.25)
+
+
+def _solve_state(corners, V_app_infw, rho):
+    geometry = calc_panels_geometry(corners)
+    v_ind_coeff = calc_horseshoe_v_ind_coeff(geometry.ctr_p, geometry, V_app_infw)
+    lu_piv = factorize_sys_of_eq(np.einsum('ijk,ik->ij', v_ind_coeff, geometry.normals))
+    gamma_magnitude = solve_factorized(lu_piv, -np.sum(V_app_infw * geometry.normals, axis=-1))
+
+    v_ind_coeff_cp = calc_horseshoe_v_ind_coeff(geometry.cp, geometry, V_app_infw)
+    V_at_cp = V_app_infw + np.einsum('ijk,j->ik', v_ind_coeff_cp, gamma_magnitude)
+    bc = geometry.C - geometry.B
+    force = calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, geometry, rho=rho)
+
+    return {'geometry': geometry, 'v_ind_coeff': v_ind_coeff, 'lu_piv': lu_piv,
+            'gamma_magnitude': gamma_magnitude, 'v_ind_coeff_cp': v_ind_coeff_cp,
+            'V_at_cp': V_at_cp, 'bc': bc, 'force': force}
+
+
+def _output_weights(geometry, q, S, c_ref, reference_point, lift_direction, drag_direction, moment_axis):
+    """
+    :return: (3, N, 3) e, such that coefficient[k] = sum_i e[k, i] . force[i]
+    """
+    N = len(geometry.cp)
+    e_L = np.broadcast_to(np.asarray(lift_direction, dtype=float) / (q * S), (N, 3))
+    e_D = np.broadcast_to(np.asarray(drag_direction, dtype=float) / (q * S), (N, 3))
+    r = geometry.cp - np.asarray(reference_point, dtype=float)
+    e_M = np.cross(np.asarray(moment_axis, dtype=float), r) / (q * S * c_ref)
+    return np.array([e_L, e_D, e_M])
+
+
+def _dynamic_pressure(V_app_infw, rho, V_ref):
+    if V_ref is None:
+        V_ref = np.mean(V_app_infw, axis=0)
+    return 0.5 * rho * np.dot(V_ref, V_ref)
+
+
+def calc_coefficients(corners, V_app_infw, rho=1., S=1., c_ref=1., V_ref=None, reference_point=(0, 0, 0),
+                      lift_direction=(0, 0, 1), drag_direction=(1, 0, 0), moment_axis=(0, 1, 0)):
+    """
+    CL, CDi and CM computed as in main.py:
+    CL = F . lift_direction / (q S), CDi = F . drag_direction / (q S),
+    CM = M . moment_axis / (q S c_ref), M = sum (cp - reference_point) x F
+
+    :param corners: (N, 4, 3) corner points, see get_panels_corners
+    :param V_app_infw: (N, 3)
+    :param V_ref: reference velocity of the dynamic pressure q, mean of V_app_infw by default
+    :return: dict CL, CDi, CM
+    """
+    V_app_infw = np.asarray(V_app_infw, dtype=float)
+    state = _solve_state(corners, V_app_infw, rho)
+    q = _dynamic_pressure(V_app_infw, rho, V_ref)
+    e = _output_weights(state['geometry'], q, S, c_ref, reference_point, lift_direction, drag_direction, moment_axis)
+    J = np.einsum('kid,id->k', e, state['force'])
+    return dict(zip(COEFFICIENTS, J))
+
+
+def _influence_vjp(points, geometry, V_app_infw, gamma_magnitude, weights):
+    """
+    Reverse mode derivative of  s[o] = sum_ij weights[o, i] . W(points_i, B_j, C_j, V_j) gamma_j,
+    where W is the unit horseshoe influence (bound segment B->C and two legs along V_j).
+
+    :param weights: (n_out, M, 3)
+    :return: ds/dpoints (n_out, M, 3), ds/dB, ds/dC, ds/dV (n_out, N, 3)
+    """
+    P = points[:, None, :]
+    B = geometry.B[None, :, :]
+    C = geometry.C[None, :, :]
+    r0 = V_app_infw[None, :, :]
+
+    finite_dP, finite_dB, finite_dC = grad_v_induced_by_finite_vortex_lines(P, B, C)
+    semi_C_dP, semi_C_dC, semi_C_dr0 = grad_v_induced_by_semi_infinite_vortex_lines(P, C, r0)
+    semi_B_dP, semi_B_dB, semi_B_dr0 = grad_v_induced_by_semi_infinite_vortex_lines(P, B, r0, gamma=-1)
+
+    def vjp(jacobian, out):
+        return np.einsum('omi,n,mnik->o%sk' % out, weights, gamma_magnitude, jacobian, optimize=True)
+
+    d_points = vjp(finite_dP + semi_C_dP + semi_B_dP, 'm')
+    d_B = vjp(finite_dB + semi_B_dB, 'n')
+    d_C = vjp(finite_dC + semi_C_dC, 'n')
+    d_V = vjp(semi_C_dr0 + semi_B_dr0, 'n')
+    return d_points, d_B, d_C, d_V
+
+
+def _normal_vjp(corners, normals, d_normals):
+    """
+    Reverse mode derivative of the normals n = m / |m|, m = (P4 - P2) x (P3 - P1).
+    :return: (n_out, N, 4, 3)
+    """
+    p1, p2, p3, p4 = corners[:, 0], corners[:, 1], corners[:, 2], corners[:, 3]
+    e = p4 - p2
+    f = p3 - p1
+    m = np.cross(e, f)
+    norm_m = np.linalg.norm(m, axis=-1)[:, None]
+
+    d_m = (d_normals - normals * np.sum(normals * d_normals, axis=-1)[..., None]) / norm_m
+    d_e = np.cross(f, d_m)
+    d_f = np.cross(d_m, e)
+
+    d_corners = np.zeros(d_normals.shape[:-1] + (4, 3))
+    d_corners[..., 0, :] = -d_f
+    d_corners[..., 1, :] = -d_e
+    d_corners[..., 2, :] = d_f
+    d_corners[..., 3, :] = d_e
+    return d_corners
+
+
+def _scatter_to_corners(d_corners, d_point, weights):
+    for k, w in enumerate(weights):
+        if w != 0.:
+            d_corners[..., k, :] += w * d_point
+
+
+def calc_sensitivities(corners, V_app_infw, rho=1., S=1., c_ref=1., V_ref=None, reference_point=(0, 0, 0),
+                       lift_direction=(0, 0, 1), drag_direction=(1, 0, 0), moment_axis=(0, 1, 0)):
+    """
+    Adjoint derivatives of CL, CDi and CM (see calc_coefficients) with respect to
+    the panel corners and the inflow - one LU factorization, one multi RHS transpose solve.
+
+    :return: dict with
+        'CL', 'CDi', 'CM' - values of the coefficients,
+        'd_corners' - dict coefficient -> (N, 4, 3) derivatives with respect to the corners,
+        'd_V_app_infw' - dict coefficient -> (N, 3) derivatives with respect to the inflow,
+        'gamma_magnitude'
+    """
+    corners = np.asarray(corners, dtype=float)
+    V_app_infw = np.asarray(V_app_infw, dtype=float)
+
+    state = _solve_state(corners, V_app_infw, rho)
+    geometry = state['geometry']
+    gamma_magnitude = state['gamma_magnitude']
+    V_at_cp = state['V_at_cp']
+    bc = state['bc']
+    force = state['force']
+
+    q = _dynamic_pressure(V_app_infw, rho, V_ref)
+    e = _output_weights(geometry, q, S, c_ref, reference_point, lift_direction, drag_direction, moment_axis)
+    J = np.einsum('kid,id->k', e, force)
+
+    # J = sum_i h_i . V_at_cp_i
+    h = rho * gamma_magnitude[None, :, None] * np.cross(bc[None], e)
+    dJ_dgamma = np.einsum('oid,ikd->ok', h, state['v_ind_coeff_cp']) \
+        + rho * np.sum(e * np.cross(V_at_cp, bc)[None], axis=-1)
+
+    adjoint = solve_factorized(state['lu_piv'], dJ_dgamma.T, trans=1).T  # (3, N)
+
+    # explicit dependence of J
+    d_cp, d_B, d_C, d_V = _influence_vjp(geometry.cp, geometry, V_app_infw, gamma_magnitude, h)
+    d_cp[2] += np.cross(force, np.asarray(moment_axis, dtype=float)) / (q * S * c_ref)
+    d_bc = rho * gamma_magnitude[None, :, None] * np.cross(e, V_at_cp[None])
+    d_C += d_bc
+    d_B -= d_bc
+    d_V += h
+
+    # - adjoint^T dR/dx, R_i = n_i . (V_i + sum_j W_ij gamma_j)
+    w = adjoint[:, :, None] * geometry.normals[None]
+    d_ctr, d_B_R, d_C_R, d_V_R = _influence_vjp(geometry.ctr_p, geometry, V_app_infw, gamma_magnitude, w)
+    d_B -= d_B_R
+    d_C -= d_C_R
+    d_V -= d_V_R + w
+
+    V_at_ctr = V_app_infw + np.einsum('ijk,j->ik', state['v_ind_coeff'], gamma_magnitude)
+    d_corners = -_normal_vjp(corners, geometry.normals, adjoint[:, :, None] * V_at_ctr[None])
+    _scatter_to_corners(d_corners, -d_ctr, CTR_P_WEIGHTS)
+    _scatter_to_corners(d_corners, d_cp, CP_WEIGHTS)
+    _scatter_to_corners(d_corners, d_B, B_WEIGHTS)
+    _scatter_to_corners(d_corners, d_C, C_WEIGHTS)
+
+    result = dict(zip(COEFFICIENTS, J))
+    result['d_corners'] = dict(zip(COEFFICIENTS, d_corners))
+    result['d_V_app_infw'] = dict(zip(COEFFICIENTS, d_V))
+    result['gamma_magnitude'] = gamma_magnitude
+    return result
+
+
+def corners_to_mesh_gradient(d_corners, grid_size):
+    """
+    Sum the corner derivatives of the panels made by make_panels_from_mesh
+    into derivatives with respect to the mesh points.
+
+    :param d_corners: (N, 4, 3), N = nc * ns
+    :param grid_size: [nc, ns]
+    :return: (nc + 1, ns + 1, 3)
+    """
+    nc, ns = grid_size
+    d = np.asarray(d_corners).reshape(nc, ns, 4, 3)
+    d_mesh = np.zeros((nc + 1, ns + 1, 3))
+    d_mesh[1:, :-1] += d[:, :, 0]  # P1 = pSE = mesh[i+1][j]
+    d_mesh[:-1, :-1] += d[:, :, 1]  # P2 = pSW = mesh[i][j]
+    d_mesh[:-1, 1:] += d[:, :, 2]  # P3 = pNW = mesh[i][j+1]
+    d_mesh[1:, 1:] += d[:, :, 3]  # P4 = pNE = mesh[i+1][j+1]
+    return d_mesh
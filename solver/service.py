@@ -0,0 +1,336 @@
+"""
+    Local solver service.
+
+    $ python -m solver.service --port 8765 --cache-size 16 --workers 4
+
+    A long running asyncio server which keeps the geometries and their factorized AICs
+    (InfluenceCache) warm in a LRU cache. Concurrent solve requests for the same geometry
+    are coalesced into one multi RHS solve, the numeric work runs in a thread pool
+    (LAPACK releases the GIL), so the event loop keeps accepting requests meanwhile.
+
+    Client side, SolverClient.calc_circulation is a drop-in for vlm_solver.calc_circulation:
+
+    with SolverClient(port=8765) as client:
+        gamma_magnitude, v_ind_coeff = client.calc_circulation(V_app_infw, panels)
+
+    Wire format - every message is a 4 byte big endian length followed by an uncompressed npz archive
+    (loaded with allow_pickle=False). Requests:
+        op='solve', key, V_app_infw (N, 3), return_v_ind_coeff, [corners (N, 4, 3)]
+        op='stats'
+    The geometry is identified by a hash of its corners, they are sent again
+    only when the service answers status='unknown_geometry' (first use or evicted from the cache).
+    The service recomputes the hash of the received corners and rejects a request with another key.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import socket
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from solver.panel import get_panels_corners
+from solver.vlm_solver import InfluenceCache
+from solver.profiling import stage
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+_HEADER = struct.Struct('>I')
+
+
+def encode_message(**arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    payload = buffer.getvalue()
+    return _HEADER.pack(len(payload)) + payload
+
+
+def decode_message(payload):
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def geometry_key(corners):
+    corners = np.ascontiguousarray(corners, dtype=float)
+    return hashlib.sha1(str(corners.shape).encode() + corners.tobytes()).hexdigest()
+
+
+class UnknownGeometry(KeyError):
+    pass
+
+
+def _solve_coalesced(cache, requests):
+    """
+    Runs in the executor. Requests sharing the wake direction are solved as one multi RHS problem.
+    :param requests: list of (V_app_infw, return_v_ind_coeff)
+    :return: list of (gamma_magnitude, v_ind_coeff or None)
+    """
+    results = [None] * len(requests)
+    groups = []  # (wake direction, indices)
+    for k, (V_app_infw, _) in enumerate(requests):
+        direction = cache.wake_direction(V_app_infw)
+        for group_direction, indices in groups:
+            if cache.is_same_direction(group_direction, direction):
+                indices.append(k)
+                break
+        else:
+            groups.append((direction, [k]))
+
+    with stage("service_solve", requests=len(requests), factorizations=len(groups)):
+        for _, indices in groups:
+            V_app_infw = np.array([requests[k][0] for k in indices])
+            gamma_magnitude, v_ind_coeff = cache.calc_circulation(V_app_infw)
+            for m, k in enumerate(indices):
+                results[k] = (gamma_magnitude[:, m], v_ind_coeff if requests[k][1] else None)
+    return results
+
+
+class SolverService(object):
+    """
+    :param cache_size: number of geometries kept warm
+    :param executor: concurrent.futures executor for the solves, a thread pool of `workers` by default
+    :param coalesce_delay: [s] how long the first request on a geometry waits for others to join its solve
+    """
+
+    def __init__(self, cache_size=16, executor=None, workers=None, coalesce_delay=0.):
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=workers)
+        self.executor = executor
+        self.cache_size = cache_size
+        self.coalesce_delay = coalesce_delay
+
+        self._caches = OrderedDict()  # LRU: geometry key -> InfluenceCache
+        self._pending = {}  # geometry key -> [(cache, V_app_infw, return_v_ind_coeff, future)]
+        self._draining = set()
+        self.stats = OrderedDict([('requests', 0), ('solves', 0), ('coalesced', 0),
+                                  ('cache_hits', 0), ('cache_misses', 0), ('evictions', 0)])
+
+    def get_cache(self, key, corners=None):
+        if key in self._caches:
+            self._caches.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return self._caches[key]
+        if corners is None:
+            raise UnknownGeometry(key)
+        corners = np.asarray(corners, dtype=float)
+        if geometry_key(corners) != key:
+            # a wrong key would poison the cache for every client of this geometry
+            raise ValueError("geometry key %s does not match the corners" % key)
+
+        self.stats['cache_misses'] += 1
+        cache = InfluenceCache(corners)
+        self._caches[key] = cache
+        while len(self._caches) > self.cache_size:
+            self._caches.popitem(last=False)
+            self.stats['evictions'] += 1
+        return cache
+
+    async def solve(self, key, V_app_infw, corners=None, return_v_ind_coeff=False):
+        """
+        :return: gamma_magnitude (N,), v_ind_coeff (N, N, 3) or None
+        """
+        cache = self.get_cache(key, corners)
+        if np.shape(V_app_infw) != (cache.N, 3):
+            # rejected before it can spoil a coalesced solve of other requests
+            raise ValueError("V_app_infw of shape %s, expected (%d, 3)" % (np.shape(V_app_infw), cache.N))
+        self.stats['requests'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, []).append((cache, V_app_infw, return_v_ind_coeff, future))
+        if key not in self._draining:
+            self._draining.add(key)
+            asyncio.ensure_future(self._drain(key))
+        return await future
+
+    async def _drain(self, key):
+        """
+        One drain per geometry at a time - requests arriving during a solve are coalesced into the next one,
+        so an InfluenceCache is never used by two threads at once.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.sleep(self.coalesce_delay)
+            while self._pending.get(key):
+                batch = self._pending.pop(key)
+                self.stats['solves'] += 1
+                self.stats['coalesced'] += len(batch) - 1
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor, _solve_coalesced, batch[0][0], [(V, r) for _, V, r, _ in batch])
+                except Exception as e:
+                    for *_, future in batch:
+                        future.set_exception(e)
+                    continue
+                for (*_, future), result in zip(batch, results):
+                    future.set_result(result)
+        finally:
+            self._draining.discard(key)
+
+    async def handle_request(self, request):
+        op = str(request.get('op', 'solve'))
+        if op == 'stats':
+            return dict(status='ok', **{name: np.array(value) for name, value in self.stats.items()})
+        if op != 'solve':
+            return dict(status='error', message='unknown op: %s' % op)
+
+        try:
+            gamma_magnitude, v_ind_coeff = await self.solve(
+                str(request['key']), request['V_app_infw'], request.get('corners'),
+                bool(request.get('return_v_ind_coeff', False)))
+        except UnknownGeometry:
+            return dict(status='unknown_geometry')
+        except Exception as e:
+            return dict(status='error', message='%s: %s' % (type(e).__name__, e))
+
+        response = dict(status='ok', gamma_magnitude=gamma_magnitude)
+        if v_ind_coeff is not None:
+            response['v_ind_coeff'] = v_ind_coeff
+        return response
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                payload = await reader.readexactly(_HEADER.unpack(header)[0])
+                response = await self.handle_request(decode_message(payload))
+                writer.write(encode_message(**response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class ServiceThread(threading.Thread):
+    """
+    Runs a SolverService in a background thread, i.e. inside a design tool or for tests.
+
+    service = ServiceThread(port=0).start_serving()  # port 0 - any free port
+    client = SolverClient(*service.address)
+    ...
+    service.stop()
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, **kwargs):
+        super(ServiceThread, self).__init__(daemon=True)
+        self.service = SolverService(**kwargs)
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.service.handle_connection, host, port))
+        self.address = self.server.sockets[0].getsockname()[:2]
+
+    def start_serving(self):
+        self.start()
+        return self
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+        self.service.close()
+
+
+class SolverClient(object):
+    """
+    Blocking client of a SolverService, one connection per client.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._geometry = (None, None, None)  # panels, corners, key of the last geometry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def _recv_exactly(self, n):
+        chunks = []
+        while n > 0:
+            chunk = self.sock.recv(min(n, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Solver service closed the connection")
+            chunks.append(chunk)
+            n -= len(chunk)
+        return b''.join(chunks)
+
+    def request(self, **arrays):
+        self.sock.sendall(encode_message(**arrays))
+        size = _HEADER.unpack(self._recv_exactly(_HEADER.size))[0]
+        response = decode_message(self._recv_exactly(size))
+        if str(response['status']) == 'error':
+            raise RuntimeError("Solver service error: %s" % response['message'])
+        return response
+
+    def _corners_and_key(self, panels):
+        if panels is not self._geometry[0]:
+            corners = get_panels_corners(panels)
+            self._geometry = (panels, corners, geometry_key(corners))
+        return self._geometry[1:]
+
+    def solve(self, V_app_infw, panels, return_v_ind_coeff=False):
+        """
+        :param panels: array of Panels or (N, 4, 3) corners
+        :return: response dict with gamma_magnitude (N,) [and v_ind_coeff (N, N, 3)]
+        """
+        corners, key = self._corners_and_key(panels)
+        request = dict(op='solve', key=key, V_app_infw=np.asarray(V_app_infw, dtype=float),
+                       return_v_ind_coeff=return_v_ind_coeff)
+        response = self.request(**request)
+        if str(response['status']) == 'unknown_geometry':
+            response = self.request(corners=corners, **request)
+        return response
+
+    def calc_circulation(self, V_app_ifnw, panels):
+        response = self.solve(V_app_ifnw, panels, return_v_ind_coeff=True)
+        return response['gamma_magnitude'], response['v_ind_coeff']
+
+    def stats(self):
+        response = self.request(op='stats')
+        return {name: int(value) for name, value in response.items() if name != 'status'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pyVLM local solver service")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=16, help="number of geometries kept warm")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="solver threads")
+    args = parser.parse_args(argv)
+
+    service = SolverService(cache_size=args.cache_size, workers=args.workers)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(asyncio.start_server(service.handle_connection, args.host, args.port))
+    print("pyVLM solver service listening on %s:%d" % server.sockets[0].getsockname()[:2])
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
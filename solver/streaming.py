@@ -0,0 +1,153 @@
+"""
+    Quasi-steady solver for time series of the apparent wind.
+
+    Every sample of the log is an InflowState:
+        speed     - apparent wind speed at the reference height [m/s]
+        angle_deg - apparent wind angle, rotation of the inflow (1, 0, 0) about `angle_axis`
+        gradient  - speed gradient with height [1/s], V(h) = speed + gradient * (h - reference_height),
+                    the height is measured along `height_axis`
+
+    The samples are read from any iterable in blocks of `block_size`. Within a block
+    consecutive samples whose inflow direction differs from the factorized one by less than
+    `direction_tol` are solved as one multi RHS problem, the AIC is refactorized only when
+    the wake direction drifts further (the factorization is kept across the blocks). Only one block is held in memory at a time,
+    so arbitrarily long logs are processed in constant memory.
+
+    example
+
+    solver = StreamingSolver(panels, rho=1.225, direction_tol=np.deg2rad(0.5))
+    for sample in solver.solve_stream(InflowState(*row) for row in log):
+        print(sample.total_force)
+"""
+
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import InfluenceCache
+from solver.forces import calc_kutta_joukowski_forces
+from solver.profiling import stage
+
+InflowState = namedtuple('InflowState', ['speed', 'angle_deg', 'gradient'])
+InflowState.__new__.__defaults__ = (0., 0.)
+
+StreamSample = namedtuple('StreamSample', ['index', 'state', 'gamma_magnitude', 'force', 'total_force', 'moment'])
+
+
+class StreamingSolver(object):
+    """
+    :param panels: array of Panels
+    :param rho: fluid density
+    :param angle_axis: the apparent wind angle is a rotation about this axis
+    :param height_axis: direction of the height used by the speed gradient
+    :param reference_height: height at which the speed is given
+    :param reference_point: moments are taken about this point
+    :param direction_tol: max difference of the unit inflow directions for which
+                          the factorization (and the wake) of an earlier sample is reused
+    :param block_size: number of samples read and solved at once
+    """
+
+    def __init__(self, panels, rho=1., angle_axis=(0, 0, 1), height_axis=(0, 0, 1), reference_height=0.,
+                 reference_point=(0, 0, 0), direction_tol=1e-3, block_size=64):
+        self.cache = InfluenceCache(panels, direction_tol=direction_tol)
+        self.geometry = self.cache.geometry
+        self.rho = rho
+        self.angle_axis = np.asarray(angle_axis, dtype=float)
+        self.block_size = block_size
+        self.reference_point = np.asarray(reference_point, dtype=float)
+
+        height_axis = np.asarray(height_axis, dtype=float)
+        self.heights = np.dot(self.geometry.ctr_p, height_axis / np.linalg.norm(height_axis)) - reference_height
+
+        self.n_samples = 0
+
+    @property
+    def n_factorizations(self):
+        return self.cache.n_factorizations
+
+    def inflow_direction(self, angle_deg):
+        return np.dot(rotation_matrix(self.angle_axis, np.deg2rad(angle_deg)), [1., 0., 0.])
+
+    def make_inflow(self, state):
+        """
+        :return: (N, 3) V_app_infw of the sample
+        """
+        state = InflowState(*state)
+        speed = state.speed + state.gradient * self.heights
+        return speed[:, None] * self.inflow_direction(state.angle_deg)
+
+    def _runs(self, V_app_infw):
+        """
+        Split a block into runs of consecutive samples sharing one factorization. A run is generated
+        after the previous one has been solved - its samples match the direction of its first sample
+        and, when this one reuses the current factorization, the factorized direction as well.
+        """
+        directions = [self.cache.wake_direction(V) for V in V_app_infw]
+        start = 0
+        while start < len(directions):
+            references = [directions[start]]
+            if self.cache.is_same_direction(self.cache.factorized_direction, directions[start]):
+                references.append(self.cache.factorized_direction)
+            end = start + 1
+            while end < len(directions) and all(self.cache.is_same_direction(reference, directions[end])
+                                                for reference in references):
+                end += 1
+            yield start, end
+            start = end
+
+    def _solve_run(self, V_app_infw):
+        """
+        :param V_app_infw: (n, N, 3) samples sharing the wake direction of the first one
+        :return: gamma_magnitude (n, N), force (n, N, 3)
+        """
+        gamma_magnitude, _ = self.cache.calc_circulation(V_app_infw)
+        gamma_magnitude = gamma_magnitude.T
+
+        v_ind_coeff_cp = self.cache.get_v_ind_coeff(V_app_infw[0], at='cp')
+        V_at_cp = V_app_infw + np.einsum('ijk,mj->mik', v_ind_coeff_cp, gamma_magnitude)
+        force = calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, self.geometry, rho=self.rho)
+        return gamma_magnitude, force
+
+    def solve_block(self, states):
+        """
+        :param states: sequence of InflowStates
+        :return: list of StreamSamples
+        """
+        states = [InflowState(*state) for state in states]
+        V_app_infw = np.array([self.make_inflow(state) for state in states])
+
+        samples = []
+        with stage("stream_block", samples=len(states)) as s:
+            factorizations = self.n_factorizations
+            for start, end in self._runs(V_app_infw):
+                gamma_magnitude, force = self._solve_run(V_app_infw[start:end])
+                total_force = np.sum(force, axis=1)
+                moment = np.sum(np.cross(self.geometry.cp - self.reference_point, force), axis=1)
+                for k in range(end - start):
+                    samples.append(StreamSample(self.n_samples, states[start + k], gamma_magnitude[k],
+                                                force[k], total_force[k], moment[k]))
+                    self.n_samples += 1
+            s.count(factorizations=self.n_factorizations - factorizations)
+        return samples
+
+    def solve_stream(self, states):
+        """
+        Generator of StreamSamples, one per inflow state, in the order of `states`.
+        :param states: any iterable of InflowStates or (speed, angle_deg, gradient) tuples
+        """
+        states = iter(states)
+        while True:
+            block = list(islice(states, self.block_size))
+            if not block:
+                return
+            for sample in self.solve_block(block):
+                yield sample
+
+
+def stream_forces(panels, states, **kwargs):
+    """
+    Shortcut for StreamingSolver(panels, **kwargs).solve_stream(states)
+    """
+    return StreamingSolver(panels, **kwargs).solve_stream(states)
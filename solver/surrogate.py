@@ -0,0 +1,280 @@
+"""
+    Surrogate lookup tables of the force coefficients.
+
+    SurrogateBuilder runs the solver over a regular grid of the operating parameters
+    (angle of attack, heel, leeway and, for a foil under the free surface, Froude number and submergence)
+    and stores CL, CD, CS in an N-dimensional SurrogateTable. Queries are vectorized multilinear
+    (or cubic spline) interpolations, cheap enough for a velocity prediction program.
+
+    Only the inflow direction needs a solve - the grid over Fn and h/c reuses it, the free surface
+    enters through the lift factor K of calc_free_surface_effect_on_CL applied to the circulation:
+    the freestream part of the Kutta-Joukowski force scales with K, the induced part with K^2.
+    K has data for h/c = 1 only, so the h/c axis must stay within 0.9 - 1.1.
+    With a fixed wake direction all solves share one LU factorization of the AIC.
+
+    Axes: x - drag, y - side force, z - lift. The body is rotated by AoA about y,
+    by leeway about z and by heel about x, in this order; instead of the panels the inflow is rotated.
+
+    example
+
+    builder = SurrogateBuilder(panels)
+    table = builder.build(AoA_deg=np.linspace(-4, 8, 13), heel_deg=[0, 10, 20, 30], leeway_deg=[0, 2, 4])
+    errors = builder.spot_check(table, n_samples=20)
+    table.save("foil.npz")
+
+    table = SurrogateTable.load("foil.npz")
+    CL, CD = get_CL_CD_from_table(table, AoA_deg=alpha, heel_deg=heel, leeway_deg=leeway)
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import InfluenceCache
+from solver.coeff_formulas import calc_free_surface_effect_on_CL
+from solver.profiling import stage
+
+AXIS_NAMES = ('AoA_deg', 'heel_deg', 'leeway_deg', 'Fn', 'h_over_chord')
+COEFFICIENT_NAMES = ('CL', 'CD', 'CS')
+
+
+class SurrogateTable(object):
+    """
+    :param axis_names: names of the grid axes, see AXIS_NAMES
+    :param axis_values: list of increasing 1D arrays
+    :param values: (len(axis_values[0]), ..., len(coefficient_names)) coefficients at the grid points
+    :param errors: optional dict coefficient name -> {'max_abs', 'rms'}, see SurrogateBuilder.spot_check
+    """
+
+    def __init__(self, axis_names, axis_values, values, coefficient_names=COEFFICIENT_NAMES, errors=None):
+        self.axis_names = tuple(axis_names)
+        self.axis_values = [np.asarray(v, dtype=float) for v in axis_values]
+        self.values = np.asarray(values, dtype=float)
+        self.coefficient_names = tuple(coefficient_names)
+        self.errors = errors
+
+        if self.values.shape != tuple(len(v) for v in self.axis_values) + (len(self.coefficient_names),):
+            raise ValueError("Table shape %s does not match the axes" % (self.values.shape,))
+        for name, v in zip(self.axis_names, self.axis_values):
+            if np.any(np.diff(v) <= 0):
+                raise ValueError("Values of the axis %s must be increasing" % name)
+
+    @property
+    def bounds(self):
+        return {name: (v[0], v[-1]) for name, v in zip(self.axis_names, self.axis_values)}
+
+    def _coordinates(self, params):
+        unknown = set(params) - set(self.axis_names)
+        if unknown:
+            raise ValueError("Unknown parameters %s, the axes are %s" % (sorted(unknown), self.axis_names))
+        coordinates = []
+        for name, v in zip(self.axis_names, self.axis_values):
+            if name not in params:
+                if len(v) > 1:
+                    raise ValueError("Parameter %s is required" % name)
+                coordinates.append(v[0])
+            else:
+                coordinates.append(params[name])
+        return np.broadcast_arrays(*[np.asarray(c, dtype=float) for c in coordinates])
+
+    def _multilinear(self, coordinates):
+        shape = coordinates[0].shape
+        lower, weights = [], []
+        for x, v in zip(coordinates, self.axis_values):
+            x = x.ravel()
+            if len(v) == 1:
+                lower.append(np.zeros(x.shape, dtype=int))
+                weights.append(np.zeros(x.shape))
+                continue
+            i = np.clip(np.searchsorted(v, x, side='right') - 1, 0, len(v) - 2)
+            lower.append(i)
+            weights.append(np.clip((x - v[i]) / (v[i + 1] - v[i]), 0., 1.))
+
+        result = np.zeros((lower[0].size, len(self.coefficient_names)))
+        for corner in itertools.product((0, 1), repeat=len(lower)):
+            w = np.ones(lower[0].size)
+            index = []
+            for c, i, t, v in zip(corner, lower, weights, self.axis_values):
+                w = w * (t if c else 1. - t)
+                index.append(np.minimum(i + c, len(v) - 1))
+            result += w[:, None] * self.values[tuple(index)]
+        return result.reshape(shape + (len(self.coefficient_names),))
+
+    def _cubic(self, coordinates):
+        from scipy.interpolate import RegularGridInterpolator
+
+        active = [k for k, v in enumerate(self.axis_values) if len(v) > 1]
+        for k in active:
+            if len(self.axis_values[k]) < 4:
+                raise ValueError("Cubic interpolation needs at least 4 points along %s" % self.axis_names[k])
+        values = self.values[tuple(slice(None) if k in active else 0 for k in range(len(self.axis_values)))]
+        interpolator = RegularGridInterpolator([self.axis_values[k] for k in active], values, method='cubic')
+        bounded = [np.clip(coordinates[k], self.axis_values[k][0], self.axis_values[k][-1]) for k in active]
+        points = np.stack([c.ravel() for c in bounded], axis=-1)
+        return interpolator(points).reshape(coordinates[0].shape + (len(self.coefficient_names),))
+
+    def __call__(self, method='linear', **params):
+        """
+        Parameters outside of the table are clipped to its bounds, as in np.interp.
+
+        :param method: 'linear' (multilinear) or 'cubic' (spline, needs scipy)
+        :param params: values of the axes, arrays are broadcast against each other
+        :return: dict coefficient name -> array of the broadcast shape
+        """
+        coordinates = self._coordinates(params)
+        if method == 'linear':
+            result = self._multilinear(coordinates)
+        elif method == 'cubic':
+            result = self._cubic(coordinates)
+        else:
+            raise ValueError("method must be 'linear' or 'cubic'")
+        return {name: result[..., k] for k, name in enumerate(self.coefficient_names)}
+
+    def save(self, path):
+        arrays = {'axis_%d' % k: v for k, v in enumerate(self.axis_values)}
+        if self.errors is not None:
+            # one row per coefficient: max_abs, rms
+            arrays['error_names'] = np.array(list(self.errors))
+            arrays['errors'] = np.array([[e['max_abs'], e['rms']] for e in self.errors.values()]).reshape(-1, 2)
+        np.savez(path, axis_names=np.array(self.axis_names), coefficient_names=np.array(self.coefficient_names),
+                 values=self.values, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            axis_names = [str(name) for name in data['axis_names']]
+            axis_values = [data['axis_%d' % k] for k in range(len(axis_names))]
+            errors = None
+            if 'errors' in data.files:
+                errors = {str(name): {'max_abs': float(max_abs), 'rms': float(rms)}
+                          for name, (max_abs, rms) in zip(data['error_names'], data['errors'])}
+            return cls(axis_names, axis_values, data['values'],
+                       coefficient_names=[str(name) for name in data['coefficient_names']], errors=errors)
+
+
+def get_CL_CD_from_table(table, method='linear', **params):
+    """
+    get_CL_CD_free_wing counterpart for a SurrogateTable, i.e.
+    CL, CD = get_CL_CD_from_table(table, AoA_deg=alpha, heel_deg=heel)
+    """
+    coefficients = table(method=method, **params)
+    return coefficients['CL'], coefficients['CD']
+
+
+def _body_rotation(AoA_deg, heel_deg, leeway_deg):
+    """
+    :return: rotation from body to wind axes
+    """
+    Ry = rotation_matrix([0, 1, 0], np.deg2rad(AoA_deg))
+    Rz = rotation_matrix([0, 0, 1], np.deg2rad(leeway_deg))
+    Rx = rotation_matrix([1, 0, 0], np.deg2rad(heel_deg))
+    return np.dot(Rx, np.dot(Rz, Ry))
+
+
+class SurrogateBuilder(object):
+    """
+    :param panels: array of Panels or (N, 4, 3) corners, in body axes
+    :param S: reference area, by default the area of the panels
+    :param fixed_wake_direction: optional (3,), the wake is frozen along it and all solves share one factorization
+    """
+
+    def __init__(self, panels, S=None, fixed_wake_direction=None):
+        self.cache = InfluenceCache(panels, fixed_wake_direction=fixed_wake_direction)
+        self.geometry = self.cache.geometry
+        self.S = S if S is not None else np.sum(self.geometry.areas)
+        self.solves = 0
+        self.time_s = 0.
+
+    def _force_parts(self, V_body):
+        """
+        :param V_body: (n, 3) unit inflows in body axes
+        :return: freestream and induced parts of the total force (n, 3), rho = 1
+        """
+        N = self.cache.N
+        V_app_infw = np.repeat(V_body[:, None, :], N, axis=1)
+        bc = self.geometry.C - self.geometry.B
+
+        if self.cache.fixed_wake_direction is not None:
+            gammas, _ = self.cache.calc_circulation(V_app_infw)  # one multi RHS solve
+            gammas = gammas.reshape(N, -1).T
+        else:
+            gammas = np.array([self.cache.calc_circulation(V)[0] for V in V_app_infw])
+        self.solves += len(V_body)
+
+        F_free = np.empty((len(V_body), 3))
+        F_ind = np.empty((len(V_body), 3))
+        for k, (V, gamma_magnitude) in enumerate(zip(V_app_infw, gammas)):
+            v_ind_coeff = self.cache.get_v_ind_coeff(V, at='cp')
+            gamma = bc * gamma_magnitude[:, None]
+            F_free[k] = np.sum(np.cross(V, gamma), axis=0)
+            F_ind[k] = np.sum(np.cross(np.einsum('ijk,j->ik', v_ind_coeff, gamma_magnitude), gamma), axis=0)
+        return F_free, F_ind
+
+    def solve(self, AoA_deg, heel_deg=0., leeway_deg=0., Fn=None, h_over_chord=None):
+        """
+        Full solves, the parameters are broadcast against each other.
+        Cases differing only in Fn and h/c share the solve.
+
+        :return: (..., len(COEFFICIENT_NAMES)) coefficients CL, CD, CS
+        """
+        t0 = time.perf_counter()
+        angles = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (AoA_deg, heel_deg, leeway_deg)])
+        shape = angles[0].shape
+        angles = np.stack([a.ravel() for a in angles], axis=-1)
+        unique_angles, inverse = np.unique(angles, axis=0, return_inverse=True)
+        inverse = np.ravel(inverse)
+
+        rotations = np.array([_body_rotation(*a) for a in unique_angles])
+        V_body = np.einsum('nji,j->ni', rotations, [1., 0., 0.])  # unit speed, R^T V
+        with stage("surrogate_solve", solves=len(unique_angles), unknowns=self.cache.N):
+            F_free, F_ind = self._force_parts(V_body)
+        F_free = np.einsum('nij,nj->ni', rotations, F_free)[inverse].reshape(shape + (3,))
+        F_ind = np.einsum('nij,nj->ni', rotations, F_ind)[inverse].reshape(shape + (3,))
+
+        K = 1.
+        if Fn is not None and h_over_chord is not None:
+            K = calc_free_surface_effect_on_CL(Fn, h_over_chord)[..., None]
+        F = K * F_free + K * K * F_ind
+
+        qS = 0.5 * self.S
+        self.time_s += time.perf_counter() - t0
+        return np.stack([F[..., 2] / qS, F[..., 0] / qS, F[..., 1] / qS], axis=-1)
+
+    def build(self, AoA_deg, heel_deg=(0.,), leeway_deg=(0.,), Fn=None, h_over_chord=None):
+        """
+        :param AoA_deg, heel_deg, leeway_deg: increasing 1D grids of the axes
+        :param Fn, h_over_chord: optional grids of the free surface axes, both or none
+        :return: SurrogateTable
+        """
+        if (Fn is None) != (h_over_chord is None):
+            raise ValueError("The free surface needs both Fn and h_over_chord axes")
+        axes = [AoA_deg, heel_deg, leeway_deg] if Fn is None else [AoA_deg, heel_deg, leeway_deg, Fn, h_over_chord]
+        axes = [np.atleast_1d(np.asarray(a, dtype=float)) for a in axes]
+
+        grid = np.meshgrid(*axes, indexing='ij')
+        with stage("surrogate_build", cases=grid[0].size):
+            values = self.solve(*grid)
+        return SurrogateTable(AXIS_NAMES[:len(axes)], axes, values)
+
+    def spot_check(self, table, n_samples=16, seed=0, method='linear'):
+        """
+        Error estimate of the table - full solves at random points within its bounds.
+        The result is stored in table.errors as well.
+
+        :return: dict coefficient name -> {'max_abs', 'rms'}
+        """
+        rng = np.random.RandomState(seed)
+        params = {name: rng.uniform(v[0], v[-1], n_samples)
+                  for name, v in zip(table.axis_names, table.axis_values) if len(v) > 1}
+        interpolated = table(method=method, **params)
+
+        coordinates = table._coordinates(params)
+        exact = self.solve(*coordinates)
+        errors = {}
+        for k, name in enumerate(table.coefficient_names):
+            error = interpolated[name] - exact[..., k]
+            errors[name] = {'max_abs': float(np.max(np.abs(error))), 'rms': float(np.sqrt(np.mean(error ** 2)))}
+        table.errors = errors
+        return errors
@@ -0,0 +1,140 @@
+"""
+    Thread-pool sweeps on one geometry.
+
+    The AIC of the geometry is assembled and LU factorized once, with the wake frozen along
+    `wake_direction` (see InfluenceCache, fixed_wake_direction). The factors and the influence
+    coefficients at the centres of pressure are made read-only and shared by all threads.
+    The cases are split in chunks, every thread solves its chunk as a multi RHS problem and
+    writes the circulation and the forces into its slice of the preallocated outputs - nothing
+    else is shared. The LAPACK solve and the BLAS products release the GIL, so the chunks overlap
+    on many cores without the process start up and pickling cost of a process pool.
+
+    Speed and density sweeps along the wake direction are exact, other inflow directions
+    are solved with the frozen wake.
+
+    example
+
+    sweep = ThreadedSweep(panels, wake_direction=[1, 0, 0], workers=4)
+    result = sweep.run(V_app_infw=speeds[:, None] * [1, 0, 0], rho=1.225)
+    result = sweep.run(V_next, out=result)  # the outputs are reused
+"""
+
+import numpy as np
+
+from solver.vlm_solver import InfluenceCache
+from solver.forces import calc_kutta_joukowski_forces
+from solver.profiling import stage
+
+
+class SweepResult(object):
+    """
+    Preallocated outputs of a sweep of n_cases.
+
+    :ivar gamma_magnitude: (n_cases, N)
+    :ivar force: (n_cases, N, 3)
+    :ivar total_force: (n_cases, 3)
+    """
+
+    def __init__(self, n_cases, N):
+        self.gamma_magnitude = np.empty((n_cases, N))
+        self.force = np.empty((n_cases, N, 3))
+        self.total_force = np.empty((n_cases, 3))
+
+    def __len__(self):
+        return len(self.gamma_magnitude)
+
+
+def _read_only(a):
+    a = np.ascontiguousarray(a)
+    a.flags.writeable = False
+    return a
+
+
+class ThreadedSweep(object):
+    """
+    :param panels: array of Panels or (N, 4, 3) corners
+    :param wake_direction: (3,) direction of the trailing legs, shared by all cases
+    :param workers: number of threads, by default the number of cores
+    :param chunk_size: cases solved together by one thread
+    """
+
+    def __init__(self, panels, wake_direction, workers=None, chunk_size=16):
+        cache = InfluenceCache(panels, fixed_wake_direction=wake_direction)
+        self.N = cache.N
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+        wake = cache.fixed_wake_direction
+        from scipy.linalg.lapack import get_lapack_funcs
+
+        lu, piv = cache.factorize(wake)
+        self._lu = _read_only(lu)
+        self._piv = _read_only(piv)
+        self._laswp, = get_lapack_funcs(('laswp',), (lu,))
+        self._normals = _read_only(cache.geometry.normals)
+        self._geometry = cache.geometry
+        # induced velocity at the centres of pressure as one product: gamma (n, N) @ (N, 3 N)
+        v_ind_coeff = cache.get_v_ind_coeff(wake, at='cp')
+        self._v_ind_matrix = _read_only(v_ind_coeff.transpose(1, 0, 2).reshape(self.N, 3 * self.N))
+
+    def allocate(self, n_cases):
+        return SweepResult(n_cases, self.N)
+
+    def _solve_lu(self, RHS):
+        """
+        P A = L U - the row interchanges (laswp) and two triangular solves, i.e. getrs done in steps.
+        solve_factorized (lu_solve, getrs) is not used here: called from two or more threads on shared
+        factors it returned wrong solutions and aborted the process (double free) with scipy 1.17.1
+        and its bundled OpenBLAS 0.3.30, while laswp and trsm are fine. test_many_threads exercises it.
+        """
+        from scipy.linalg import solve_triangular
+
+        with stage("lu_solve", unknowns=self.N):
+            y = solve_triangular(self._lu, self._laswp(RHS, self._piv, off=0), lower=True, unit_diagonal=True,
+                                 check_finite=False)
+            return solve_triangular(self._lu, y, check_finite=False)
+
+    def _solve_chunk(self, V_app_infw, rho, out, chunk):
+        V = V_app_infw[chunk]
+        RHS = -np.sum(V * self._normals, axis=-1)
+        gamma_magnitude = self._solve_lu(RHS.T).T
+
+        V_at_cp = V + np.dot(gamma_magnitude, self._v_ind_matrix).reshape(-1, self.N, 3)
+        force = calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, self._geometry, rho=rho[chunk])
+
+        out.gamma_magnitude[chunk] = gamma_magnitude
+        out.force[chunk] = force
+        out.total_force[chunk] = np.sum(force, axis=1)
+
+    def run(self, V_app_infw, rho=1., out=None):
+        """
+        :param V_app_infw: (n_cases, 3) uniform inflows or (n_cases, N, 3)
+        :param rho: scalar or (n_cases,)
+        :param out: optional SweepResult of n_cases, see allocate
+        :return: SweepResult
+        """
+        V_app_infw = np.asarray(V_app_infw, dtype=float)
+        if V_app_infw.ndim == 2:
+            V_app_infw = V_app_infw[:, None, :]
+        n_cases = len(V_app_infw)
+        V_app_infw = np.broadcast_to(V_app_infw, (n_cases, self.N, 3))
+        rho = np.broadcast_to(np.asarray(rho, dtype=float), (n_cases,))
+
+        if out is None:
+            out = self.allocate(n_cases)
+        elif len(out) != n_cases or out.gamma_magnitude.shape[1] != self.N:
+            raise ValueError("The outputs do not match %d cases of %d panels" % (n_cases, self.N))
+
+        chunks = [slice(start, min(start + self.chunk_size, n_cases)) for start in range(0, n_cases, self.chunk_size)]
+        with stage("threaded_sweep", cases=n_cases, unknowns=self.N, chunks=len(chunks)):
+            if self.workers == 1 or len(chunks) == 1:
+                for chunk in chunks:
+                    self._solve_chunk(V_app_infw, rho, out, chunk)
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    futures = [executor.submit(self._solve_chunk, V_app_infw, rho, out, chunk) for chunk in chunks]
+                    for future in futures:
+                        future.result()  # re-raise the errors of the workers
+        return out
@@ -0,0 +1,180 @@
+"""
+    Regular lattices - block-Toeplitz AIC with FFT matrix vector products.
+
+    A mesh is regular when every panel is a translation of the first one,
+    mesh[i][j] = mesh[0][0] + i * dc + j * ds, i.e. a flat untapered wing from make_panels_from_points.
+    With a uniform freestream (the wake of every horseshoe along the same direction)
+    the influence of panel (k, l) on panel (i, j) depends only on the offset (i - k, j - l).
+    Only the (2 nc - 1) (2 ns - 1) unique influences are computed, the AIC and the induced velocities
+    at the centres of pressure are applied as 2D convolutions by FFT in O(N log N) and the circulation
+    is found with GMRES, preconditioned by the optimal circulant (T. Chan) approximation of the AIC.
+    Memory is O(N), so meshes far beyond the reach of the dense solver are practical.
+
+    example
+
+    panels, mesh = make_panels_from_points(points, [nc, ns])
+    lattice = RegularLattice(mesh, V)
+    gamma_magnitude, iterations = lattice.solve()
+    F = lattice.calc_forces(gamma_magnitude, rho=rho)
+"""
+
+import numpy as np
+
+from solver.mesher import mesh_to_corners
+from solver.panel import calc_panels_geometry
+from solver.kernels import get_kernel_backend
+from solver.vlm_solver import solve_iterative
+from solver.forces import calc_kutta_joukowski_forces
+from solver.profiling import stage
+
+
+def is_regular_lattice(mesh, tol=1e-9):
+    """
+    :param tol: max deviation from the regular lattice, relative to the panel size
+    :return: True if mesh[i][j] = mesh[0][0] + i * dc + j * ds
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    nc, ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+    dc = mesh[1, 0] - mesh[0, 0]
+    ds = mesh[0, 1] - mesh[0, 0]
+    i, j = np.meshgrid(np.arange(nc + 1), np.arange(ns + 1), indexing='ij')
+    regular = mesh[0, 0] + i[..., None] * dc + j[..., None] * ds
+    size = min(np.linalg.norm(dc), np.linalg.norm(ds))
+    return bool(np.max(np.abs(mesh - regular)) <= tol * size)
+
+
+class RegularLattice(object):
+    """
+    :param mesh: (nc + 1, ns + 1, 3) regular mesh, see is_regular_lattice
+    :param V_app_infw: (3,) uniform freestream
+    """
+
+    def __init__(self, mesh, V_app_infw):
+        mesh = np.asarray(mesh, dtype=float)
+        if not is_regular_lattice(mesh):
+            raise ValueError("Mesh is not a regular lattice, use the dense solver!")
+        self.V_app_infw = np.asarray(V_app_infw, dtype=float)
+        if self.V_app_infw.shape != (3,):
+            raise ValueError("A regular lattice needs a uniform freestream (3,)")
+
+        self.nc, self.ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+        self.N = self.nc * self.ns
+        self.dc = mesh[1, 0] - mesh[0, 0]
+        self.ds = mesh[0, 1] - mesh[0, 0]
+        self.shape = (2 * self.nc, 2 * self.ns)  # zero padded, a linear convolution without wrap around
+
+        first = calc_panels_geometry(mesh_to_corners(mesh[:2, :2]))
+        self.first = first
+        self.normal = first.normals[0]
+
+        with stage("toeplitz_kernels", horseshoe_kernel_calls=2 * np.prod(self.shape)):
+            # influence of panel (0, 0) on the points of panel (di, dj), di, dj in -(n-1) .. n-1
+            v_ctr = self._kernel(first.ctr_p[0])
+            self._aic_hat = np.fft.rfft2(np.einsum('pqk,k->pq', v_ctr, self.normal))
+            self._v_cp_hat = np.fft.rfft2(self._kernel(first.cp[0]), axes=(0, 1))
+            self._circulant = self._circulant_eigenvalues(np.einsum('pqk,k->pq', v_ctr, self.normal))
+
+    def _kernel(self, point):
+        """
+        :return: (2 nc, 2 ns, 3) velocity induced by panel (0, 0) at `point` shifted by (di, dj),
+                 stored circularly - offset -1 at the last index, the padding row/column stays zero
+        """
+        P, Q = self.shape
+        di = np.fft.fftfreq(P, 1. / P).astype(int)
+        dj = np.fft.fftfreq(Q, 1. / Q).astype(int)
+        points = point + di[:, None, None] * self.dc + dj[None, :, None] * self.ds
+        v = get_kernel_backend().horseshoe_vortices(points.reshape(-1, 3), self.first.B, self.first.C,
+                                                    self.V_app_infw[None])
+        v = v.reshape(P, Q, 3)
+        v[np.abs(di) >= self.nc] = 0.
+        v[:, np.abs(dj) >= self.ns] = 0.
+        return v
+
+    def _circulant_eigenvalues(self, a):
+        """
+        Eigenvalues of the optimal (T. Chan) nc x ns block circulant approximation of the AIC,
+        c[k, l] - influences at the offsets k and k - nc (l and l - ns) weighted by how often they occur.
+        """
+        nc, ns = self.nc, self.ns
+        P, Q = self.shape
+        k = np.arange(nc)[:, None]
+        l = np.arange(ns)[None, :]
+        wk, wl = k / float(nc), l / float(ns)
+        circulant = (1 - wk) * (1 - wl) * a[k, l] + wk * (1 - wl) * a[(k - nc) % P, l] \
+            + (1 - wk) * wl * a[k, (l - ns) % Q] + wk * wl * a[(k - nc) % P, (l - ns) % Q]
+        eigenvalues = np.fft.fft2(circulant)
+        if np.min(np.abs(eigenvalues)) < 1e-12 * np.max(np.abs(eigenvalues)):
+            return None  # singular approximation, no preconditioning
+        return eigenvalues
+
+    def _convolve(self, kernel_hat, x, axes=(0, 1)):
+        x_pad = np.zeros(self.shape + x.shape[2:])
+        x_pad[:self.nc, :self.ns] = x
+        x_hat = np.fft.rfft2(x_pad, axes=(0, 1))
+        if kernel_hat.ndim > 2:
+            x_hat = x_hat[..., None]
+        y = np.fft.irfft2(kernel_hat * x_hat, s=self.shape, axes=(0, 1))
+        return y[:self.nc, :self.ns]
+
+    def aic_matvec(self, gamma_magnitude):
+        """
+        :return: A @ gamma_magnitude, A as in assembly_sys_of_eq
+        """
+        return self._convolve(self._aic_hat, np.reshape(gamma_magnitude, (self.nc, self.ns))).ravel()
+
+    def induced_velocity_at_cp(self, gamma_magnitude):
+        """
+        :return: (N, 3), the same as calc_induced_velocity(calc_v_ind_coeff_at_cp(...), gamma_magnitude)
+        """
+        v = self._convolve(self._v_cp_hat, np.reshape(gamma_magnitude, (self.nc, self.ns)))
+        return v.reshape(self.N, 3)
+
+    def rhs(self):
+        return np.full(self.N, -np.dot(self.V_app_infw, self.normal))
+
+    def dense(self):
+        """
+        :return: (N, N) AIC, for tests and small meshes only
+        """
+        return np.array([self.aic_matvec(e) for e in np.eye(self.N)]).T
+
+    def linear_operator(self):
+        from scipy.sparse.linalg import LinearOperator
+        return LinearOperator((self.N, self.N), matvec=self.aic_matvec, dtype=float)
+
+    def preconditioner(self):
+        """
+        :return: LinearOperator applying the inverse of the circulant approximation of the AIC, or None
+        """
+        if self._circulant is None:
+            return None
+        from scipy.sparse.linalg import LinearOperator
+
+        def apply(r):
+            r = np.reshape(r, (self.nc, self.ns))
+            return np.real(np.fft.ifft2(np.fft.fft2(r) / self._circulant)).ravel()
+
+        return LinearOperator((self.N, self.N), matvec=apply, dtype=float)
+
+    def solve(self, x0=None, tol=1e-10, precondition=True):
+        """
+        :return: gamma_magnitude (N,), GMRES iterations
+        """
+        M = self.preconditioner() if precondition else None
+        return solve_iterative(self.linear_operator(), self.rhs(), x0=x0, tol=tol, M=M)
+
+    def calc_forces(self, gamma_magnitude, rho=1.):
+        """
+        :return: (N, 3), the same as calc_force_wrapper
+        """
+        V_at_cp = self.V_app_infw + self.induced_velocity_at_cp(gamma_magnitude)
+        return calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, self.first, rho=rho)  # all panels alike
+
+
+def solve_regular_lattice(mesh, V_app_infw, rho=1., tol=1e-10):
+    """
+    :return: gamma_magnitude (N,), force (N, 3)
+    """
+    lattice = RegularLattice(mesh, V_app_infw)
+    gamma_magnitude, _ = lattice.solve(tol=tol)
+    return gamma_magnitude, lattice.calc_forces(gamma_magnitude, rho=rho)
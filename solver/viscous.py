@@ -0,0 +1,177 @@
+"""
+    Viscous strip theory correction of the lattice (the alpha method of van Dam).
+
+    Every spanwise strip looks up its 2D polar. The lattice lift of the strip, cl_inv = 2 Gamma / (V c),
+    tells the effective angle of attack of the section - the geometric one reduced by the downwash:
+
+        alpha_eff = cl_inv / lift_slope + alpha_L0 - delta_alpha
+
+    The polar gives cl_visc(alpha_eff), the strips are twisted by delta_alpha (nose up about the
+    bound vortices, as in solver.optimal_loading) until the lattice matches it:
+
+        delta_alpha_{k+1} = delta_alpha_k + relaxation * (cl_visc - cl_inv) / lift_slope
+
+    Twisting only rotates the normals of the boundary condition, RHS = -V . (n cos + (t x n) sin),
+    so the AIC is factorized once and an iteration costs a triangular solve and a table lookup.
+    The profile drag of the polar is added along the local inflow at the centres of pressure -
+    the freestream with the velocity induced by the lattice, i.e. tilted by the downwash.
+
+    example
+
+    polar = PolarTable(alpha_deg, cl, cd)  # cl, cd: (n_alpha,) or (ns, n_alpha) for every strip
+    result = solve_viscous(mesh, V_app_infw, polar, rho=1.225)
+    print(result.format_table())
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from solver.mesher import mesh_to_corners
+from solver.vlm_solver import InfluenceCache, calc_induced_velocity, solve_factorized
+from solver.forces import calc_forces
+from solver.profiling import stage
+
+ViscousIteration = namedtuple('ViscousIteration', ['iteration', 'residual', 'max_delta_alpha_deg', 'time_s'])
+
+
+class PolarTable(object):
+    """
+    Lift and drag polars of the sections, interpolated linearly for all strips at once
+    and held constant outside of the alpha range.
+
+    :param alpha_deg: (n_alpha,) increasing angles of attack, shared by all strips
+    :param cl, cd: (n_alpha,) one polar for all strips or (ns, n_alpha) a polar per strip
+    """
+
+    def __init__(self, alpha_deg, cl, cd):
+        self.alpha_deg = np.asarray(alpha_deg, dtype=float)
+        if np.any(np.diff(self.alpha_deg) <= 0.):
+            raise ValueError("alpha_deg must be increasing")
+        self.cl = np.atleast_2d(np.asarray(cl, dtype=float))
+        self.cd = np.atleast_2d(np.asarray(cd, dtype=float))
+        if self.cl.shape[-1] != len(self.alpha_deg) or self.cd.shape[-1] != len(self.alpha_deg):
+            raise ValueError("cl and cd must have a value for every alpha")
+
+    def __call__(self, alpha_deg):
+        """
+        :param alpha_deg: (ns,) angle of attack of every strip
+        :return: cl (ns,), cd (ns,)
+        """
+        alpha_deg = np.clip(np.asarray(alpha_deg, dtype=float), self.alpha_deg[0], self.alpha_deg[-1])
+        right = np.clip(np.searchsorted(self.alpha_deg, alpha_deg), 1, len(self.alpha_deg) - 1)
+        left = right - 1
+        w = (alpha_deg - self.alpha_deg[left]) / (self.alpha_deg[right] - self.alpha_deg[left])
+
+        def interp(table):
+            table = np.broadcast_to(table, (len(alpha_deg), len(self.alpha_deg)))
+            rows = np.arange(len(alpha_deg))
+            return (1. - w) * table[rows, left] + w * table[rows, right]
+
+        return interp(self.cl), interp(self.cd)
+
+
+class ViscousResult(object):
+    """
+    :ivar gamma_magnitude: (N,) circulation of the corrected lattice
+    :ivar force: (N, 3) lattice forces with the profile drag
+    :ivar profile_force: (N, 3) the profile drag alone, along the local inflow at the centres of pressure
+    :ivar alpha_eff_deg, delta_alpha_deg: (ns,) effective angle of attack and the correction of every strip
+    :ivar cl, cd: (ns,) section coefficients from the polars
+    :ivar cl_inviscid: (ns,) section lift of the lattice
+    :ivar history: list of ViscousIteration
+    :ivar converged: bool
+    """
+
+    def __init__(self, gamma_magnitude, force, profile_force, alpha_eff_deg, delta_alpha_deg, cl, cd, cl_inviscid,
+                 history, converged):
+        self.gamma_magnitude = gamma_magnitude
+        self.force = force
+        self.profile_force = profile_force
+        self.alpha_eff_deg = alpha_eff_deg
+        self.delta_alpha_deg = delta_alpha_deg
+        self.cl = cl
+        self.cd = cd
+        self.cl_inviscid = cl_inviscid
+        self.history = history
+        self.converged = converged
+
+    def format_table(self):
+        lines = ["%4s %12s %12s %10s" % ('iter', 'residual', 'max_dalpha', 'time_s')]
+        for h in self.history:
+            lines.append("%4d %12.4e %12.4e %10.6f" % (h.iteration, h.residual, h.max_delta_alpha_deg, h.time_s))
+        lines.append("converged" if self.converged else "NOT converged")
+        return "\n".join(lines)
+
+
+def solve_viscous(mesh, V_app_infw, polar, rho=1., lift_slope=2. * np.pi, alpha_L0_deg=0., relaxation=0.5,
+                  tol=1e-6, max_iterations=100, callback=None, cache=None):
+    """
+    :param mesh: (nc + 1, ns + 1, 3), the strips are the columns of the mesh
+    :param V_app_infw: (3,) or (N, 3)
+    :param polar: PolarTable or any callable alpha_deg (ns,) -> cl (ns,), cd (ns,)
+    :param lift_slope: per radian, of the sections in potential flow - scalar or (ns,)
+    :param alpha_L0_deg: zero lift angle of the sections in potential flow (camber of the mesh) - scalar or (ns,)
+    :param relaxation: under-relaxation of the angle correction, 0 < relaxation <= 1, lower it past the stall
+    :param tol: convergence criterion, max |cl_visc - cl_inv|
+    :param callback: optional function(ViscousIteration)
+    :param cache: optional InfluenceCache of the mesh corners, its factorization is reused
+    :return: ViscousResult
+    """
+    mesh = np.asarray(mesh, dtype=float)
+    nc, ns = mesh.shape[0] - 1, mesh.shape[1] - 1
+    N = nc * ns
+    corners = mesh_to_corners(mesh)
+    V_app_infw = np.broadcast_to(np.asarray(V_app_infw, dtype=float), (N, 3))
+    if cache is None:
+        cache = InfluenceCache(corners)
+    geometry = cache.geometry
+
+    lu_piv = cache.factorize(V_app_infw)
+    bc = geometry.C - geometry.B
+    axes = bc / np.linalg.norm(bc, axis=-1)[:, None]
+    RHS_n = -np.sum(V_app_infw * geometry.normals, axis=-1)
+    RHS_t = -np.sum(V_app_infw * np.cross(axes, geometry.normals), axis=-1)
+
+    strip_areas = np.sum(geometry.areas.reshape(nc, ns), axis=0)
+    strip_chords = strip_areas / np.linalg.norm(bc.reshape(nc, ns, 3)[0], axis=-1)
+    strip_speeds = np.mean(np.linalg.norm(V_app_infw, axis=-1).reshape(nc, ns), axis=0)
+
+    def solve(delta_alpha):
+        delta = np.tile(delta_alpha, nc)
+        gamma_magnitude = solve_factorized(lu_piv, RHS_n * np.cos(delta) + RHS_t * np.sin(delta))
+        cl_inv = 2. * np.sum(gamma_magnitude.reshape(nc, ns), axis=0) / (strip_speeds * strip_chords)
+        alpha_eff_deg = np.rad2deg(cl_inv / lift_slope - delta_alpha) + alpha_L0_deg
+        cl, cd = polar(alpha_eff_deg)
+        return gamma_magnitude, cl_inv, alpha_eff_deg, cl, cd
+
+    delta_alpha = np.zeros(ns)
+    history = []
+    converged = False
+    for iteration in range(max_iterations):
+        t0 = time.perf_counter()
+        with stage("viscous_iteration", unknowns=N, strips=ns):
+            gamma_magnitude, cl_inv, alpha_eff_deg, cl, cd = solve(delta_alpha)
+            residual = np.max(np.abs(cl - cl_inv))
+            if residual >= tol:
+                delta_alpha = delta_alpha + relaxation * (cl - cl_inv) / lift_slope
+
+        history.append(ViscousIteration(iteration=iteration, residual=residual,
+                                        max_delta_alpha_deg=np.rad2deg(np.max(np.abs(delta_alpha))),
+                                        time_s=time.perf_counter() - t0))
+        if callback is not None:
+            callback(history[-1])
+        if residual < tol:
+            converged = True
+            break
+    else:
+        gamma_magnitude, cl_inv, alpha_eff_deg, cl, cd = solve(delta_alpha)
+
+    v_ind_coeff_cp = cache.get_v_ind_coeff(V_app_infw, at='cp')
+    force = calc_forces(V_app_infw, gamma_magnitude, v_ind_coeff_cp, corners, rho=rho)
+    V_at_cp = V_app_infw + calc_induced_velocity(v_ind_coeff_cp, gamma_magnitude)
+    speeds = np.linalg.norm(V_at_cp, axis=-1)
+    profile_force = (0.5 * rho * speeds * geometry.areas * np.tile(cd, nc))[:, None] * V_at_cp
+    return ViscousResult(gamma_magnitude, force + profile_force, profile_force, alpha_eff_deg, np.rad2deg(delta_alpha),
+                         cl, cd, cl_inv, history, converged)
@@ -1,57 +1,284 @@
 import numpy as np
 
+from solver.profiling import stage
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.kernels import get_kernel_backend
 
-def assembly_sys_of_eq(V_app_infw, panels):
-    panels1D = panels.flatten()
-    N = len(panels1D)
 
-    A = np.zeros(shape=(N, N))  # Aerodynamic Influence Coefficient matrix
-    RHS = np.zeros(shape=N)
-    v_ind_coeff = np.full((N, N, 3), 0., dtype=float)
+def calc_bound_vortex_v_ind_coeff(points, geometry):
+    """
+    Velocity induced at `points` by the bound segments B->C of the unit horseshoe vortices.
+    It depends on the geometry only.
 
-    for i in range(0, N):
-        panel_surf_normal = panels1D[i].get_normal_to_panel()
-        ctr_p = panels1D[i].get_ctr_point_postion()
-        RHS[i] = -np.dot(V_app_infw[i], panel_surf_normal)
+    :param points: (M, 3) i.e. geometry.ctr_p or geometry.cp
+    :param geometry: PanelsGeometry of N panels
+    :return: (M, N, 3)
+    """
+    points = np.asarray(points, dtype=float)
+    with stage("bound_vortex_v_ind_coeff", finite_kernel_calls=len(points) * len(geometry.B)):
+        v_ind_coeff = get_kernel_backend().bound_vortices(points, geometry.B, geometry.C)
+    return v_ind_coeff
 
-        for j in range(0, N):
-                # velocity induced at i-th control point by j-th vortex
-                v_ind_coeff[i][j] = panels1D[j].get_horse_shoe_induced_velocity(ctr_p, V_app_infw[j])
-                A[i][j] = np.dot(v_ind_coeff[i][j], panel_surf_normal)
+
+def calc_trailing_vortices_v_ind_coeff(points, geometry, V_app_infw):
+    """
+    Velocity induced at `points` by the two semi-infinite legs of the unit horseshoe vortices,
+    the legs of the j-th horseshoe point along V_app_infw[j] (only its direction matters).
+
+    :return: (M, N, 3)
+    """
+    points = np.asarray(points, dtype=float)
+    r0 = np.asarray(V_app_infw, dtype=float)
+    with stage("trailing_vortices_v_ind_coeff", semi_infinite_kernel_calls=2 * len(points) * len(geometry.B)):
+        v_ind_coeff = get_kernel_backend().trailing_vortices(points, geometry.B, geometry.C, r0)
+    return v_ind_coeff
+
+
+def calc_horseshoe_v_ind_coeff(points, geometry, V_app_infw):
+    """
+    Sum of calc_bound_vortex_v_ind_coeff and calc_trailing_vortices_v_ind_coeff in one pass of the kernel backend.
+    :return: (M, N, 3)
+    """
+    points = np.asarray(points, dtype=float)
+    r0 = np.asarray(V_app_infw, dtype=float)
+    with stage("horseshoe_v_ind_coeff", horseshoe_kernel_calls=len(points) * len(geometry.B)):
+        v_ind_coeff = get_kernel_backend().horseshoe_vortices(points, geometry.B, geometry.C, r0)
+    return v_ind_coeff
+
+
+def assembly_sys_of_eq(V_app_infw, panels, normals=None):
+    """
+    :param normals: optional (N, 3) replacing the normals of the panels in the boundary condition
+    :return: A (N, N), RHS (N,), v_ind_coeff (N, N, 3) at the control points
+    """
+    geometry = calc_panels_geometry(get_panels_corners(panels))
+    N = len(geometry.ctr_p)
+    if normals is None:
+        normals = geometry.normals
+
+    with stage("assembly_sys_of_eq", panels=N, horseshoe_kernel_calls=N * N) as s:
+        # velocity induced at i-th control point by j-th vortex
+        v_ind_coeff = calc_horseshoe_v_ind_coeff(geometry.ctr_p, geometry, V_app_infw)
+        A, RHS = _assembly_from_v_ind_coeff(v_ind_coeff, V_app_infw, normals)
+        s.count(allocated_bytes=A.nbytes + RHS.nbytes + v_ind_coeff.nbytes)
 
     return A, RHS, v_ind_coeff  # np.array(v_ind_coeff)
 
 
+def _assembly_from_v_ind_coeff(v_ind_coeff, V_app_infw, normals):
+    A = np.einsum('ijk,ik->ij', v_ind_coeff, normals)  # Aerodynamic Influence Coefficient matrix
+    RHS = -np.sum(V_app_infw * normals, axis=-1)
+    return A, RHS
+
+
+class InfluenceCache(object):
+    """
+    Keeps the influence coefficients of a fixed geometry between solves.
+
+    The bound vortex part depends on the geometry only and is computed once.
+    The trailing legs follow the direction of V_app_infw, they are recomputed only
+    when this direction changes - an AoA or leeway sweep costs the trailing part,
+    a speed sweep costs nothing but the RHS.
+    With `fixed_wake_direction` the legs are frozen along this direction (geometry-fixed wake),
+    then the AIC and its factorization are reused for any inflow.
+
+    example
+
+    cache = InfluenceCache(panels)
+    for V_app_infw in sweep:
+        gamma_magnitude, v_ind_coeff = cache.calc_circulation(V_app_infw)
+
+    The caches are filled lazily, so one InfluenceCache must not be shared by many threads,
+    see solver.sweep for the read-only factorization shared by a thread pool.
+
+    :param panels: array of Panels or (N, 4, 3) array of their corners, see get_panels_corners
+    :param fixed_wake_direction: None or a vector (3,) / per panel array (N, 3)
+    :param direction_tol: max difference of the unit wake directions which is still regarded as no change
+    """
+
+    def __init__(self, panels, fixed_wake_direction=None, direction_tol=1e-12):
+        self.geometry = calc_panels_geometry(get_panels_corners(panels))
+        self.N = len(self.geometry.ctr_p)
+        self.direction_tol = direction_tol
+
+        self.fixed_wake_direction = None
+        if fixed_wake_direction is not None:
+            self.fixed_wake_direction = np.broadcast_to(np.asarray(fixed_wake_direction, dtype=float), (self.N, 3))
+
+        self._bound = {}
+        self._trailing = {}
+        self._factorized = None
+        self.n_factorizations = 0
+
+    @property
+    def factorized_direction(self):
+        """
+        :return: (N, 3) wake direction of the current factorization, None before the first one
+        """
+        return None if self._factorized is None else self._factorized[0]
+
+    def _points(self, at):
+        if at == 'ctr':
+            return self.geometry.ctr_p
+        elif at == 'cp':
+            return self.geometry.cp
+        raise ValueError("at must be 'ctr' or 'cp'")
+
+    def wake_direction(self, V_app_infw):
+        """
+        :return: (N, 3) unit direction of the trailing legs for V_app_infw (or the fixed one)
+        """
+        if self.fixed_wake_direction is not None:
+            V_app_infw = self.fixed_wake_direction
+        V_app_infw = np.asarray(V_app_infw, dtype=float)
+        return V_app_infw / np.linalg.norm(V_app_infw, axis=-1)[:, None]
+
+    def is_same_direction(self, cached, direction):
+        """
+        :return: True if the two wake directions share the influence coefficients and the factorization
+        """
+        return cached is not None and np.max(np.abs(cached - direction)) <= self.direction_tol
+
+    def get_v_ind_coeff(self, V_app_infw, at='ctr'):
+        """
+        :param at: 'ctr' control points or 'cp' centres of pressure
+        :return: (N, N, 3) velocity induced at i-th point by j-th unit horseshoe
+        """
+        if at not in self._bound:
+            self._bound[at] = calc_bound_vortex_v_ind_coeff(self._points(at), self.geometry)
+
+        direction = self.wake_direction(V_app_infw)
+        cached_direction, v_ind_coeff = self._trailing.get(at, (None, None))
+        if not self.is_same_direction(cached_direction, direction):
+            v_ind_coeff = self._bound[at] + calc_trailing_vortices_v_ind_coeff(self._points(at), self.geometry, direction)
+            self._trailing[at] = (direction, v_ind_coeff)
+        return v_ind_coeff
+
+    def assembly_sys_of_eq(self, V_app_infw):
+        v_ind_coeff = self.get_v_ind_coeff(V_app_infw, at='ctr')
+        A, RHS = _assembly_from_v_ind_coeff(v_ind_coeff, V_app_infw, self.geometry.normals)
+        return A, RHS, v_ind_coeff
+
+    def factorize(self, V_app_infw):
+        """
+        :return: LU factorization of the AIC for the wake direction of V_app_infw,
+                 reused as long as this direction does not change
+        """
+        direction = self.wake_direction(V_app_infw)
+        if self._factorized is None or not self.is_same_direction(self._factorized[0], direction):
+            v_ind_coeff = self.get_v_ind_coeff(V_app_infw, at='ctr')
+            A = np.einsum('ijk,ik->ij', v_ind_coeff, self.geometry.normals)
+            self._factorized = (direction, factorize_sys_of_eq(A))
+            self.n_factorizations += 1
+        return self._factorized[1]
+
+    def calc_circulation(self, V_app_infw):
+        """
+        Same as calc_circulation, the LU factorization is reused as long as the wake direction does not change.
+        V_app_infw may also be (n_cases, N, 3) as long as all cases share the wake direction of the first one.
+        :return: gamma_magnitude (N,) or (N, n_cases), v_ind_coeff
+        :raises ValueError: if the cases do not share the wake direction, solve them separately
+        """
+        V_app_infw = np.asarray(V_app_infw, dtype=float)
+        V_first = V_app_infw if V_app_infw.ndim == 2 else V_app_infw[0]
+        if V_app_infw.ndim == 3 and self.fixed_wake_direction is None:
+            first = self.wake_direction(V_first)
+            for k, V in enumerate(V_app_infw[1:], start=1):
+                if not self.is_same_direction(first, self.wake_direction(V)):
+                    raise ValueError("Case %d has another wake direction than the first one, "
+                                     "the cases sharing the direction have to be solved separately" % k)
+
+        lu_piv = self.factorize(V_first)
+        RHS = -np.sum(V_app_infw * self.geometry.normals, axis=-1)
+        gamma_magnitude = solve_factorized(lu_piv, RHS.T)
+        return gamma_magnitude, self.get_v_ind_coeff(V_first, at='ctr')
+
+
 def calc_circulation(V_app_ifnw, panels):
     # it is assumed that the freestream velocity is V [vx,0,vz], where vx > 0
 
     A, RHS, v_ind_coeff = assembly_sys_of_eq(V_app_ifnw, panels)
-    gamma_magnitude = np.linalg.solve(A, RHS)
+    with stage("np.linalg.solve", unknowns=len(RHS)) as s:
+        gamma_magnitude = np.linalg.solve(A, RHS)
+        s.count(allocated_bytes=gamma_magnitude.nbytes)
 
     return gamma_magnitude, v_ind_coeff
 
 
+def factorize_sys_of_eq(A):
+    """
+    LU factorization of the AIC matrix, to be reused by solve_factorized
+    for many right hand sides (speeds, densities, ...) sharing the same geometry and wake direction.
+    """
+    from scipy.linalg import lu_factor  # scipy is heavy to import, load it on first use
+
+    with stage("lu_factor", unknowns=len(A)):
+        lu_piv = lu_factor(A)
+    return lu_piv
+
+
+def solve_factorized(lu_piv, RHS, trans=0):
+    """
+    :param lu_piv: factorization returned by factorize_sys_of_eq
+    :param RHS: (N,) or (N, n_rhs) - many right hand sides are solved at once
+    :param trans: 0 solves A x = RHS, 1 solves A^T x = RHS (adjoint problems)
+    :return: gamma_magnitude of the same shape as RHS
+    """
+    from scipy.linalg import lu_solve
+
+    with stage("lu_solve", unknowns=len(RHS)):
+        gamma_magnitude = lu_solve(lu_piv, RHS, trans=trans)
+    return gamma_magnitude
+
+
+def solve_iterative(A, RHS, x0=None, tol=1e-10, M=None, maxiter=None):
+    """
+    GMRES solve of the AIC system, worth it when a good initial guess x0 is known
+    (i.e. circulation interpolated from a coarser mesh) or when A is only available as a matvec.
+
+    :param A: (N, N) array or scipy LinearOperator
+    :param M: optional preconditioner, approximation of the inverse of A
+    :param tol: relative residual
+    :return: gamma_magnitude (N,), number of iterations
+    """
+    from scipy.sparse.linalg import gmres
+
+    iterations = [0]
+
+    def count(_):
+        iterations[0] += 1
+
+    with stage("gmres", unknowns=len(RHS)) as s:
+        try:
+            gamma_magnitude, info = gmres(A, RHS, x0=x0, rtol=tol, atol=0., M=M, maxiter=maxiter,
+                                          callback=count, callback_type='pr_norm')
+        except TypeError:  # scipy < 1.12
+            gamma_magnitude, info = gmres(A, RHS, x0=x0, tol=tol, atol=0., M=M, maxiter=maxiter,
+                                          callback=count, callback_type='pr_norm')
+        s.count(iterations=iterations[0])
+    if info > 0:
+        raise RuntimeError("GMRES did not converge in %d iterations" % info)
+    return gamma_magnitude, iterations[0]
+
+
 def calc_induced_velocity(v_ind_coeff, gamma_magnitude):
     N = len(gamma_magnitude)
-    V_induced = np.full((N, 3), 0., dtype=float)
-    for i in range(N):
-        for j in range(N):
-            V_induced[i] += v_ind_coeff[i][j] * gamma_magnitude[j]
+    with stage("calc_induced_velocity", panels=N) as s:
+        V_induced = np.einsum('ijk,j->ik', v_ind_coeff, gamma_magnitude)
+        s.count(allocated_bytes=V_induced.nbytes)
 
     return V_induced
 
 
 def is_no_flux_BC_satisfied(V_app_fw, panels):
-    panels1D = panels.flatten()
-    N = len(panels1D)
-    flux_through_panel = np.zeros(shape=N)
-
-    for i in range(0, N):
-        panel_surf_normal = panels1D[i].get_normal_to_panel()
-        flux_through_panel[i] = -np.dot(V_app_fw[i], panel_surf_normal)
+    """
+    :param V_app_fw: (N, 3) velocity at the control points, including the induced one
+    :raises ValueError: if the flux through any panel exceeds 1e-12, see solver.diagnostics for the residuals
+    """
+    normals = calc_panels_geometry(get_panels_corners(panels)).normals
+    flux_through_panel = -np.sum(V_app_fw * normals, axis=-1)
 
-    for flux in flux_through_panel:
-        if abs(flux) > 1E-12:
-            raise ValueError("Solution error, there is a significant flow through panel!")
+    if np.any(np.abs(flux_through_panel) > 1E-12):
+        raise ValueError("Solution error, there is a significant flow through panel!")
 
-    return True
\ No newline at end of file
+    return True
@@ -139,3 +139,171 @@ def v_induced_by_horseshoe_vortex(P, A, B, r0, gamma=1):
 
     v = vA + vB + vAB
     return v
+
+
+def _norm(x):
+    return np.sqrt(np.sum(x * x, axis=-1))
+
+
+def v_induced_by_finite_vortex_lines(P, A, B, gamma=1):
+    """
+    Vectorized v_induced_by_finite_vortex_line.
+
+    P, A, B : array_like (..., 3), broadcast against each other,
+              i.e. P[:, None, :] with A[None, :, :], B[None, :, :] gives
+              the velocity induced at every point by every vortex line.
+    Returns
+    -------
+    v : (..., 3), zero for points in the vortex core
+    """
+    PA = np.asarray(P, dtype=float) - A
+    PB = np.asarray(P, dtype=float) - B
+    BA = np.asarray(B, dtype=float) - A
+
+    PA_cross_PB = np.cross(PA, PB)
+    norm_PA = _norm(PA)
+    norm_PB = _norm(PB)
+    norm_PA_cross_PB = _norm(PA_cross_PB)
+
+    core = (norm_PA < 1e-9) | (norm_PB < 1e-9) | (norm_PA_cross_PB < 1e-9)
+    norm_PA = np.where(core, 1., norm_PA)
+    norm_PB = np.where(core, 1., norm_PB)
+    norm_PA_cross_PB = np.where(core, 1., norm_PA_cross_PB)
+
+    magnitude = np.sum(BA * (PA / norm_PA[..., None] - PB / norm_PB[..., None]), axis=-1)
+    magnitude *= gamma / (4 * np.pi) / np.square(norm_PA_cross_PB)
+    magnitude = np.where(core, 0., magnitude)
+    return PA_cross_PB * magnitude[..., None]
+
+
+def v_induced_by_semi_infinite_vortex_lines(P, A, r0, gamma=1):
+    """
+    Vectorized v_induced_by_semi_infinite_vortex_line, the arguments are broadcast
+    as in v_induced_by_finite_vortex_lines.
+    """
+    r0 = np.asarray(r0, dtype=float)
+    u_inf = r0 / _norm(r0)[..., None]
+    ap = np.asarray(P, dtype=float) - A
+    norm_ap = _norm(ap)
+
+    v_ind = np.cross(u_inf, ap) / (norm_ap * (norm_ap - np.sum(u_inf * ap, axis=-1)))[..., None]
+    v_ind *= gamma / (4. * np.pi)
+    return v_ind
+
+
+def v_induced_by_horseshoe_vortices(P, A, B, r0, gamma=1):
+    """
+    Vectorized v_induced_by_horseshoe_vortex, the arguments are broadcast
+    as in v_induced_by_finite_vortex_lines.
+    """
+    vB = v_induced_by_semi_infinite_vortex_lines(P, B, r0, gamma=gamma)
+    vAB = v_induced_by_finite_vortex_lines(P, A, B, gamma=gamma)
+    vA = v_induced_by_semi_infinite_vortex_lines(P, A, r0, gamma=-1 * gamma)
+    return vA + vB + vAB
+
+
+def _skew(x):
+    """
+    :return: (..., 3, 3) matrices such that _skew(x) @ y == np.cross(x, y)
+    """
+    s = np.zeros(x.shape + (3,))
+    s[..., 0, 1] = -x[..., 2]
+    s[..., 0, 2] = x[..., 1]
+    s[..., 1, 0] = x[..., 2]
+    s[..., 1, 2] = -x[..., 0]
+    s[..., 2, 0] = -x[..., 1]
+    s[..., 2, 1] = x[..., 0]
+    return s
+
+
+def _outer(x, y):
+    return x[..., :, None] * y[..., None, :]
+
+
+def grad_v_induced_by_finite_vortex_lines(P, A, B, gamma=1):
+    """
+    Derivatives of v_induced_by_finite_vortex_lines,
+    the arguments are broadcast as in v_induced_by_finite_vortex_lines.
+
+    Returns
+    -------
+    dv_dP, dv_dA, dv_dB : (..., 3, 3) Jacobians, [..., i, k] = d v_i / d x_k,
+                          zero for points in the vortex core
+    """
+    a = np.asarray(P, dtype=float) - A
+    b = np.asarray(P, dtype=float) - B
+    c = np.cross(a, b)
+
+    norm_a = _norm(a)
+    norm_b = _norm(b)
+    norm_c = _norm(c)
+    core = (norm_a < 1e-9) | (norm_b < 1e-9) | (norm_c < 1e-9)
+    norm_a = np.where(core, 1., norm_a)[..., None]
+    norm_b = np.where(core, 1., norm_b)[..., None]
+    c2 = np.where(core, 1., norm_c * norm_c)[..., None]
+
+    a_hat = a / norm_a
+    b_hat = b / norm_b
+    ba = a - b  # B - A
+
+    f = np.sum(ba * (a_hat - b_hat), axis=-1)[..., None]
+    g = c / c2
+    df_da = a_hat - b_hat + (ba - a_hat * np.sum(a_hat * ba, axis=-1)[..., None]) / norm_a
+    df_db = b_hat - a_hat - (ba - b_hat * np.sum(b_hat * ba, axis=-1)[..., None]) / norm_b
+
+    dg_dc = np.eye(3) / c2[..., None] - 2 * _outer(c, c) / np.square(c2)[..., None]
+    dv_da = f[..., None] * np.matmul(dg_dc, -_skew(b)) + _outer(g, df_da)
+    dv_db = f[..., None] * np.matmul(dg_dc, _skew(a)) + _outer(g, df_db)
+
+    k = np.where(core, 0., gamma / (4 * np.pi))[..., None, None]
+    dv_da *= k
+    dv_db *= k
+    dv_dP, dv_dA, dv_dB = dv_da + dv_db, -dv_da, -dv_db
+
+    # P on the extension of the line: v = 0 there, but it grows linearly with the offset e from the line,
+    # v = gamma / (8 pi) (1 / s_near^2 - 1 / s_far^2) t x e,  t = (B - A) / |B - A|, s - distances to A and B
+    raw_norm_a, raw_norm_b = _norm(a), _norm(b)
+    extension = core & (raw_norm_a >= 1e-9) & (raw_norm_b >= 1e-9) & (np.sum(a * b, axis=-1) > 0)
+    if np.any(extension):
+        length = np.where(extension, _norm(ba), 1.)[..., None]
+        t = ba / length
+        near = np.minimum(raw_norm_a, raw_norm_b)
+        far = np.maximum(raw_norm_a, raw_norm_b)
+        k_ext = np.where(extension, gamma / (8 * np.pi) * (1. / np.square(np.where(extension, near, 1.))
+                                                          - 1. / np.square(np.where(extension, far, 1.))), 0.)
+        tau = (np.sum(a * t, axis=-1)[..., None] / length)[..., None]  # position along A->B of the foot of P
+        d = k_ext[..., None, None] * _skew(t)
+        dv_dP = dv_dP + d
+        dv_dA = dv_dA - (1. - tau) * d
+        dv_dB = dv_dB - tau * d
+    return dv_dP, dv_dA, dv_dB
+
+
+def grad_v_induced_by_semi_infinite_vortex_lines(P, A, r0, gamma=1):
+    """
+    Derivatives of v_induced_by_semi_infinite_vortex_lines,
+    the arguments are broadcast as in v_induced_by_finite_vortex_lines.
+
+    Returns
+    -------
+    dv_dP, dv_dA, dv_dr0 : (..., 3, 3) Jacobians, [..., i, k] = d v_i / d x_k
+    """
+    r0 = np.asarray(r0, dtype=float)
+    norm_r0 = _norm(r0)[..., None]
+    u = r0 / norm_r0
+    a = np.asarray(P, dtype=float) - A
+    u, a = np.broadcast_arrays(u, a)
+
+    s = _norm(a)[..., None]
+    u_dot_a = np.sum(u * a, axis=-1)[..., None]
+    t = s * (s - u_dot_a)
+    u_cross_a = np.cross(u, a)
+
+    dt_da = 2 * a - u_dot_a * a / s - s * u
+    dt_du = -s * a
+
+    k = gamma / (4. * np.pi)
+    dv_da = k * (_skew(u) / t[..., None] - _outer(u_cross_a, dt_da) / np.square(t)[..., None])
+    dv_du = k * (-_skew(a) / t[..., None] - _outer(u_cross_a, dt_du) / np.square(t)[..., None])
+    du_dr0 = (np.eye(3) - _outer(u, u)) / norm_r0[..., None]
+    return dv_da, -dv_da, np.matmul(dv_du, du_dr0)
@@ -13,3 +13,52 @@ class TestMesher(TestCase):
 
         assert_almost_equal(CL_expected, 0.974775743317)
         assert_almost_equal(CD_ind_expected, 0.018903384655)
+
+    def test_free_surface_effect_on_CL(self):
+        import warnings
+        from solver.coeff_formulas import calc_free_surface_effect_on_CL
+
+        assert_almost_equal(calc_free_surface_effect_on_CL(10, 1), 0.91)
+        assert_almost_equal(calc_free_surface_effect_on_CL(1.25, 1), 0.66)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            K = calc_free_surface_effect_on_CL([0.5, 1, 3], 1)
+            assert len(w) == 1
+
+        assert_almost_equal(K, [0.86, 0.72, 0.65 + 0.11 / 3])
+
+        K = calc_free_surface_effect_on_CL(np.array([10, 12, 25]), np.array([[0.95], [1.05]]))
+        assert K.shape == (2, 3)
+        assert_almost_equal(K[0], [0.91, 0.91 + 0.01 * 2 / 15, 0.92])
+        assert_almost_equal(K[1], K[0])
+
+        # there are data for h / c = 1 only
+        for hc in (0.5, 2., [1., 2.]):
+            with self.assertRaises(ValueError):
+                calc_free_surface_effect_on_CL(10, hc)
+
+        with self.assertRaises(ValueError):
+            calc_free_surface_effect_on_CL([10, 26], 1)
+
+    def test_submerged_wing_grid(self):
+        from solver.coeff_formulas import get_CL_CD_submerged_wing, get_CL_CD_submerged_wing_at_Fn
+
+        Fn, AoA_deg = np.meshgrid([10, 15, 20], [5, 10])
+        CL, CD = get_CL_CD_submerged_wing_at_Fn(20, AoA_deg, Fn, h_over_chord=1.)
+        assert CL.shape == (2, 3)
+        assert_almost_equal(CL[1], get_CL_CD_submerged_wing_at_Fn(20, 10, [10, 15, 20], 1.)[0])
+
+        # only h / c close to 1, no ride height grids
+        Fn_grid, hc = np.meshgrid([10, 15, 20], [0.5, 1., 2.])
+        with self.assertRaises(ValueError):
+            get_CL_CD_submerged_wing_at_Fn(20, 10, Fn_grid, hc)
+
+        CL_free, CD_free = get_CL_CD_free_wing(20, 10)
+        CL_K1, CD_K1 = get_CL_CD_submerged_wing(20, 10, K=1)
+        assert_almost_equal(CL_free, CL_K1)
+        assert np.all(CL[1] < CL_free)
+
+        CL_AR, _ = get_CL_CD_free_wing(np.array([5, 10, 20]), np.array([[1], [2]]))
+        assert CL_AR.shape == (2, 3)
+        assert_almost_equal(CL_AR[0, 2], get_CL_CD_free_wing(20, 1)[0])
@@ -0,0 +1,107 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points, make_mesh_from_stations
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.convergence import interpolate_gamma
+from solver.adaptive import \
+    calc_refinement_indicators, \
+    calc_strip_aspect_ratios, \
+    mark_for_refinement, \
+    split_stations, \
+    interpolate_gamma_on_stations, \
+    adaptive_refinement
+
+
+class TestAdaptive(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(5.))
+        points = [np.array([0., -4., 0.]), np.array([1., -4., 0.]),
+                  np.array([0., 4., 0.]), np.array([1., 4., 0.])]
+        self.points = [np.dot(Ry, p) for p in points]
+        self.V = np.array([10., 0., 0.])
+
+    def solve(self, grid_size):
+        panels, _ = make_panels_from_points(self.points, grid_size)
+        V_app_infw = np.array([self.V for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        F = np.sum(calc_force_wrapper(V_app_infw, gamma_magnitude, panels), axis=0)
+        return gamma_magnitude, F / (0.5 * np.dot(self.V, self.V) * 8.)
+
+    def test_split_stations(self):
+        stations = split_stations([0., 0.5, 1.], [False, True])
+        assert_almost_equal(stations, [0., 0.5, 0.75, 1.])
+
+    def test_indicators(self):
+        gamma_magnitude, _ = self.solve((4, 8))
+        s, t = np.linspace(0., 1., 5), np.linspace(0., 1., 9)
+        chordwise, spanwise = calc_refinement_indicators(gamma_magnitude, s, t)
+        assert chordwise.shape == (4,) and spanwise.shape == (8,)
+        assert_almost_equal(spanwise, spanwise[::-1])
+        assert np.argmax(spanwise) in (0, 7)
+        assert spanwise[3] < 0.2 * spanwise[0]
+
+        # the cumulative circulation linear in theta - nothing to refine chordwise
+        theta = np.arccos(1. - 2. * s)
+        gamma_magnitude = np.repeat(np.diff(theta)[:, None], 8, axis=1).ravel()
+        chordwise, _ = calc_refinement_indicators(gamma_magnitude, s, t)
+        assert_almost_equal(chordwise, 0.)
+
+    def test_mark_for_refinement(self):
+        rows, strips = mark_for_refinement(np.array([0.1, 0.]), np.array([0.5, 0.05, 0.05, 0.4]), growth=1.5)
+        assert_almost_equal(rows, [False, False])
+        assert_almost_equal(strips, [True, False, False, True])
+
+        rows, strips = mark_for_refinement(np.array([0.1, 0.]), np.array([0.5, 0.05, 0.05, 0.4]), growth=1.5,
+                                           splittable_strips=[False, True, True, True])
+        assert_almost_equal(rows, [False, False])
+        assert_almost_equal(strips, [False, False, False, True])
+
+        mesh = make_mesh_from_stations(self.points, [0., 0.5, 1.], [0., 0.01, 0.5, 1.])
+        assert_almost_equal(calc_strip_aspect_ratios(mesh), [0.5 / 0.08, 0.5 / 3.92, 0.5 / 4.], decimal=3)
+
+    def test_interpolate_gamma_on_stations(self):
+        gamma_magnitude, _ = self.solve((2, 8))
+        uniform = (np.linspace(0., 1., 3), np.linspace(0., 1., 9)), (np.linspace(0., 1., 5), np.linspace(0., 1., 17))
+        assert_almost_equal(interpolate_gamma_on_stations(gamma_magnitude, *uniform),
+                            interpolate_gamma(gamma_magnitude, (2, 8), (4, 16)))
+
+        coarse = (np.linspace(0., 1., 3), np.linspace(0., 1., 9))
+        fine = (coarse[0], split_stations(coarse[1], [True] + [False] * 7))
+        guess = interpolate_gamma_on_stations(gamma_magnitude, coarse, fine)
+        assert guess.shape == (18,)
+        assert_almost_equal(np.reshape(guess, (2, 9))[:, 2:], np.reshape(gamma_magnitude, (2, 8))[:, 1:])
+
+    def test_refinement(self):
+        result = adaptive_refinement(self.points, self.V, base_grid=(2, 4), tol=1e-6, max_panels=500)
+        assert not result.converged
+        assert len(result.levels) > 4
+        assert all(0 < level.N <= 500 for level in result.levels)
+        assert result.mesh.shape == (result.grid_size[0] + 1, result.grid_size[1] + 1, 3)
+        assert result.gamma_magnitude.shape == (result.levels[-1].N,)
+
+        # the tips are refined, the middle of the span is not
+        widths = np.diff(result.spanwise_stations)
+        assert widths[0] < widths[len(widths) // 2] / 4.
+        assert_almost_equal(widths, widths[::-1])
+
+        # at the same panel count against the uniform grids of every shape: as accurate in CL as the best of them
+        # (the one with the smallest of the larger of the CL and CDi errors) and within a factor of it in CDi,
+        # which converges slowly at the tips for any spacing
+        CL_ref, CDi_ref = 0.4113, 0.00690  # Richardson extrapolation of the uniform 4x32, 8x64, 16x128 lattices
+        N = result.levels[-1].N
+        uniform = []
+        for nc in [nc for nc in range(2, 17) if N % nc == 0]:
+            _, (CDi, _, CL) = self.solve((nc, N // nc))
+            uniform.append((abs(CL - CL_ref) / CL_ref, abs(CDi - CDi_ref) / CDi_ref))
+        error_CL, error_CDi = min(uniform, key=max)
+        assert abs(result.levels[-1].CL - CL_ref) / CL_ref < error_CL
+        assert abs(result.levels[-1].CDi - CDi_ref) / CDi_ref < 2. * error_CDi
+
+        result = adaptive_refinement(self.points, self.V, base_grid=(2, 4), tol=1e-2)
+        assert result.converged
+        assert result.levels[-1].change <= 1e-2
+        assert "converged" in result.format_table()
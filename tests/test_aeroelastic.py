@@ -0,0 +1,73 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points, make_panels_from_grid
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.aeroelastic import LinearStructure, panel_forces_to_mesh, solve_aeroelastic
+
+
+class TestAeroelastic(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        points = [np.array([0., -4., 0.]), np.array([1., -4., 0.]),
+                  np.array([0., 4., 0.]), np.array([1., 4., 0.])]
+        self.grid_size = [2, 6]
+        _, self.mesh = make_panels_from_points([np.dot(Ry, p) for p in points], self.grid_size)
+        self.V = np.array([10., 0., 0.])
+
+        # every mesh point on a spring, the middle section clamped
+        n_dof = self.mesh.size
+        self.fixed = np.zeros(self.mesh.shape[:2], dtype=bool)
+        self.fixed[:, 3] = True
+        self.structure = LinearStructure(5000. * np.eye(n_dof), fixed=self.fixed)
+
+    def direct_forces(self, mesh):
+        panels, _ = make_panels_from_grid(mesh, warp_tol=1.)
+        V_app_infw = np.array([self.V for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        return calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1.2)
+
+    def test_panel_forces_to_mesh(self):
+        force = np.random.RandomState(0).normal(size=(12, 3))
+        mesh_forces = panel_forces_to_mesh(force, self.grid_size)
+        assert mesh_forces.shape == (3, 7, 3)
+        assert_almost_equal(np.sum(mesh_forces, axis=(0, 1)), np.sum(force, axis=0))
+
+    def test_linear_structure(self):
+        mesh_forces = np.ones(self.mesh.shape)
+        u = self.structure(mesh_forces)
+        assert_almost_equal(u[self.fixed], 0.)
+        assert_almost_equal(u[~self.fixed], 1. / 5000.)
+
+    def test_coupled_solution(self):
+        result = solve_aeroelastic(self.mesh, self.V, self.structure, rho=1.2, relaxation=0.8, tol=1e-8)
+        assert result.converged
+        assert result.history[-1].residual < 1e-8
+        assert 'converged' in result.format_table()
+
+        # the fixed point: the structure loaded by the forces of the displaced mesh gives the same displacements
+        F = self.direct_forces(result.mesh)
+        assert_almost_equal(result.force, F)
+        assert_almost_equal(self.structure(panel_forces_to_mesh(F, self.grid_size)), result.displacements)
+
+        # leading edge is loaded more, the wing twists nose up and lifts more than the rigid one
+        rigid_lift = np.sum(self.direct_forces(self.mesh)[:, 2])
+        assert np.sum(result.force[:, 2]) > rigid_lift
+
+        # the factorization of the undeformed AIC preconditions the later solves
+        assert sum(h.refactorized for h in result.history) < len(result.history)
+        assert all(0 < h.gmres_iterations < 15 for h in result.history[1:])
+        # the influence coefficients are evaluated again only after larger displacements
+        assert result.history[0].reassembled and result.history[-1].reassembled
+        assert sum(h.reassembled for h in result.history) < len(result.history)
+
+    def test_influence_tol(self):
+        every = solve_aeroelastic(self.mesh, self.V, self.structure, rho=1.2, relaxation=0.8, tol=1e-8,
+                                  influence_tol=0.)
+        lagged = solve_aeroelastic(self.mesh, self.V, self.structure, rho=1.2, relaxation=0.8, tol=1e-8)
+        assert all(h.reassembled for h in every.history)
+        assert_almost_equal(lagged.displacements, every.displacements, decimal=8)
+        assert_almost_equal(lagged.force, every.force)
@@ -0,0 +1,115 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.batch import load_job_file, group_cases, run_batch, write_results, main
+from solver.mesher import make_panels_from_points
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.results import ResultsFile
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.job = {
+            "geometries": {
+                "wing": {"le_SW": [0, -5, 0], "te_SE": [1, -5, 0], "le_NW": [0, 5, 0], "te_NE": [1, 5, 0]},
+                "short": {"le_SW": [0, -2, 0], "te_SE": [1, -2, 0], "le_NW": [0, 2, 0], "te_NE": [1, 2, 0]},
+            },
+            "cases": [
+                {"case_id": "w3", "geometry": "wing", "nc": 2, "ns": 6, "V": [10, 0, 0], "AoA_deg": 3.0},
+                {"case_id": "w3_fast", "geometry": "wing", "nc": 2, "ns": 6, "V": [20, 0, 0], "AoA_deg": 3.0},
+                {"case_id": "w5", "geometry": "wing", "nc": 2, "ns": 6, "V": [10, 0, 0], "AoA_deg": 5.0},
+                {"case_id": "s3", "geometry": "short", "nc": 2, "ns": 4, "V": [10, 0, 0], "AoA_deg": 3.0,
+                 "rho": 1000.},
+            ]
+        }
+        self.job_path = os.path.join(self.tmp.name, "jobs.json")
+        with open(self.job_path, "w") as f:
+            json.dump(self.job, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def reference_CL_CD(self, half_span, nc, ns, AoA_deg, V):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(AoA_deg))
+        points = [np.array([0., -half_span, 0.]), np.array([1., -half_span, 0.]),
+                  np.array([0., half_span, 0.]), np.array([1., half_span, 0.])]
+        panels, _ = make_panels_from_points([np.dot(Ry, p) for p in points], [nc, ns])
+        V_app_infw = np.array([V for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        F = calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1.225)
+        total_F = np.sum(F, axis=0)
+        q = 0.5 * 1.225 * np.dot(V, V) * 2 * half_span
+        return total_F[2] / q, total_F[0] / q
+
+    def test_grouping(self):
+        cases = load_job_file(self.job_path)
+        groups = group_cases(cases)
+        assert [len(g) for g in groups] == [3, 1]
+
+    def test_duplicate_case_ids(self):
+        self.job["cases"][2]["case_id"] = "w3"
+        with open(self.job_path, "w") as f:
+            json.dump(self.job, f)
+        with self.assertRaises(ValueError) as context:
+            load_job_file(self.job_path)
+        assert "w3" in context.exception.args[0]
+
+    def test_run_batch_matches_single_runs(self):
+        rows = run_batch(load_job_file(self.job_path), workers=2)
+        assert [r['case_id'] for r in rows] == ["w3", "w3_fast", "w5", "s3"]
+
+        CL, CD = self.reference_CL_CD(5., 2, 6, 3.0, [10., 0, 0])
+        assert_almost_equal(rows[0]['CL'], CL)
+        assert_almost_equal(rows[0]['CD'], CD)
+        assert_almost_equal(rows[1]['CL'], CL)
+
+        CL5, _ = self.reference_CL_CD(5., 2, 6, 5.0, [10., 0, 0])
+        assert_almost_equal(rows[2]['CL'], CL5)
+
+    def test_csv_job_file_and_cli(self):
+        path = os.path.join(self.tmp.name, "jobs.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["case_id", "le_SW", "te_SE", "le_NW", "te_NE", "nc", "ns", "V", "AoA_deg"])
+            writer.writerow(["c1", "0 -5 0", "1 -5 0", "0 5 0", "1 5 0", 2, 6, "10 0 0", 3.0])
+
+        out = os.path.join(self.tmp.name, "results.csv")
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            main([path, "-o", out, "-j", "1"])
+        assert stdout.getvalue().startswith("1 cases in 1 groups solved in ")
+        assert stdout.getvalue().rstrip().endswith("-> " + out)
+        with open(out) as f:
+            rows = list(csv.DictReader(f))
+
+        CL, _ = self.reference_CL_CD(5., 2, 6, 3.0, [10., 0, 0])
+        assert_almost_equal(float(rows[0]['CL']), CL)
+
+        json_out = os.path.join(self.tmp.name, "results.json")
+        write_results(run_batch(load_job_file(path)), json_out)
+        with open(json_out) as f:
+            assert json.load(f)[0]['case_id'] == "c1"
+
+    def test_store_results(self):
+        store = os.path.join(self.tmp.name, "sweep.npz")
+        rows = run_batch(load_job_file(self.job_path), workers=2, store=store)
+
+        with ResultsFile(store) as rf:
+            assert sorted(rf.case_ids) == sorted(r['case_id'] for r in rows)
+            table = rf.coefficients_table()
+            CL = dict(zip(table['case_id'], table['CL']))
+            for row in rows:
+                assert_almost_equal(CL[row['case_id']], row['CL'])
+            assert rf["s3"].force.shape == (8, 3)
+            assert rf["s3"].metadata['rho'] == 1000.
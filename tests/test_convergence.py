@@ -0,0 +1,70 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points
+from solver.vlm_solver import calc_circulation
+from solver.convergence import \
+    interpolate_gamma, \
+    richardson_extrapolation, \
+    mesh_convergence_study
+
+
+class TestConvergence(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(5.))
+        points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                  np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        self.points = [np.dot(Ry, p) for p in points]
+        self.V = np.array([10., 0., 0.])
+
+    def test_richardson_extrapolation(self):
+        h = np.array([0.4, 0.2, 0.1])
+        f = 2. + 3. * h ** 2
+        value, order = richardson_extrapolation(*f, refinement=2)
+        assert_almost_equal(value, 2.)
+        assert_almost_equal(order, 2.)
+
+        value, order = richardson_extrapolation(1., 1.1, 0.95, refinement=2)  # oscillating
+        assert order == 1.
+
+    def test_interpolate_gamma(self):
+        def solve(grid_size):
+            panels, _ = make_panels_from_points(self.points, grid_size)
+            V_app_infw = np.array([self.V for _ in range(panels.size)])
+            return calc_circulation(V_app_infw, panels)[0]
+
+        gamma_coarse, gamma_fine = solve((2, 8)), solve((4, 16))
+        guess = interpolate_gamma(gamma_coarse, (2, 8), (4, 16))
+        assert guess.shape == (64,)
+        # twice as many strips, each carrying about the same circulation
+        assert abs(np.sum(guess) - 2 * np.sum(gamma_coarse)) < 0.05 * np.sum(guess)
+        assert np.linalg.norm(guess - gamma_fine) < 0.2 * np.linalg.norm(gamma_fine)
+
+    def test_study(self):
+        study = mesh_convergence_study(self.points, self.V, base_grid=(1, 4), n_levels=4, tol=2e-2)
+        assert [(level.nc, level.ns) for level in study.levels] == [(1, 4), (2, 8), (4, 16), (8, 32)]
+
+        CL = [level.CL for level in study.levels]
+        assert CL[0] > CL[1] > CL[2] > CL[3] > study.extrapolated['CL']
+        assert study.order['CL'] > 0.5
+
+        errors = [max(level.error_CL, level.error_CDi) for level in study.levels]
+        assert errors[-1] < errors[0]
+        assert study.recommended_grid == (8, 32)
+        assert 'extrapolated CL' in study.format_table()
+
+    def test_zero_lift(self):
+        points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                  np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        study = mesh_convergence_study(points, self.V, base_grid=(1, 4), n_levels=3)
+        for level in study.levels:
+            assert np.isfinite(level.error_CL) and np.isfinite(level.error_CDi)
+        assert study.recommended_grid == (1, 4)
+
+    def test_warm_start(self):
+        warm = mesh_convergence_study(self.points, self.V, base_grid=(1, 4), n_levels=3, warm_start=True)
+        cold = mesh_convergence_study(self.points, self.V, base_grid=(1, 4), n_levels=3, warm_start=False)
+        assert_almost_equal(warm.levels[-1].CL, cold.levels[-1].CL)
+        assert warm.levels[-1].iterations <= cold.levels[-1].iterations
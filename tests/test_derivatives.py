@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import InfluenceCache, calc_circulation
+from solver.forces import calc_forces, calc_force_wrapper
+from solver.derivatives import \
+    calc_stability_derivatives, \
+    make_unit_perturbation_inflows, \
+    calc_loads
+
+
+class TestStabilityDerivatives(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(3.))
+        points = [np.array([0., -4., 0.]), np.array([1., -4., 0.]),
+                  np.array([0.5, 4., 0.]), np.array([1.2, 4., 0.])]
+        self.panels, _ = make_panels_from_points([np.dot(Ry, p) for p in points], [2, 4])
+        self.V = np.array([[10., 0., 0.] for _ in range(self.panels.size)])
+        self.reference_point = np.array([0.3, 0.1, 0.])
+
+    def frozen_wake_loads(self, V_ctr, V_cp):
+        cache = InfluenceCache(self.panels, fixed_wake_direction=self.V[0])
+        gamma_magnitude, _ = cache.calc_circulation(V_ctr)
+        F = calc_forces(V_cp, gamma_magnitude, cache.get_v_ind_coeff(V_cp, at='cp'), self.panels, rho=1.2)
+        return calc_loads(F, cache.geometry.cp, self.reference_point)
+
+    def test_base_loads(self):
+        result = calc_stability_derivatives(self.V, self.panels, rho=1.2, reference_point=self.reference_point)
+        gamma_magnitude, _ = calc_circulation(self.V, self.panels)
+        F = calc_force_wrapper(self.V, gamma_magnitude, self.panels, rho=1.2)
+
+        assert_almost_equal(result['gamma_magnitude'], gamma_magnitude)
+        assert_almost_equal(result['loads'][:3], np.sum(F, axis=0))
+
+    def test_derivatives_vs_finite_differences(self):
+        result = calc_stability_derivatives(self.V, self.panels, rho=1.2, reference_point=self.reference_point)
+        assert result['derivatives'].shape == (6, 6)
+
+        geometry = InfluenceCache(self.panels).geometry
+        dV_ctr = make_unit_perturbation_inflows(geometry.ctr_p, self.reference_point)
+        dV_cp = make_unit_perturbation_inflows(geometry.cp, self.reference_point)
+
+        h = 1e-4
+        for m in range(6):
+            plus = self.frozen_wake_loads(self.V + h * dV_ctr[m], self.V + h * dV_cp[m])
+            minus = self.frozen_wake_loads(self.V - h * dV_ctr[m], self.V - h * dV_cp[m])
+            assert_almost_equal(result['derivatives'][:, m], (plus - minus) / (2 * h), decimal=5)
+
+    def test_rate_inflow(self):
+        dV = make_unit_perturbation_inflows(np.array([[1., 0., 0.], [0., 2., 0.]]))
+        assert_almost_equal(dV[4, 0], [0., 0., 1.])  # pitch rate q, point ahead of the reference
+        assert_almost_equal(dV[3, 1], [0., 0., -2.])  # roll rate p, point on the right wing
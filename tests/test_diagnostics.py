@@ -0,0 +1,80 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points, mesh_to_corners
+from solver.vlm_solver import assembly_sys_of_eq, factorize_sys_of_eq, solve_factorized
+from solver.diagnostics import \
+    calc_flux_residuals, \
+    estimate_condition_number, \
+    calc_mesh_quality, \
+    check_mesh_quality, \
+    diagnose_solution
+
+
+class TestDiagnostics(TestCase):
+    def setUp(self):
+        self.points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                       np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        self.panels, self.mesh = make_panels_from_points(self.points, [2, 10])
+        self.V = np.array([10., 0., 1.])
+        self.V_app_infw = np.array([self.V for _ in range(self.panels.size)])
+
+    def test_solution(self):
+        A, RHS, v_ind_coeff = assembly_sys_of_eq(self.V_app_infw, self.panels)
+        lu_piv = factorize_sys_of_eq(A)
+        gamma_magnitude = solve_factorized(lu_piv, RHS)
+
+        report = diagnose_solution(self.V_app_infw, self.panels, gamma_magnitude, v_ind_coeff, A=A, lu_piv=lu_piv)
+        assert report.residuals.shape == (20,)
+        assert report.max_residual < 1e-12
+        assert report.rms_residual <= report.max_residual
+        assert report.is_acceptable()
+
+        exact = np.linalg.cond(A, 1)
+        assert exact / 3. < report.condition_number < 3. * exact
+        assert_almost_equal(estimate_condition_number(A) / report.condition_number, 1.)
+        assert "condition" in report.format_table()
+
+        broken = diagnose_solution(self.V_app_infw, self.panels, 1.1 * gamma_magnitude, v_ind_coeff)
+        assert broken.max_residual > 1e-3
+        assert broken.condition_number is None
+        assert not broken.is_acceptable()
+
+    def test_flux_residuals(self):
+        V = np.zeros((20, 3))
+        V[3] = [0., 0., 2.]
+        assert_almost_equal(calc_flux_residuals(V, self.panels), 2. * np.eye(20)[3])
+        assert_almost_equal(calc_flux_residuals(V, mesh_to_corners(self.mesh)), 2. * np.eye(20)[3])
+
+    def test_ill_conditioned(self):
+        A = np.array([[1., 1.], [1., 1. + 1e-14]])
+        assert estimate_condition_number(A) > 1e13
+
+    def test_mesh_quality(self):
+        quality = check_mesh_quality(self.panels)
+        assert_almost_equal(quality['aspect_ratio'], 2.)  # 0.5 chord x 1 span
+        assert_almost_equal(quality['skew_deg'], 0.)
+        assert_almost_equal(quality['warp'], 0.)
+        assert np.all(quality['core_distance'] > 0.1)
+
+        skewed, _ = make_panels_from_points([self.points[0], self.points[1],
+                                             self.points[2] + [8., 0., 0.], self.points[3] + [8., 0., 0.]], [2, 10])
+        assert np.all(calc_mesh_quality(skewed)['skew_deg'] > 35.)
+        with self.assertRaises(ValueError) as context:
+            check_mesh_quality(skewed, max_skew_deg=30.)
+        assert "skew_deg above 30" in context.exception.args[0]
+
+    def test_near_core(self):
+        # a second wing behind the first one, shifted by half a panel - its control points lie on the trailing legs
+        corners = mesh_to_corners(self.mesh)
+        behind = corners + np.array([1., 0.5, 0.])
+        quality = calc_mesh_quality(np.concatenate([corners, behind]), wake_direction=[1., 0., 0.])
+        assert np.all(quality['core_distance'][20:] < 1e-12)
+        # blocks of 7 control points, the last one shorter
+        blocks = calc_mesh_quality(np.concatenate([corners, behind]), wake_direction=[1., 0., 0.],
+                                   block_bytes=8 * 3 * 4 * 40 * 7)
+        assert_almost_equal(blocks['core_distance'], quality['core_distance'])
+        with self.assertRaises(ValueError) as context:
+            check_mesh_quality(np.concatenate([corners, behind]))
+        assert "core_distance below" in context.exception.args[0]
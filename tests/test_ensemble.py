@@ -0,0 +1,77 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points, mesh_to_corners
+from solver.vlm_solver import calc_circulation, assembly_sys_of_eq
+from solver.forces import calc_force_wrapper
+from solver.ensemble import \
+    make_meshes_from_points, \
+    assembly_ensemble, \
+    solve_ensemble
+
+
+class TestEnsemble(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.grid_size = (2, 6)
+        self.points = []
+        for chord, span, sweep, aoa in zip(rng.uniform(0.5, 1.5, 4), rng.uniform(3., 6., 4),
+                                          rng.uniform(0., 0.5, 4), rng.uniform(1., 6., 4)):
+            Ry = rotation_matrix([0, 1, 0], np.deg2rad(aoa))
+            points = [np.array([0., -span, 0.]), np.array([chord, -span, 0.]),
+                      np.array([sweep, span, 0.]), np.array([sweep + 0.6 * chord, span, 0.])]
+            self.points.append([np.dot(Ry, p) for p in points])
+        self.points = np.array(self.points)
+        self.meshes = make_meshes_from_points(self.points, self.grid_size)
+        self.V = np.array([[10., 0., 0.], [8., 0., 0.5], [12., 1., 0.], [10., 0., -0.3]])
+
+    def solve_single(self, d):
+        panels, _ = make_panels_from_points(list(self.points[d]), self.grid_size)
+        V_app_infw = np.array([self.V[d] for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        return panels, gamma_magnitude, calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1.225)
+
+    def test_make_meshes_from_points(self):
+        assert self.meshes.shape == (4, 3, 7, 3)
+        for d, points in enumerate(self.points):
+            _, mesh = make_panels_from_points(list(points), self.grid_size)
+            assert_almost_equal(self.meshes[d], mesh)
+
+    def test_assembly(self):
+        V_app_infw = np.repeat(self.V[:, None, :], 12, axis=1)
+        A, RHS, _ = assembly_ensemble(V_app_infw, mesh_to_corners(self.meshes))
+        assert A.shape == (4, 12, 12)
+        for d in range(4):
+            panels, _ = make_panels_from_points(list(self.points[d]), self.grid_size)
+            A_d, RHS_d, _ = assembly_sys_of_eq(V_app_infw[d], panels)
+            assert_almost_equal(A[d], A_d)
+            assert_almost_equal(RHS[d], RHS_d)
+
+    def test_solve(self):
+        result = solve_ensemble(self.meshes, self.V, rho=1.225, block_bytes=1)  # one design per block
+        assert len(result) == 4
+        assert result.force.shape == (4, 12, 3)
+        for d in range(4):
+            panels, gamma_magnitude, force = self.solve_single(d)
+            assert_almost_equal(result.gamma_magnitude[d], gamma_magnitude)
+            assert_almost_equal(result.force[d], force)
+
+            q = 0.5 * 1.225 * np.dot(self.V[d], self.V[d])
+            S = sum(p.get_panel_area() for p in panels.flatten())
+            assert_almost_equal(result.S[d], S)
+            assert_almost_equal(result.CL[d], np.sum(force[:, 2]) / (q * S))
+            assert_almost_equal(result.CD[d], np.sum(force[:, 0]) / (q * S))
+
+    def test_common_inflow(self):
+        one_block = solve_ensemble(self.meshes, self.V[0], S=10.)
+        per_design = solve_ensemble(self.meshes, np.repeat(self.V[:1], 4, axis=0), S=10., block_bytes=1)
+        assert_almost_equal(one_block.force, per_design.force)
+        assert_almost_equal(one_block.CL, per_design.CL)
+
+        # a per panel inflow shared by all designs
+        per_panel = solve_ensemble(self.meshes, np.repeat(self.V[:1], 12, axis=0)[None], S=10.)
+        assert_almost_equal(per_panel.force, one_block.force)
+        with self.assertRaises(ValueError):
+            solve_ensemble(self.meshes, np.repeat(self.V[:1], 12, axis=0))
@@ -76,3 +76,23 @@ class TestForces(TestCase):
         rel_err_CD = abs((CD_ind_expected - CD_vlm) / CD_ind_expected)
         assert rel_err_CL < 0.01
         assert rel_err_CD < 0.18
+
+    def test_kutta_joukowski_batch(self):
+        from solver.forces import calc_kutta_joukowski_forces, calc_v_ind_coeff_at_cp
+        from solver.panel import calc_panels_geometry, get_panels_corners
+
+        points = [np.array([0., 0., 0.]), np.array([1., 0., 0.]),
+                  np.array([0., 4., 0.]), np.array([1., 4., 0.])]
+        panels, _ = make_panels_from_points(points, [2, 3])
+        geometry = calc_panels_geometry(get_panels_corners(panels))
+
+        V_app_infw = np.repeat(np.array([[[10., 0., 1.]], [[5., 0., 0.5]]]), 6, axis=1)
+        rho = np.array([1., 1.225])
+        gamma_magnitude = np.array([calc_circulation(V, panels)[0] for V in V_app_infw])
+        v_ind_coeff = calc_v_ind_coeff_at_cp(V_app_infw[0], panels)  # same wake direction
+        V_at_cp = V_app_infw + np.einsum('ijk,mj->mik', v_ind_coeff, gamma_magnitude)
+
+        F = calc_kutta_joukowski_forces(V_at_cp, gamma_magnitude, geometry, rho=rho)
+        assert F.shape == (2, 6, 3)
+        for k in range(2):
+            assert_almost_equal(F[k], calc_force_wrapper(V_app_infw[k], gamma_magnitude[k], panels, rho=rho[k]))
@@ -0,0 +1,122 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.vortices import \
+    v_induced_by_finite_vortex_line, \
+    v_induced_by_semi_infinite_vortex_line
+from solver.mesher import make_panels_from_points
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.kernels import \
+    available_backends, \
+    get_kernel_backend, \
+    set_kernel_backend, \
+    FusedBackend, \
+    NumbaBackend, \
+    _horseshoe_loops
+
+
+class KernelBackendTestMixin(object):
+    """
+    Shared test suite, every backend is checked against the scalar kernels of solver.vortices.
+    """
+    backend_name = None
+
+    def setUp(self):
+        if self.backend_name not in available_backends():
+            self.skipTest("%s backend is not available" % self.backend_name)
+        self.backend = self.make_backend()
+
+        rng = np.random.RandomState(0)
+        self.points = rng.normal(size=(7, 3))
+        self.B = rng.normal(size=(5, 3))
+        self.C = self.B + rng.normal(size=(5, 3))
+        self.r0 = np.array([[1., 0.1, 0.2]] * 5) * rng.uniform(1., 10., size=(5, 1))
+
+        # targets in the vortex core: on the bound segment and at its end
+        self.points[0] = 0.5 * (self.B[1] + self.C[1])
+        self.points[1] = self.B[2]
+
+    def make_backend(self):
+        return get_kernel_backend(self.backend_name)
+
+    def test_bound_vortices(self):
+        v = self.backend.bound_vortices(self.points, self.B, self.C)
+        for i, P in enumerate(self.points):
+            for j in range(len(self.B)):
+                assert_almost_equal(v[i, j], v_induced_by_finite_vortex_line(P, self.B[j], self.C[j]))
+
+    def test_trailing_vortices(self):
+        points = self.points[2:]
+        v = self.backend.trailing_vortices(points, self.B, self.C, self.r0)
+        for i, P in enumerate(points):
+            for j in range(len(self.B)):
+                expected = v_induced_by_semi_infinite_vortex_line(P, self.C[j], self.r0[j]) \
+                    + v_induced_by_semi_infinite_vortex_line(P, self.B[j], self.r0[j], gamma=-1)
+                assert_almost_equal(v[i, j], expected)
+
+    def test_horseshoe_vortices(self):
+        points = self.points[2:]
+        assert_almost_equal(self.backend.horseshoe_vortices(points, self.B, self.C, self.r0),
+                            self.backend.bound_vortices(points, self.B, self.C)
+                            + self.backend.trailing_vortices(points, self.B, self.C, self.r0))
+
+    def test_lattice(self):
+        panels, _ = make_panels_from_points([np.array([0., -3., 0.]), np.array([1., -3., 0.]),
+                                             np.array([0.2, 3., 0.]), np.array([0.9, 3., 0.])], [3, 6])
+        geometry = calc_panels_geometry(get_panels_corners(panels))
+        r0 = np.array([[10., 1., 0.5]] * panels.size)
+
+        for points in (geometry.ctr_p, geometry.cp):
+            assert_almost_equal(self.backend.horseshoe_vortices(points, geometry.B, geometry.C, r0),
+                                get_kernel_backend('numpy').horseshoe_vortices(points, geometry.B, geometry.C, r0))
+
+    def test_stack(self):
+        points, B, C = self.points[2:], self.B, self.C
+        stacked = self.backend.horseshoe_vortices(np.stack([points, points + 1.]), np.stack([B, B + 1.]),
+                                                  np.stack([C, C + 1.]), np.stack([self.r0, 2. * self.r0]))
+        assert stacked.shape == (2, 5, 5, 3)
+        assert_almost_equal(stacked[0], self.backend.horseshoe_vortices(points, B, C, self.r0))
+        assert_almost_equal(stacked[1], self.backend.horseshoe_vortices(points + 1., B + 1., C + 1., self.r0))
+
+
+class TestNumpyBackend(KernelBackendTestMixin, TestCase):
+    backend_name = 'numpy'
+
+
+class TestFusedBackend(KernelBackendTestMixin, TestCase):
+    backend_name = 'fused'
+
+    def test_blocks(self):
+        # one target point per block
+        small_blocks = FusedBackend(block_bytes=1)
+        assert_almost_equal(small_blocks.horseshoe_vortices(self.points[2:], self.B, self.C, self.r0),
+                            self.backend.horseshoe_vortices(self.points[2:], self.B, self.C, self.r0))
+
+
+class TestNumbaBackend(KernelBackendTestMixin, TestCase):
+    backend_name = 'numba'
+
+
+class TestNumbaLoops(KernelBackendTestMixin, TestCase):
+    """
+    The loops compiled by the numba backend, run as plain Python.
+    """
+    backend_name = 'fused'
+
+    def make_backend(self):
+        return NumbaBackend(loops=_horseshoe_loops)
+
+
+class TestBackendSelection(TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_kernel_backend('fortran')
+
+    def test_set_backend(self):
+        previous = set_kernel_backend('numpy')
+        try:
+            assert get_kernel_backend().name == 'numpy'
+        finally:
+            set_kernel_backend(previous)
+        assert get_kernel_backend().name == previous
@@ -0,0 +1,64 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper, calc_pressure
+from solver.loads import \
+    calc_total_force_and_moments, \
+    calc_centre_of_effort, \
+    calc_strip_loads, \
+    calc_chordwise_pressure
+
+
+class TestLoads(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        points = [np.array([0., -5., 0.]), np.array([2., -5., 0.]),
+                  np.array([0.5, 5., 0.]), np.array([1.5, 5., 0.])]
+        self.grid_size = [3, 6]
+        self.panels, _ = make_panels_from_points([np.dot(Ry, p) for p in points], self.grid_size)
+        self.V = np.array([[10., 0., 0.] for _ in range(self.panels.size)])
+        gamma_magnitude, _ = calc_circulation(self.V, self.panels)
+        self.F = calc_force_wrapper(self.V, gamma_magnitude, self.panels, rho=1.)
+        self.geometry = calc_panels_geometry(get_panels_corners(self.panels))
+
+    def test_moments_about_many_points(self):
+        refs = np.array([[0., 0., 0.], [1., 2., 3.], [-1., 0.5, 0.]])
+        total_F, M = calc_total_force_and_moments(self.F, self.geometry.cp, refs)
+        assert M.shape == (3, 3)
+        assert_almost_equal(total_F, np.sum(self.F, axis=0))
+        for r, m in zip(refs, M):
+            expected = sum(np.cross(p.get_cp_position() - r, f) for p, f in zip(self.panels.flatten(), self.F))
+            assert_almost_equal(m, expected)
+
+    def test_centre_of_effort(self):
+        ce = calc_centre_of_effort(self.F, self.geometry.cp)
+        F = np.sum(self.F, axis=0)
+        weights = [np.dot(f, F) for f in self.F]
+        assert_almost_equal(ce, sum(w * p for w, p in zip(weights, self.geometry.cp)) / sum(weights))
+        assert np.all(ce >= self.geometry.cp.min(axis=0)) and np.all(ce <= self.geometry.cp.max(axis=0))
+        assert ce[1] < 0.  # the wider part of the wing carries more load
+
+    def test_strip_loads(self):
+        strips = calc_strip_loads(self.F, self.geometry, self.grid_size, q=50.)
+        nc, ns = self.grid_size
+        assert strips['cl'].shape == (ns,)
+        assert_almost_equal(np.sum(strips['force'], axis=0), np.sum(self.F, axis=0))
+        assert_almost_equal(np.sum(strips['area']), np.sum(self.geometry.areas))
+        assert_almost_equal(np.dot(strips['cl'], strips['area']) / np.sum(strips['area']),
+                            np.sum(self.F[:, 2]) / (50. * np.sum(self.geometry.areas)))
+        assert strips['chord'][0] > strips['chord'][-1]  # tapered wing
+
+    def test_chordwise_pressure(self):
+        p = calc_pressure(self.F, self.panels)
+        for i, panel in enumerate(self.panels.flatten()):
+            assert_almost_equal(p[i], np.dot(self.F[i], panel.get_normal_to_panel()) / panel.get_panel_area())
+
+        chordwise = calc_chordwise_pressure(p, self.geometry, self.grid_size)
+        assert chordwise['dp'].shape == (3, 6)
+        assert_almost_equal(chordwise['x_over_c'][:, 0], [0.25 / 3, 1.25 / 3, 2.25 / 3])
+        assert np.all(np.abs(chordwise['dp'][0]) > np.abs(chordwise['dp'][-1]))  # leading edge peak
@@ -5,7 +5,15 @@ from solver.panel import Panel
 from solver.mesher import \
     make_panels_from_points, \
     discrete_segment, \
-    make_point_mesh
+    make_panels_from_mesh, \
+    make_point_mesh, \
+    make_panels_from_grid, \
+    make_cambered_mesh, \
+    make_cambered_panels, \
+    naca_camber_line, \
+    make_mesh_from_stations
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
 from unittest import TestCase
 
 
@@ -88,3 +96,63 @@ class TestMesher(TestCase):
 
         assert cols == self.ns
         assert rows == self.nc
+
+
+class TestCamberedMesher(TestCase):
+    def setUp(self):
+        self.points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                       np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+
+    def calc_CL(self, panels, V):
+        V_app_infw = np.array([V for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        F = calc_force_wrapper(V_app_infw, gamma_magnitude, panels)
+        return np.sum(F[:, 2]) / (0.5 * np.dot(V, V) * 10.)
+
+    def test_flat_mesh(self):
+        _, expected_mesh = make_panels_from_points(self.points, [3, 6])
+        assert_almost_equal(make_cambered_mesh(self.points, [3, 6]), expected_mesh)
+
+    def test_twist(self):
+        twist = np.linspace(-3., 3., 7)
+        mesh = make_cambered_mesh(self.points, [3, 6], twist_deg=twist)
+        assert_almost_equal(mesh[0], make_cambered_mesh(self.points, [3, 6])[0])
+        assert_almost_equal(mesh[-1, :, 2], -np.sin(np.deg2rad(twist)))
+
+        with self.assertRaises(ValueError):
+            make_panels_from_mesh(mesh)
+
+        panels, _ = make_panels_from_grid(mesh)
+        assert panels.shape == (3, 6)
+
+    def test_uniform_twist_is_angle_of_attack(self):
+        panels, _ = make_cambered_panels(self.points, [4, 10], twist_deg=3.)
+        flat_panels, _ = make_panels_from_points(self.points, [4, 10])
+        a = np.deg2rad(3.)
+        assert_almost_equal(self.calc_CL(panels, np.array([10., 0., 0.])),
+                            self.calc_CL(flat_panels, 10. * np.array([np.cos(a), 0., np.sin(a)])), decimal=3)
+
+    def test_camber(self):
+        camber = naca_camber_line(0.02, 0.4)
+        assert_almost_equal(camber([0., 0.4, 1.]), [0., 0.02, 0.])
+
+        CL = [self.calc_CL(make_cambered_panels(self.points, [nc, 10], camber=camber)[0], np.array([10., 0., 0.]))
+              for nc in (2, 4, 8)]
+        assert 0. < CL[0] < CL[1] < CL[2]
+
+        # zero lift angle of NACA 2412 is about -2.1 deg
+        flat_panels, _ = make_panels_from_points(self.points, [4, 10])
+        a = np.deg2rad(2.1)
+        CL_flat = self.calc_CL(flat_panels, 10. * np.array([np.cos(a), 0., np.sin(a)]))
+        assert abs(CL[2] - CL_flat) < 0.15 * CL_flat
+
+    def test_make_mesh_from_stations(self):
+        _, mesh = make_panels_from_points(self.points, [3, 5])
+        assert_almost_equal(make_mesh_from_stations(self.points, np.linspace(0, 1, 4), np.linspace(0, 1, 6)), mesh)
+
+        mesh = make_mesh_from_stations(self.points, [0., 0.1, 1.], [0., 0.5, 0.9, 1.])
+        assert mesh.shape == (3, 4, 3)
+        assert_almost_equal(mesh[0, 0], self.points[0])
+        assert_almost_equal(mesh[-1, -1], self.points[3])
+        south, north = 0.9 * self.points[0] + 0.1 * self.points[1], 0.9 * self.points[2] + 0.1 * self.points[3]
+        assert_almost_equal(mesh[1, 2], 0.1 * south + 0.9 * north)
@@ -0,0 +1,80 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points
+from solver.panel import calc_panels_geometry, get_panels_corners
+from solver.vlm_solver import calc_circulation, calc_horseshoe_v_ind_coeff
+from solver.optimal_loading import \
+    calc_trefftz_drag_matrix, \
+    solve_minimum_induced_drag
+
+
+class TestOptimalLoading(TestCase):
+    def setUp(self):
+        self.points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                       np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        self.grid_size = (2, 24)
+        self.panels, _ = make_panels_from_points(self.points, self.grid_size)
+        self.geometry = calc_panels_geometry(get_panels_corners(self.panels))
+        self.V = np.array([10., 0., 0.])
+        self.AR = 10.
+
+    def span_efficiency(self, CL, CDi):
+        return CL ** 2 / (np.pi * self.AR * CDi)
+
+    def test_trefftz_drag_of_untwisted_wing(self):
+        AoA = np.deg2rad(4.)
+        V = 10. * np.array([np.cos(AoA), 0., np.sin(AoA)])
+        N = self.panels.size
+        gamma_magnitude, _ = calc_circulation(np.broadcast_to(V, (N, 3)), self.panels)
+
+        Q = calc_trefftz_drag_matrix(self.geometry, V)
+        assert_almost_equal(Q, Q.T)
+        assert np.all(np.linalg.eigvalsh(Q) > -1e-12)  # the drag is never negative
+
+        qS = 0.5 * 100. * np.sum(self.geometry.areas)
+        lift = np.dot(np.cross(V, self.geometry.C - self.geometry.B), [-np.sin(AoA), 0., np.cos(AoA)])
+        CL = np.dot(lift, gamma_magnitude) / qS
+        CDi = np.dot(gamma_magnitude, np.dot(Q, gamma_magnitude)) / qS
+        assert 0.9 < self.span_efficiency(CL, CDi) < 1.
+
+    def test_elliptic_optimum(self):
+        optimum = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.4)
+        assert_almost_equal(optimum.CL, 0.4)
+        # discrete optimum of ns strips, e = 1 + 1 / ns
+        assert_almost_equal(self.span_efficiency(optimum.CL, optimum.CDi), 1. + 1. / 24.)
+
+        # symmetric washout
+        assert_almost_equal(optimum.twist_deg, optimum.twist_deg[::-1])
+        assert optimum.twist_deg[0] < optimum.twist_deg[12]
+        assert optimum.strip_circulation.shape == (24,)
+
+    def test_twist_produces_the_loading(self):
+        optimum = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.2)
+        theta = np.deg2rad(np.tile(optimum.twist_deg, self.grid_size[0]))
+        normals = np.array([np.dot(rotation_matrix([0, 1, 0], t), n) for t, n in zip(theta, self.geometry.normals)])
+        v_ind_coeff = calc_horseshoe_v_ind_coeff(self.geometry.ctr_p, self.geometry,
+                                                 np.broadcast_to(self.V, (self.panels.size, 3)))
+        A = np.einsum('ijk,ik->ij', v_ind_coeff, normals)
+        gamma_magnitude = np.linalg.solve(A, -np.dot(normals, self.V))
+        assert_almost_equal(gamma_magnitude / np.max(gamma_magnitude),
+                            optimum.gamma_magnitude / np.max(gamma_magnitude), decimal=2)
+
+    def test_root_bending_moment(self):
+        free = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.4, root_point=[0., 0., 0.])
+        M = 0.9 * free.root_bending_moment
+        held = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.4, root_point=[0., 0., 0.],
+                                          root_bending_moment=M)
+        assert_almost_equal(held.root_bending_moment, M)
+        assert_almost_equal(held.CL, 0.4)
+        assert held.CDi > free.CDi
+
+        limited = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.4, root_point=[0., 0., 0.],
+                                             root_bending_moment=(-np.inf, M))
+        assert_almost_equal(limited.CDi, held.CDi)
+        inactive = solve_minimum_induced_drag(self.panels, self.grid_size, self.V, CL=0.4, root_point=[0., 0., 0.],
+                                              root_bending_moment=(-np.inf, 2. * M))
+        assert_almost_equal(inactive.CDi, free.CDi)
+        assert len(inactive.multipliers) == 1
@@ -6,7 +6,7 @@
 import numpy as np
 from numpy.testing import assert_almost_equal
 
-from solver.panel import Panel
+from solver.panel import Panel, calc_panels_warp, check_panels_warp
 from unittest import TestCase
 
 
@@ -43,6 +43,24 @@ class TestPanels(TestCase):
 
         assert_almost_equal(expected_ctr_point, cp)
 
+    def test_tapered_panel_points(self):
+        from solver.panel import calc_panels_geometry, get_panels_corners
+
+        # root chord 4, tip chord 2, swept leading edge - not a parallelogram
+        panel = Panel(np.array([4., 0., 0.]), np.array([0., 0., 0.]),
+                      np.array([1., 10., 0.]), np.array([3., 10., 0.]))
+        ring = panel.get_vortex_ring_position()
+        B, C = ring[1], ring[2]
+
+        # the centre of pressure stays on the bound vortex, the control point on the 3/4 chord line
+        assert_almost_equal(panel.get_cp_position(), [1.25, 5., 0.])
+        assert_almost_equal(panel.get_cp_position(), 0.5 * (B + C))
+        assert_almost_equal(panel.get_ctr_point_postion(), [2.75, 5., 0.])
+
+        geometry = calc_panels_geometry(get_panels_corners(np.array([panel])))
+        assert_almost_equal(geometry.cp[0], panel.get_cp_position())
+        assert_almost_equal(geometry.ctr_p[0], panel.get_ctr_point_postion())
+
     def test_get_vortex_ring_position(self):
         vortex_ring_position = self.panel.get_vortex_ring_position()
         expected_vortex_riing_position = [[12.5, 0., 0.],
@@ -66,3 +84,19 @@ class TestPanels(TestCase):
             panel = Panel(*points)
 
         self.assertTrue("Points on Panel are not on the same plane!" in context.exception.args[0])
+
+    def test_warp(self):
+        flat = np.array([[1., 0., 0.], [0., 0., 0.], [0., 1., 0.], [1., 1., 0.]])
+        warped = flat.copy()
+        warped[3, 2] = 0.2
+        warp = calc_panels_warp(np.array([flat, warped]))
+        # corners are 0.05 off the mean plane, which is tilted by the diagonal normal
+        height = 0.05 * 2. / np.sqrt(4.08)
+        assert_almost_equal(warp, [0., height / np.sqrt(0.5 * np.sqrt(4.08))])
+
+        normal = Panel(*warped, check_in_plane=False).get_normal_to_panel()
+        assert_almost_equal(normal, [-0.1, -0.1, 1.] / np.sqrt(1.02))
+
+        check_panels_warp(np.array([flat, warped]), tol=0.1)
+        with self.assertRaises(ValueError):
+            check_panels_warp(np.array([flat, warped]), tol=0.01)
@@ -0,0 +1,91 @@
+import io
+import json
+
+import numpy as np
+from unittest import TestCase
+
+from solver import profiling
+from solver.mesher import make_panels_from_points
+from solver.vlm_solver import calc_circulation, calc_induced_velocity
+from solver.forces import calc_force_wrapper, calc_pressure
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        self.points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                       np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        self.grid_size = [2, 4]
+
+    def run_pipeline(self):
+        panels, _ = make_panels_from_points(self.points, self.grid_size)
+        V_app_infw = np.array([[10., 0., 1.]] * panels.size)
+        gamma_magnitude, v_ind_coeff = calc_circulation(V_app_infw, panels)
+        calc_induced_velocity(v_ind_coeff, gamma_magnitude)
+        F = calc_force_wrapper(V_app_infw, gamma_magnitude, panels)
+        calc_pressure(F, panels)
+
+    def test_disabled_is_noop(self):
+        assert not profiling.is_enabled()
+        assert profiling.stage("anything", panels=1) is profiling._NULL_STAGE
+        self.run_pipeline()
+
+    def test_stage_report(self):
+        stream = io.StringIO()
+        with profiling.profiled(jsonl=stream) as report:
+            self.run_pipeline()
+
+        assert not profiling.is_enabled()
+        summary = report.summary()
+        for name in ["make_panels_from_points", "assembly_sys_of_eq", "np.linalg.solve",
+                     "calc_induced_velocity", "calc_force_wrapper", "calc_pressure"]:
+            assert name in summary, name
+
+        N = 8
+        assert summary["assembly_sys_of_eq"]["horseshoe_kernel_calls"] == N * N
+        assert summary["assembly_sys_of_eq"]["allocated_bytes"] == 8 * (N * N + N + N * N * 3)
+        assert summary["calc_induced_velocity"]["calls"] == 2
+
+        parents = {r.name: r.parent for r in report.records}
+        assert parents["calc_induced_velocity"] == "calc_force_wrapper"
+        assert parents["make_panels_from_points"] is None
+
+        lines = [json.loads(l) for l in stream.getvalue().splitlines()]
+        assert len(lines) == len(report.records)
+        assert lines[0]["stage"] == report.records[0].name
+
+    def test_nested_enable_raises(self):
+        with profiling.profiled():
+            with self.assertRaises(RuntimeError):
+                with profiling.profiled():
+                    pass
+
+
+class TestImportTime(TestCase):
+    def test_solver_import_is_light(self):
+        modules = "solver.vlm_solver, solver.forces, solver.mesher, solver.coeff_formulas, " \
+                  "solver.batch, solver.results, solver.profiling, solver.kernels"
+        dt, loaded = profiling.measure_import_time(modules, repeat=1)
+        assert loaded == [], loaded
+        assert dt > 0
+
+    def test_threads(self):
+        import threading
+
+        def work(k):
+            with profiling.stage("outer_%d" % k):
+                for _ in range(50):
+                    with profiling.stage("inner", thread=1):
+                        pass
+
+        with profiling.profiled() as report:
+            threads = [threading.Thread(target=work, args=(k,)) for k in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        summary = report.summary()
+        assert summary["inner"]["calls"] == 200
+        for k in range(4):
+            assert summary["outer_%d" % k]["calls"] == 1
+        assert all(r.parent is not None and r.parent.startswith("outer_") for r in report.records if r.name == "inner")
@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.results import CaseResult, ResultsFile
+
+
+class TestResultsFile(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sweep.npz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_result(self, k):
+        N = 6
+        return CaseResult(gamma_magnitude=np.arange(N) * k,
+                          force=np.ones((N, 3)) * k,
+                          pressure=np.linspace(0, 1, N),
+                          mesh=np.zeros((3, 4, 3)),
+                          coefficients={'CL': 0.1 * k, 'CD': 0.01 * k},
+                          metadata={'AoA_deg': k})
+
+    def test_append_and_lazy_read(self):
+        with ResultsFile(self.path, mode='w') as rf:
+            rf.append("c1", self.make_result(1))
+
+        with ResultsFile(self.path, mode='a') as rf:
+            assert "c1" in rf
+            rf.append("c2", self.make_result(2))
+            with self.assertRaises(ValueError):
+                rf.append("c2", self.make_result(2))
+
+        with ResultsFile(self.path) as rf:
+            assert rf.case_ids == ["c1", "c2"]
+            result = rf["c2"]
+            assert isinstance(result.force, np.memmap)
+            assert_almost_equal(result.force, np.ones((6, 3)) * 2)
+            assert_almost_equal(result.gamma_magnitude, np.arange(6) * 2)
+            assert result.mesh.shape == (3, 4, 3)
+            assert result.metadata == {'AoA_deg': 2}
+
+            table = rf.coefficients_table()
+            assert_almost_equal(table['CL'], [0.1, 0.2])
+            assert list(table['case_id']) == ["c1", "c2"]
+
+            with self.assertRaises(ValueError):
+                rf.append("c3", self.make_result(3))
+
+    def test_interrupted_append(self):
+        with ResultsFile(self.path, mode='w') as rf:
+            rf.append("c1", self.make_result(1))
+
+        rf = ResultsFile(self.path, mode='a')
+        rf.append("c2", self.make_result(2))
+        assert_almost_equal(rf["c2"].force, 2.)
+        # the process dies before close - the cases of the earlier session are intact
+        with ResultsFile(self.path) as stored:
+            assert stored.case_ids == ["c1"]
+            assert_almost_equal(stored["c1"].force, 1.)
+
+        rf.close()
+        with ResultsFile(self.path) as stored:
+            assert stored.case_ids == ["c1", "c2"]
+
+    def test_foreign_members(self):
+        import zipfile
+
+        with ResultsFile(self.path, mode='w') as rf:
+            rf.append("c1", self.make_result(1))
+        with zipfile.ZipFile(self.path, mode='a') as zf:
+            zf.writestr("README.txt", "notes")
+
+        with ResultsFile(self.path) as rf:
+            assert rf.case_ids == ["c1"]
+
+    def test_readable_as_npz(self):
+        with ResultsFile(self.path, mode='w') as rf:
+            rf.append("c1", self.make_result(1))
+
+        with np.load(self.path) as data:
+            assert_almost_equal(data["c1/pressure"], np.linspace(0, 1, 6))
@@ -0,0 +1,93 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points, make_cambered_mesh, naca_camber_line
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.results import CaseResult
+from solver.screening import \
+    calc_strip_normals, \
+    solve_lifting_line, \
+    solve_lattice, \
+    screen_configurations
+
+
+class TestScreening(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        self.points = [np.dot(Ry, p) for p in [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                                               np.array([0.2, 5., 0.]), np.array([0.9, 5., 0.])]]
+        self.V = np.array([10., 0., 0.])
+
+    def test_lattice(self):
+        panels, mesh = make_panels_from_points(self.points, [3, 8])
+        V_app_infw = np.array([self.V for _ in range(panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, panels)
+        force = calc_force_wrapper(V_app_infw, gamma_magnitude, panels, rho=1.2)
+
+        result = solve_lattice(mesh, self.V, rho=1.2)
+        assert isinstance(result, CaseResult)
+        assert result.metadata['fidelity'] == 'lattice'
+        assert_almost_equal(result.gamma_magnitude, gamma_magnitude)
+        assert_almost_equal(result.force, force)
+
+    def test_lifting_line_of_a_flat_wing(self):
+        # the same as the lattice of one chordwise panel
+        _, mesh = make_panels_from_points(self.points, [4, 10])
+        _, single = make_panels_from_points(self.points, [1, 10])
+        result = solve_lifting_line(mesh, self.V)
+        assert result.metadata == {'fidelity': 'lifting_line', 'nc': 1, 'ns': 10}
+        assert result.gamma_magnitude.shape == (10,)
+        assert_almost_equal(result.mesh, single)
+        assert_almost_equal(result.force, solve_lattice(single, self.V).force)
+
+        fine = solve_lattice(mesh, self.V)
+        assert abs(result.coefficients['CL'] / fine.coefficients['CL'] - 1.) < 0.02
+
+    def test_camber(self):
+        mesh = make_cambered_mesh(self.points, (8, 12), camber=naca_camber_line(0.04, 0.5))
+        normals = calc_strip_normals(mesh)
+        assert_almost_equal(np.linalg.norm(normals, axis=-1), 1.)
+
+        flat = solve_lifting_line(make_cambered_mesh(self.points, (8, 12)), self.V)
+        cambered = solve_lifting_line(mesh, self.V)
+        lattice = solve_lattice(mesh, self.V)
+        assert cambered.coefficients['CL'] > 1.5 * flat.coefficients['CL']
+        assert abs(cambered.coefficients['CL'] / lattice.coefficients['CL'] - 1.) < 0.1
+
+    def test_screen_configurations(self):
+        meshes = []
+        for span in [2., 3., 4., 5., 6.]:
+            points = [p * [1., span / 5., 1.] for p in self.points]
+            meshes.append(make_panels_from_points(points, [4, 8])[1])
+
+        screening = screen_configurations(meshes, self.V, n_escalate=2)
+        assert screening.ranking[:2] == [4, 3]  # higher aspect ratio, higher L/D
+        assert sorted(screening.high) == [3, 4]
+        assert screening.best() == 4
+        results = screening.results()
+        assert [r.metadata['fidelity'] for r in results] == ['lifting_line'] * 3 + ['lattice'] * 2
+
+        screening = screen_configurations(meshes, self.V, score=lambda r: -abs(r.coefficients['CL'] - 0.3),
+                                          tolerance=0.5)
+        assert len(screening.high) >= 1
+        assert screening.ranking[0] in screening.high
+
+    def test_zero_drag_is_ranked_last(self):
+        flat = [np.array([0., -5., 0.]), np.array([1., -5., 0.]), np.array([0., 5., 0.]), np.array([1., 5., 0.])]
+        meshes = [make_panels_from_points(points, [2, 6])[1] for points in (flat, self.points)]
+        screening = screen_configurations(meshes, self.V, n_escalate=1)
+        assert screening.low[0].coefficients['CD'] == 0.
+        assert screening.scores[0] == -np.inf
+        assert screening.ranking == [1, 0]
+        assert screening.best() == 1
+
+        # nan scores of custom score functions as well
+        def score(result):
+            CL, CD = result.coefficients['CL'], result.coefficients['CD']
+            return CL / CD if CD != 0. else np.nan
+
+        screening = screen_configurations(meshes[::-1], self.V, score=score)
+        assert screening.ranking == [0, 1]
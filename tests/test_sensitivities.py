@@ -0,0 +1,64 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points, mesh_to_corners
+from solver.panel import get_panels_corners
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.sensitivities import \
+    calc_coefficients, \
+    calc_sensitivities, \
+    corners_to_mesh_gradient, \
+    COEFFICIENTS
+
+
+class TestSensitivities(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        points = [np.array([0., -3., 0.]), np.array([1.2, -3., 0.]),
+                  np.array([0.4, 3., 0.]), np.array([1.2, 3., 0.])]
+        self.grid_size = [2, 3]
+        self.panels, self.mesh = make_panels_from_points([np.dot(Ry, p) for p in points], self.grid_size)
+        self.corners = get_panels_corners(self.panels)
+        self.V = np.array([[10., 0.5, 0.] for _ in range(self.panels.size)])
+        self.kwargs = dict(rho=1.2, S=6., c_ref=1., V_ref=self.V[0], reference_point=(0.25, 0., 0.))
+
+    def test_coefficients_match_pipeline(self):
+        gamma_magnitude, _ = calc_circulation(self.V, self.panels)
+        F = calc_force_wrapper(self.V, gamma_magnitude, self.panels, rho=1.2)
+        q = 0.5 * 1.2 * np.dot(self.V[0], self.V[0]) * 6.
+
+        coefficients = calc_coefficients(self.corners, self.V, **self.kwargs)
+        assert_almost_equal(coefficients['CL'], np.sum(F[:, 2]) / q)
+        assert_almost_equal(coefficients['CDi'], np.sum(F[:, 0]) / q)
+
+    def test_adjoint_vs_finite_differences(self):
+        result = calc_sensitivities(self.corners, self.V, **self.kwargs)
+
+        rng = np.random.RandomState(0)
+        d_corners = rng.normal(size=self.corners.shape)
+        d_V = rng.normal(size=self.V.shape)
+        h = 1e-6
+
+        plus = calc_coefficients(self.corners + h * d_corners, self.V, **self.kwargs)
+        minus = calc_coefficients(self.corners - h * d_corners, self.V, **self.kwargs)
+        plus_V = calc_coefficients(self.corners, self.V + h * d_V, **self.kwargs)
+        minus_V = calc_coefficients(self.corners, self.V - h * d_V, **self.kwargs)
+
+        for name in COEFFICIENTS:
+            fd = (plus[name] - minus[name]) / (2 * h)
+            assert_almost_equal(np.sum(result['d_corners'][name] * d_corners), fd, decimal=6)
+
+            fd_V = (plus_V[name] - minus_V[name]) / (2 * h)
+            assert_almost_equal(np.sum(result['d_V_app_infw'][name] * d_V), fd_V, decimal=6)
+
+    def test_mesh_gradient(self):
+        result = calc_sensitivities(self.corners, self.V, **self.kwargs)
+        d_mesh = corners_to_mesh_gradient(result['d_corners']['CL'], self.grid_size)
+        assert d_mesh.shape == self.mesh.shape
+
+        dm = np.random.RandomState(1).normal(size=self.mesh.shape)
+        assert_almost_equal(np.sum(d_mesh * dm), np.sum(result['d_corners']['CL'] * mesh_to_corners(dm)))
+        assert_almost_equal(mesh_to_corners(self.mesh), self.corners)
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points
+from solver.panel import get_panels_corners
+from solver.vlm_solver import calc_circulation
+from solver.service import ServiceThread, SolverClient, geometry_key
+
+
+class TestSolverService(TestCase):
+    def setUp(self):
+        points = [np.array([0., -4., 0.]), np.array([1., -4., 0.]),
+                  np.array([0.3, 4., 0.]), np.array([1., 4., 0.])]
+        self.panels, _ = make_panels_from_points(points, [2, 5])
+        self.V = np.array([[10., 0., 1.] for _ in range(self.panels.size)])
+        self.service = ServiceThread(port=0, cache_size=1, coalesce_delay=0.05).start_serving()
+
+    def tearDown(self):
+        self.service.stop()
+
+    def test_drop_in_calc_circulation(self):
+        expected_gamma, expected_v_ind_coeff = calc_circulation(self.V, self.panels)
+        with SolverClient(*self.service.address) as client:
+            gamma_magnitude, v_ind_coeff = client.calc_circulation(self.V, self.panels)
+            assert_almost_equal(gamma_magnitude, expected_gamma)
+            assert_almost_equal(v_ind_coeff, expected_v_ind_coeff)
+
+            client.calc_circulation(2 * self.V, self.panels)
+            stats = client.stats()
+        assert stats['cache_misses'] == 1
+        assert stats['cache_hits'] == 1
+        assert stats['requests'] == 2
+
+    def test_concurrent_requests_are_coalesced(self):
+        speeds = [5., 10., 15., 20.]
+        results = {}
+
+        def solve(speed):
+            with SolverClient(*self.service.address) as client:
+                results[speed] = client.solve(speed / 10. * self.V, self.panels)['gamma_magnitude']
+
+        # geometry already known, the concurrent requests only carry the inflow
+        with SolverClient(*self.service.address) as client:
+            client.solve(self.V, self.panels)
+
+        threads = [threading.Thread(target=solve, args=(speed,)) for speed in speeds]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        expected, _ = calc_circulation(self.V, self.panels)
+        for speed in speeds:
+            assert_almost_equal(results[speed], speed / 10. * expected)
+
+        with SolverClient(*self.service.address) as client:
+            stats = client.stats()
+        assert stats['requests'] == 5
+        assert stats['solves'] < 5
+        assert stats['coalesced'] == 5 - stats['solves']
+
+    def test_lru_eviction(self):
+        other = get_panels_corners(self.panels) + [0., 0., 1.]
+        with SolverClient(*self.service.address) as client:
+            client.solve(self.V, self.panels)
+            client.solve(self.V, other)  # evicts the first geometry
+            gamma_magnitude = client.solve(self.V, self.panels)['gamma_magnitude']  # sent again
+            stats = client.stats()
+
+        assert_almost_equal(gamma_magnitude, calc_circulation(self.V, self.panels)[0])
+        assert stats['evictions'] == 2
+        assert stats['cache_misses'] == 3
+
+    def test_error(self):
+        with SolverClient(*self.service.address) as client:
+            with self.assertRaises(RuntimeError):
+                client.solve(self.V[:3], self.panels)
+            # the connection survives a failed request
+            assert client.solve(self.V, self.panels)['gamma_magnitude'].shape == (10,)
+
+    def test_geometry_key_mismatch(self):
+        corners = get_panels_corners(self.panels)
+        with SolverClient(*self.service.address) as client:
+            with self.assertRaises(RuntimeError):
+                client.request(op='solve', key=geometry_key(corners + 1.), V_app_infw=self.V, corners=corners)
+            assert client.stats()['cache_misses'] == 0
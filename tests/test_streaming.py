@@ -0,0 +1,70 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.streaming import InflowState, StreamingSolver, stream_forces
+
+
+class TestStreamingSolver(TestCase):
+    def setUp(self):
+        # sail like vertical wing in the x-z plane, AWA is a rotation about z
+        points = [np.array([0., 0., 0.]), np.array([2., 0., 0.]),
+                  np.array([0.5, 0., 8.]), np.array([1.2, 0., 8.])]
+        self.panels, _ = make_panels_from_points(points, [2, 5])
+        self.states = [InflowState(8. + 0.1 * k, 10. + 0.3 * (k % 4), 0.2) for k in range(10)]
+
+    def reference_force(self, solver, state):
+        V = solver.make_inflow(state)
+        gamma_magnitude, _ = calc_circulation(V, self.panels)
+        return calc_force_wrapper(V, gamma_magnitude, self.panels, rho=1.2)
+
+    def test_exact_with_zero_tolerance(self):
+        solver = StreamingSolver(self.panels, rho=1.2, direction_tol=0., block_size=3)
+        samples = list(solver.solve_stream(iter(self.states)))
+
+        assert [s.index for s in samples] == list(range(10))
+        for sample, state in zip(samples, self.states):
+            F = self.reference_force(solver, state)
+            assert_almost_equal(sample.force, F)
+            assert_almost_equal(sample.total_force, np.sum(F, axis=0))
+        assert solver.n_factorizations == 10  # every sample changes the angle
+
+    def test_factorization_reused_within_tolerance(self):
+        solver = StreamingSolver(self.panels, rho=1.2, direction_tol=np.deg2rad(1.), block_size=4)
+        samples = list(solver.solve_stream(self.states))
+        assert solver.n_factorizations == 1
+        for sample, state in zip(samples, self.states):
+            F = np.sum(self.reference_force(solver, state), axis=0)
+            assert np.linalg.norm(sample.total_force - F) < 1e-2 * np.linalg.norm(F)
+
+    def test_run_across_blocks(self):
+        # 10.9 and 9.1 deg are both within the tolerance of the factorized 10 deg, but not of each other
+        states = [InflowState(8., angle, 0.) for angle in (10., 10., 10.9, 9.1)]
+        for block_size in (2, 3):
+            solver = StreamingSolver(self.panels, rho=1.2, direction_tol=np.deg2rad(1.), block_size=block_size)
+            samples = list(solver.solve_stream(states))
+            assert len(samples) == 4
+            assert solver.n_factorizations == solver.cache.n_factorizations == 1
+            for sample, state in zip(samples, states):
+                F = np.sum(self.reference_force(solver, state), axis=0)
+                assert np.linalg.norm(sample.total_force - F) < 2e-2 * np.linalg.norm(F)
+
+    def test_speed_gradient(self):
+        solver = StreamingSolver(self.panels, angle_axis=(0, 0, 1), height_axis=(0, 0, 1), reference_height=4.)
+        V = solver.make_inflow(InflowState(10., 90., 0.5))
+        heights = solver.geometry.ctr_p[:, 2]
+        assert_almost_equal(V[:, 1], 10. + 0.5 * (heights - 4.))
+        assert_almost_equal(V[:, [0, 2]], 0.)
+
+    def test_generator_is_lazy(self):
+        def endless():
+            while True:
+                yield (10., 5., 0.)
+
+        stream = stream_forces(self.panels, endless(), block_size=2)
+        first = [next(stream) for _ in range(5)]
+        assert first[-1].index == 4
+        assert first[0].moment.shape == (3,)
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import warnings
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.mesher import make_panels_from_points
+from solver.geometry_calc import rotation_matrix
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.surrogate import \
+    SurrogateTable, \
+    SurrogateBuilder, \
+    get_CL_CD_from_table
+
+
+class TestSurrogateTable(TestCase):
+    def setUp(self):
+        self.axes = [np.array([-2., 0., 1., 4., 6.]), np.array([0., 10., 20., 30.]), np.array([3.])]
+        x, y, z = np.meshgrid(*self.axes, indexing='ij')
+        values = np.stack([1. + 0.1 * x + 0.02 * y + 0.003 * x * y, x ** 3 - y ** 2 + x * y], axis=-1)
+        self.table = SurrogateTable(['AoA_deg', 'heel_deg', 'leeway_deg'], self.axes, values,
+                                    coefficient_names=['CL', 'CD'])
+
+    def test_multilinear(self):
+        x = np.array([-1.5, 0.3, 5.9])
+        y = np.array([[2.], [17.]])
+        result = self.table(AoA_deg=x, heel_deg=y)
+        assert result['CL'].shape == (2, 3)
+        assert_almost_equal(result['CL'], 1. + 0.1 * x + 0.02 * y + 0.003 * x * y)
+
+        # grid points are reproduced, outside the bounds the table is clipped
+        assert_almost_equal(self.table(AoA_deg=4., heel_deg=20.)['CD'], 64. - 400. + 80.)
+        assert_almost_equal(self.table(AoA_deg=10., heel_deg=-5.)['CD'], self.table(AoA_deg=6., heel_deg=0.)['CD'])
+
+    def test_cubic(self):
+        x, y = np.array([-1.5, 0.3, 5.9]), np.array([2., 17., 29.])
+        CL, CD = get_CL_CD_from_table(self.table, method='cubic', AoA_deg=x, heel_deg=y)
+        assert_almost_equal(CD, x ** 3 - y ** 2 + x * y)
+        assert_almost_equal(CL, 1. + 0.1 * x + 0.02 * y + 0.003 * x * y)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.table(heel_deg=1.)  # AoA_deg missing
+        with self.assertRaises(ValueError):
+            self.table(AoA_deg=1., heel_deg=1., Fn=3.)
+        with self.assertRaises(ValueError):
+            SurrogateTable(['AoA_deg'], [np.array([1., 0.])], np.zeros((2, 3)))
+
+    def test_save_load(self):
+        path = os.path.join(tempfile.mkdtemp(), "table.npz")
+        self.table.save(path)
+        table = SurrogateTable.load(path)
+        assert table.axis_names == self.table.axis_names
+        assert table.coefficient_names == ('CL', 'CD')
+        assert_almost_equal(table.values, self.table.values)
+        assert table.errors is None
+
+        self.table.errors = {'CL': {'max_abs': 1e-3, 'rms': 2e-4}, 'CD': {'max_abs': 5e-5, 'rms': 1e-5}}
+        self.table.save(path)
+        assert SurrogateTable.load(path).errors == self.table.errors
+        os.remove(path)
+
+
+class TestSurrogateBuilder(TestCase):
+    def setUp(self):
+        self.points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                       np.array([0.2, 5., 0.]), np.array([1., 5., 0.])]
+        self.panels, _ = make_panels_from_points(self.points, [2, 10])
+        self.builder = SurrogateBuilder(self.panels)
+
+    def test_solve(self):
+        AoA_deg = 5.
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(AoA_deg))
+        V_app_infw = np.array([np.dot(Ry.T, [1., 0., 0.]) for _ in range(self.panels.size)])
+        gamma_magnitude, _ = calc_circulation(V_app_infw, self.panels)
+        F = np.dot(Ry, np.sum(calc_force_wrapper(V_app_infw, gamma_magnitude, self.panels), axis=0))
+
+        CL, CD, CS = self.builder.solve(AoA_deg)
+        S = self.builder.S
+        assert_almost_equal([CL, CD, CS], [F[2] / (0.5 * S), F[0] / (0.5 * S), F[1] / (0.5 * S)])
+
+    def test_heel_and_free_surface(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            near = self.builder.solve(4., heel_deg=0., Fn=10., h_over_chord=1.)
+        deep = self.builder.solve(4.)
+        assert near[0] < deep[0]
+
+        heeled = self.builder.solve(4., heel_deg=[-20., 20.])
+        assert_almost_equal(heeled[0, 0], heeled[1, 0], decimal=3)
+        assert heeled[0, 0] < deep[0]
+
+    def test_build_and_spot_check(self):
+        table = self.builder.build(AoA_deg=np.linspace(-4., 8., 7), heel_deg=[0., 15., 30.])
+        assert table.values.shape == (7, 3, 1, 3)
+        assert self.builder.solves == 21
+
+        errors = self.builder.spot_check(table, n_samples=8)
+        assert table.errors is errors
+        assert errors['CL']['max_abs'] < 5e-3
+        assert errors['CL']['rms'] <= errors['CL']['max_abs']
+
+    def test_fixed_wake(self):
+        builder = SurrogateBuilder(self.panels, fixed_wake_direction=[1., 0., 0.])
+        table = builder.build(AoA_deg=[0., 2., 4.], leeway_deg=[0., 3.])
+        for k, AoA_deg in enumerate([0., 2., 4.]):
+            # a fixed wake changes the result only slightly
+            assert_almost_equal(table.values[k, 0, 0], self.builder.solve(AoA_deg), decimal=3)
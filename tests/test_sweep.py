@@ -0,0 +1,70 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points
+from solver.panel import Panel
+from solver.vlm_solver import calc_circulation
+from solver.forces import calc_force_wrapper
+from solver import profiling
+from solver.sweep import ThreadedSweep
+
+
+class TestThreadedSweep(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        points = [np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                  np.array([0.3, 5., 0.]), np.array([0.9, 5., 0.])]
+        self.panels, _ = make_panels_from_points([np.dot(Ry, p) for p in points], [3, 8])
+        self.N = self.panels.size
+        self.direction = np.array([1., 0., 0.1])
+        self.speeds = np.linspace(1., 20., 37)
+        self.rho = np.linspace(1., 1.2, 37)
+
+    def test_no_shared_panel_counter(self):
+        assert not hasattr(Panel, 'panel_counter')
+
+    def test_speed_sweep(self):
+        sweep = ThreadedSweep(self.panels, self.direction, workers=4, chunk_size=5)
+        result = sweep.run(self.speeds[:, None] * self.direction, rho=self.rho)
+        assert result.force.shape == (37, self.N, 3)
+
+        for k in (0, 17, 36):
+            V_app_infw = np.array([self.speeds[k] * self.direction] * self.N)
+            gamma_magnitude, _ = calc_circulation(V_app_infw, self.panels)
+            F = calc_force_wrapper(V_app_infw, gamma_magnitude, self.panels, rho=self.rho[k])
+            assert_almost_equal(result.gamma_magnitude[k], gamma_magnitude)
+            assert_almost_equal(result.force[k], F)
+            assert_almost_equal(result.total_force[k], np.sum(F, axis=0))
+
+    def test_threads_match_serial(self):
+        rng = np.random.RandomState(0)
+        V_app_infw = self.speeds[:, None] * self.direction + rng.normal(scale=0.1, size=(37, 3))
+        serial = ThreadedSweep(self.panels, self.direction, workers=1).run(V_app_infw)
+        sweep = ThreadedSweep(self.panels, self.direction, workers=3, chunk_size=4)
+        with profiling.profiled() as report:
+            threaded = sweep.run(V_app_infw)
+        assert_almost_equal(threaded.force, serial.force)
+        assert report.summary()["lu_solve"]["calls"] == 10
+
+        out = threaded
+        assert sweep.run(2. * V_app_infw, out=out) is out
+        assert_almost_equal(out.total_force, 4. * serial.total_force)
+        with self.assertRaises(ValueError):
+            sweep.run(V_app_infw[:3], out=out)
+
+    def test_many_threads(self):
+        # many small chunks solved concurrently on the shared factors of a larger lattice
+        panels, _ = make_panels_from_points([np.array([0., -5., 0.]), np.array([1., -5., 0.]),
+                                             np.array([0., 5., 0.]), np.array([1., 5., 0.])], [6, 30])
+        V_app_infw = np.linspace(5., 20., 600)[:, None] * self.direction
+        serial = ThreadedSweep(panels, self.direction, workers=1).run(V_app_infw)
+        sweep = ThreadedSweep(panels, self.direction, workers=8, chunk_size=3)
+        for _ in range(3):
+            assert_almost_equal(sweep.run(V_app_infw).force, serial.force)
+
+    def test_shared_state_is_read_only(self):
+        sweep = ThreadedSweep(self.panels, self.direction)
+        with self.assertRaises(ValueError):
+            sweep._lu[0, 0] = 1.
@@ -0,0 +1,53 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points
+from solver.vlm_solver import assembly_sys_of_eq, calc_circulation
+from solver.forces import calc_force_wrapper
+from solver.toeplitz import is_regular_lattice, RegularLattice, solve_regular_lattice
+
+
+class TestRegularLattice(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(4.))
+        # swept, untapered - a regular lattice
+        points = [np.array([0., -3., 0.]), np.array([1., -3., 0.]),
+                  np.array([0.5, 3., 0.]), np.array([1.5, 3., 0.])]
+        self.points = [np.dot(Ry, p) for p in points]
+        self.panels, self.mesh = make_panels_from_points(self.points, [3, 5])
+        self.V = np.array([10., 1., 0.])
+        self.V_app_infw = np.array([self.V for _ in range(self.panels.size)])
+
+    def test_is_regular_lattice(self):
+        assert is_regular_lattice(self.mesh)
+
+        tapered = list(self.points)
+        tapered[3] = tapered[3] - np.dot(rotation_matrix([0, 1, 0], np.deg2rad(4.)), [0.3, 0., 0.])
+        _, mesh = make_panels_from_points(tapered, [3, 5])
+        assert not is_regular_lattice(mesh)
+        with self.assertRaises(ValueError):
+            RegularLattice(mesh, self.V)
+
+    def test_aic(self):
+        lattice = RegularLattice(self.mesh, self.V)
+        A, RHS, _ = assembly_sys_of_eq(self.V_app_infw, self.panels)
+        assert_almost_equal(lattice.dense(), A)
+        assert_almost_equal(lattice.rhs(), RHS)
+
+    def test_solve_and_forces(self):
+        gamma_expected, _ = calc_circulation(self.V_app_infw, self.panels)
+        F_expected = calc_force_wrapper(self.V_app_infw, gamma_expected, self.panels, rho=1.2)
+
+        gamma_magnitude, F = solve_regular_lattice(self.mesh, self.V, rho=1.2)
+        assert_almost_equal(gamma_magnitude, gamma_expected)
+        assert_almost_equal(F, F_expected)
+
+    def test_preconditioner(self):
+        _, mesh = make_panels_from_points(self.points, [8, 32])
+        lattice = RegularLattice(mesh, self.V)
+        gamma_plain, plain = lattice.solve(precondition=False)
+        gamma_precond, precond = lattice.solve(precondition=True)
+        assert_almost_equal(gamma_precond, gamma_plain)
+        assert precond < plain
@@ -0,0 +1,77 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+from unittest import TestCase
+
+from solver.geometry_calc import rotation_matrix
+from solver.mesher import make_panels_from_points
+from solver.vlm_solver import InfluenceCache, calc_induced_velocity
+from solver.forces import calc_force_wrapper
+from solver.viscous import PolarTable, solve_viscous
+
+
+class TestViscous(TestCase):
+    def setUp(self):
+        Ry = rotation_matrix([0, 1, 0], np.deg2rad(8.))
+        points = [np.array([0., -4., 0.]), np.array([1., -4., 0.]),
+                  np.array([0., 4., 0.]), np.array([1., 4., 0.])]
+        self.panels, self.mesh = make_panels_from_points([np.dot(Ry, p) for p in points], [3, 8])
+        self.V = np.array([10., 0., 0.])
+        self.alpha_deg = np.linspace(-20., 20., 81)
+
+    def test_polar_table(self):
+        cl = np.array([np.sin(np.deg2rad(self.alpha_deg)) * k for k in (1., 2.)])
+        polar = PolarTable(self.alpha_deg, cl, 0.01 + 0. * self.alpha_deg)
+        alpha = np.array([3.3, -25.])
+        cl_strips, cd_strips = polar(alpha)
+        assert_almost_equal(cl_strips, [np.interp(3.3, self.alpha_deg, cl[0]), cl[1, 0]])
+        assert_almost_equal(cd_strips, 0.01)
+
+        with self.assertRaises(ValueError):
+            PolarTable(self.alpha_deg[::-1], cl, cl)
+
+    def test_linear_polar(self):
+        # the thin airfoil polar - the potential flow solution is already converged, only the profile drag is added
+        polar = PolarTable(self.alpha_deg, 2. * np.pi * np.deg2rad(self.alpha_deg), 0.01 + 0. * self.alpha_deg)
+        result = solve_viscous(self.mesh, self.V, polar, rho=1.2)
+        assert result.converged
+        assert len(result.history) == 1
+        assert_almost_equal(result.delta_alpha_deg, 0.)
+
+        V_app_infw = np.array([self.V for _ in range(self.panels.size)])
+        gamma_magnitude = InfluenceCache(self.panels).calc_circulation(V_app_infw)[0]
+        inviscid = calc_force_wrapper(V_app_infw, gamma_magnitude, self.panels, rho=1.2)
+        assert_almost_equal(result.gamma_magnitude, gamma_magnitude)
+        assert_almost_equal(np.sum(result.force - result.profile_force, axis=0), np.sum(inviscid, axis=0))
+
+        # along the local inflow at the centres of pressure, tilted by the downwash
+        v_ind_coeff_cp = InfluenceCache(self.panels).get_v_ind_coeff(V_app_infw, at='cp')
+        V_at_cp = V_app_infw + calc_induced_velocity(v_ind_coeff_cp, gamma_magnitude)
+        areas = np.array([p.get_panel_area() for p in self.panels.flatten()])
+        expected = (0.5 * 1.2 * np.linalg.norm(V_at_cp, axis=-1) * areas * 0.01)[:, None] * V_at_cp
+        assert_almost_equal(result.profile_force, expected)
+        assert np.sum(result.profile_force[:, 2]) < 0.
+        freestream_drag = 0.5 * 1.2 * 100. * 8. * 0.01
+        assert abs(np.sum(result.profile_force[:, 0]) - freestream_drag) < 0.01 * freestream_drag
+        assert np.all(result.alpha_eff_deg < 8.) and np.all(result.alpha_eff_deg > 0.)
+
+    def test_stall(self):
+        cl_max = 0.4
+        cl = np.clip(2. * np.pi * np.deg2rad(self.alpha_deg), -cl_max, cl_max)
+        polar = PolarTable(self.alpha_deg, cl, 0.01 + 0.001 * self.alpha_deg ** 2)
+        history = []
+        cache = InfluenceCache(self.panels)
+        result = solve_viscous(self.mesh, self.V, polar, rho=1.2, tol=1e-8, callback=history.append, cache=cache)
+
+        assert result.converged
+        assert history == result.history
+        assert history[0].residual > 0.1
+        assert all(h.time_s >= 0. for h in history)
+        assert_almost_equal(result.cl_inviscid, result.cl, decimal=7)
+        assert np.all(result.cl <= cl_max + 1e-8)
+        assert np.all(result.delta_alpha_deg < 0.)
+
+        # the corrected lattice lifts less than the potential flow one
+        V_app_infw = np.array([self.V for _ in range(self.panels.size)])
+        gamma_magnitude = cache.calc_circulation(V_app_infw)[0]
+        assert np.sum(result.gamma_magnitude) < np.sum(gamma_magnitude)
+        assert "converged" in result.format_table()
@@ -65,3 +65,66 @@ class TestVLM_Solver(TestCase):
             is_no_flux_BC_satisfied(V_broken, self.panels)()
 
         self.assertTrue("Solution error, there is a significant flow through panel!" in context.exception.args[0])
+
+    def test_assembly_matches_panel_methods(self):
+        V = np.array([10, 1, -1])
+        V_free_stream = np.array([V for i in range(self.N)])
+        A, RHS, v_ind_coeff = assembly_sys_of_eq(V_free_stream, self.panels)
+
+        panels1D = self.panels.flatten()
+        for i in range(self.N):
+            n = panels1D[i].get_normal_to_panel()
+            ctr_p = panels1D[i].get_ctr_point_postion()
+            assert_almost_equal(RHS[i], -np.dot(V, n))
+            for j in range(self.N):
+                v = panels1D[j].get_horse_shoe_induced_velocity(ctr_p, V)
+                assert_almost_equal(v_ind_coeff[i][j], v)
+                assert_almost_equal(A[i][j], np.dot(v, n))
+
+    def test_influence_cache(self):
+        from solver import profiling
+        from solver.vlm_solver import InfluenceCache
+
+        cache = InfluenceCache(self.panels)
+        V_free_stream = np.array([[10, 0, -1] for i in range(self.N)])
+
+        with profiling.profiled() as report:
+            gamma_magnitude, v_ind_coeff = cache.calc_circulation(V_free_stream)
+            cache.calc_circulation(2 * V_free_stream)  # same wake direction, nothing is recomputed
+            V_turned = np.array([[10, 0, 1] for i in range(self.N)])
+            gamma_turned, _ = cache.calc_circulation(V_turned)
+
+        summary = report.summary()
+        assert summary["bound_vortex_v_ind_coeff"]["calls"] == 1
+        assert summary["trailing_vortices_v_ind_coeff"]["calls"] == 2
+        assert summary["lu_factor"]["calls"] == 2
+
+        assert_almost_equal(gamma_magnitude, [-5.26437093, -5.61425005, -5.26437093])
+        assert_almost_equal(gamma_turned, calc_circulation(V_turned, self.panels)[0])
+
+        A, RHS, _ = cache.assembly_sys_of_eq(V_turned)
+        A_ref, RHS_ref, _ = assembly_sys_of_eq(V_turned, self.panels)
+        assert_almost_equal(A, A_ref)
+        assert_almost_equal(RHS, RHS_ref)
+
+        gammas, _ = cache.calc_circulation(np.array([V_turned, 3 * V_turned]))
+        assert_almost_equal(gammas[:, 1], 3 * gamma_turned)
+
+        with self.assertRaises(ValueError):
+            cache.calc_circulation(np.array([V_turned, V_free_stream]))
+
+    def test_influence_cache_fixed_wake(self):
+        from solver.vlm_solver import InfluenceCache
+
+        cache = InfluenceCache(self.panels, fixed_wake_direction=[1, 0, 0])
+        V_free_stream = np.array([[10, 0, -1] for i in range(self.N)])
+        V_turned = np.array([[10, 0, 1] for i in range(self.N)])
+
+        gamma_magnitude, _ = cache.calc_circulation(V_free_stream)
+        A_before = cache._factorized
+        gamma_turned, _ = cache.calc_circulation(V_turned)
+        assert cache._factorized is A_before
+
+        A_ref, RHS_ref, _ = assembly_sys_of_eq(np.array([[1., 0, 0]] * self.N), self.panels)
+        RHS = -np.dot(V_turned, self.panels.flatten()[0].get_normal_to_panel())
+        assert_almost_equal(gamma_turned, np.linalg.solve(A_ref, RHS))
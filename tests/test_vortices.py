@@ -79,3 +79,48 @@ class TestVortices(TestCase):
 
         calculated_vel = v_induced_by_finite_vortex_line(P, A, B)
         assert_almost_equal(calculated_vel, [0, 0, 0])
+
+    def test_vectorized_kernels_match_scalar_ones(self):
+        from solver.vortices import \
+            v_induced_by_finite_vortex_lines, \
+            v_induced_by_semi_infinite_vortex_lines, \
+            v_induced_by_horseshoe_vortices
+
+        rng = np.random.RandomState(0)
+        P = rng.uniform(-2, 2, size=(7, 3))
+        A = rng.uniform(-2, 2, size=(5, 3))
+        B = rng.uniform(-2, 2, size=(5, 3))
+        r0 = rng.uniform(0.5, 2, size=(5, 3))
+        P[0] = B[0] + 0.5 * (B[0] - A[0])  # vortex core of the finite line
+        P[1] = 0.5 * (A[1] + B[1])
+
+        v_finite = v_induced_by_finite_vortex_lines(P[:, None], A[None], B[None])
+        v_semi = v_induced_by_semi_infinite_vortex_lines(P[:, None], A[None], r0[None], gamma=-2)
+        v_horseshoe = v_induced_by_horseshoe_vortices(P[:, None], A[None], B[None], r0[None])
+        assert v_finite.shape == (7, 5, 3)
+
+        for i in range(7):
+            for j in range(5):
+                assert_almost_equal(v_finite[i, j], v_induced_by_finite_vortex_line(P[i], A[j], B[j]))
+                assert_almost_equal(v_horseshoe[i, j], v_induced_by_horseshoe_vortex(P[i], A[j], B[j], r0[j]))
+                assert_almost_equal(v_semi[i, j], v_induced_by_semi_infinite_vortex_line(P[i], A[j], r0[j], gamma=-2))
+
+    def test_grad_finite_vortex_line_on_its_extension(self):
+        from solver.vortices import \
+            v_induced_by_finite_vortex_lines, \
+            grad_v_induced_by_finite_vortex_lines
+
+        A = np.array([0., 0., 0.])
+        B = np.array([1., 0.5, 0.2])
+        rng = np.random.RandomState(2)
+        h = 1e-5  # v is a difference of nearly equal terms close to the line, keep away from round-off
+        for P in (A - 0.7 * (B - A), B + 0.3 * (B - A)):
+            assert_almost_equal(v_induced_by_finite_vortex_lines(P, A, B), 0.)
+            jacobians = grad_v_induced_by_finite_vortex_lines(P, A, B)
+            for k, J in enumerate(jacobians):
+                d = rng.normal(size=3)
+                plus, minus = [P, A, B], [P, A, B]
+                plus[k] = plus[k] + h * d
+                minus[k] = minus[k] - h * d
+                fd = (v_induced_by_finite_vortex_lines(*plus) - v_induced_by_finite_vortex_lines(*minus)) / (2 * h)
+                assert_almost_equal(np.dot(J, d), fd, decimal=5)